@@ -103,7 +103,7 @@ class TestFullLifecycle:
         print(f"[Action] Triggering security check for {SECURITY_CONTAINER}")
         start_time = time.time()
         # We call the internal method to simulate the loop hitting this container
-        monitor._check_security(SECURITY_CONTAINER)
+        monitor._report_security(SECURITY_CONTAINER, monitor._probe_security(SECURITY_CONTAINER))
         
         # 4. Wait for Agent to process (Agent runs in background thread started by Monitor init?)
         # Monitor init does NOT start agent threads. Monitor._report_issue starts them if needed?
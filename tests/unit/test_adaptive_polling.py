@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+单元14: 自适应采样测试
+
+测试内容：
+- 稳定容器采样间隔逐次翻倍，上限为检查间隔的倍数
+- 默认关闭
+- 接近临界阈值或负载上升时恢复高频采样
+- 只采样到期的容器
+"""
+import sys
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.config import init_config, ContainerConfig
+
+
+def _stats(cpu, mem):
+    return {"cpu_percent": f"{cpu}%", "memory_percent": f"{mem}%", "memory_usage": "10MiB / 1GiB"}
+
+
+class TestAdaptivePolling:
+    """自适应采样测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.config.system.check_interval_seconds = 30
+        monitor.config.system.resource_check_interval_seconds = 120
+        monitor.config.stats.adaptive = True
+        monitor.config.stats.adaptive_max_multiple = 20
+        monitor.config.containers = [
+            ContainerConfig(name="idle", thresholds={"cpu_percent_critical": 80, "memory_percent_critical": 80}),
+            ContainerConfig(name="hot", thresholds={"cpu_percent_critical": 80, "memory_percent_critical": 80}),
+        ]
+        monitor._report_issue = MagicMock()
+        monitor._probe_security = MagicMock(return_value={})
+        return monitor
+
+    def test_stable_container_backs_off(self):
+        monitor = self._monitor()
+        idle = monitor.config.containers[0]
+        intervals = []
+        for _ in range(5):
+            monitor._schedule_next_sample(idle, 5.0, 10.0)
+            intervals.append(monitor._sample_interval["idle"])
+        assert intervals == [240, 480, 600, 600, 600]
+
+    def test_ceiling_follows_check_interval(self):
+        monitor = self._monitor()
+        monitor.config.stats.adaptive_max_multiple = 8
+        idle = monitor.config.containers[0]
+        for _ in range(5):
+            monitor._schedule_next_sample(idle, 5.0, 10.0)
+        assert monitor._sample_interval["idle"] == 240
+
+        # 上限不低于常规资源采样间隔
+        monitor.config.stats.adaptive_max_multiple = 1
+        monitor._schedule_next_sample(idle, 5.0, 10.0)
+        assert monitor._sample_interval["idle"] == 120
+
+    def test_disabled_by_default(self):
+        from watchdog.config import StatsConfig
+        assert StatsConfig().adaptive is False
+
+    def test_near_threshold_fast(self):
+        monitor = self._monitor()
+        hot = monitor.config.containers[1]
+        monitor._schedule_next_sample(hot, 70.0, 10.0)
+        assert monitor._sample_interval["hot"] == 30
+
+    def test_rising_load_fast(self):
+        monitor = self._monitor()
+        idle = monitor.config.containers[0]
+        monitor._schedule_next_sample(idle, 5.0, 10.0)
+        monitor._schedule_next_sample(idle, 5.0, 10.0)
+        assert monitor._sample_interval["idle"] == 480
+
+        monitor._schedule_next_sample(idle, 5.0, 30.0)
+        assert monitor._sample_interval["idle"] == 30
+
+        # 回落到稳定区间后先恢复常规间隔
+        monitor._schedule_next_sample(idle, 5.0, 30.0)
+        assert monitor._sample_interval["idle"] == 120
+
+    @patch('watchdog.monitor.collect_all_stats')
+    def test_only_due_containers_sampled(self, mock_collect):
+        monitor = self._monitor()
+        monitor.state_table.apply_inspect("idle", {"running": True, "status": "running"})
+        mock_collect.side_effect = lambda names: {
+            "idle": _stats(5, 10), "hot": _stats(70, 10)
+        }
+        monitor._check_all_containers_resources()
+        assert set(mock_collect.call_args.args[0]) == {"idle", "hot"}
+
+        # 快进 60 秒：只有接近阈值的 hot 到期
+        monitor._next_sample = {name: due - 60 for name, due in monitor._next_sample.items()}
+        monitor._probe_security.reset_mock()
+        monitor._check_all_containers_resources(security_pass=False)
+        assert mock_collect.call_args.args[0] == ["hot"]
+        monitor._probe_security.assert_not_called()
+
+    @patch('watchdog.monitor.collect_all_stats')
+    def test_disabled_samples_all(self, mock_collect):
+        monitor = self._monitor()
+        monitor.config.stats.adaptive = False
+        mock_collect.return_value = {"idle": _stats(5, 10), "hot": _stats(5, 10)}
+        monitor._check_all_containers_resources()
+        monitor._check_all_containers_resources()
+        assert set(mock_collect.call_args.args[0]) == {"idle", "hot"}
+        assert monitor._next_sample == {}
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
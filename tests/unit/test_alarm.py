@@ -0,0 +1,143 @@
+#!/usr/bin/env python3
+"""
+单元17: 持续超标与恢复阈值测试
+
+测试内容：
+- 持续时间确认（回落到临界阈值以下即重新计时）
+- M/K 采样确认
+- stream 模式同一采样只计入一次，持续时间按采样时间计算
+- 恢复阈值（滞回）抑制抖动重复上报
+- 被熔断/去重跳过的上报不进入报警状态
+"""
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.alarm import AlarmRule, ThresholdAlarm
+from watchdog.config import init_config, ContainerConfig
+
+
+class TestThresholdAlarm:
+    """报警状态测试"""
+
+    def test_default_fires_on_first_breach(self):
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=90)
+        assert alarm.update(95, rule, 0.0) is True
+
+    def test_sustain_seconds(self):
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=80, sustain_seconds=30)
+        assert alarm.update(95, rule, 0.0) is False
+        assert alarm.update(95, rule, 20.0) is False
+        assert alarm.update(95, rule, 30.0) is True
+
+    def test_sustain_resets_in_hysteresis_band(self):
+        """回落到恢复阈值与临界阈值之间同样中断持续计时"""
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=80, sustain_seconds=30)
+        alarm.update(95, rule, 0.0)
+        assert alarm.update(85, rule, 20.0) is False
+        assert alarm.update(95, rule, 30.0) is False
+        assert alarm.update(95, rule, 60.0) is True
+
+    def test_sustain_resets_below_clear(self):
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=80, sustain_seconds=30)
+        alarm.update(95, rule, 0.0)
+        alarm.update(50, rule, 10.0)
+        assert alarm.update(95, rule, 30.0) is False
+        assert alarm.update(95, rule, 60.0) is True
+
+    def test_m_of_k(self):
+        alarm = ThresholdAlarm(window=5)
+        rule = AlarmRule(critical=90, clear=80, min_samples=3, window=5)
+        results = [alarm.update(value, rule, float(i)) for i, value in enumerate((95, 85, 95, 85, 95))]
+        assert results == [False, False, False, False, True]
+
+    def test_repeated_sample_counted_once(self):
+        """stream 模式重复检查同一采样：M/K 窗口只计入一次"""
+        alarm = ThresholdAlarm(window=3)
+        rule = AlarmRule(critical=90, clear=80, min_samples=3, window=3)
+        assert [alarm.update(95, rule, float(i), sampled_at=100.0) for i in range(5)] == [False] * 5
+        assert alarm.update(95, rule, 5.0, sampled_at=101.0) is False
+        assert alarm.update(95, rule, 6.0, sampled_at=102.0) is True
+
+    def test_sustain_in_sample_time(self):
+        """采样流停滞时持续时间不随检查时间累积"""
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=80, sustain_seconds=30)
+        assert alarm.update(95, rule, 0.0, sampled_at=1000.0) is False
+        assert alarm.update(95, rule, 60.0, sampled_at=1000.0) is False
+        assert alarm.update(95, rule, 61.0, sampled_at=1010.0) is False
+        assert alarm.update(95, rule, 62.0, sampled_at=1030.0) is True
+
+    def test_hysteresis(self):
+        alarm = ThresholdAlarm()
+        rule = AlarmRule(critical=90, clear=70)
+        assert alarm.update(95, rule, 0.0) is True
+        alarm.active = True
+        # 在 70%~90% 间抖动不重复上报
+        assert [alarm.update(v, rule, 1.0) for v in (85, 92, 88, 95)] == [False] * 4
+        assert alarm.update(60, rule, 2.0) is False
+        assert alarm.update(95, rule, 3.0) is True
+
+
+class TestMonitorThresholds:
+    """监控阈值上报测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self, **thresholds):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        container = ContainerConfig(name="flappy", thresholds={
+            "cpu_percent_critical": 90, "memory_percent_critical": 90, **thresholds
+        })
+        monitor.config.containers = [container]
+        monitor._report_issue = MagicMock(return_value=True)
+        return monitor, container
+
+    def test_flapping_reported_once(self):
+        monitor, container = self._monitor(cpu_percent_clear=70)
+        for cpu in (95, 80, 95, 85, 95):
+            monitor._check_thresholds(container, float(cpu), 10.0)
+        monitor._report_issue.assert_called_once_with("flappy", "CPU_HIGH")
+
+    def test_transient_spike_ignored(self):
+        monitor, container = self._monitor(sustain_samples=3, sustain_window=5)
+        for cpu in (95, 10, 10, 95, 10):
+            monitor._check_thresholds(container, float(cpu), 10.0)
+        monitor._report_issue.assert_not_called()
+
+    def test_sustained_duration(self):
+        monitor, container = self._monitor(sustain_seconds=60)
+        with patch("watchdog.monitor.time.monotonic", side_effect=[0.0, 30.0, 61.0]):
+            for _ in range(3):
+                monitor._check_thresholds(container, 10.0, 95.0)
+        monitor._report_issue.assert_called_once_with("flappy", "MEMORY_HIGH")
+
+    def test_stalled_stream_not_reported(self):
+        monitor, container = self._monitor(sustain_samples=3, sustain_window=3)
+        for _ in range(5):
+            monitor._check_thresholds(container, 95.0, 10.0, sampled_at=1000.0)
+        monitor._report_issue.assert_not_called()
+
+    def test_suppressed_report_not_latched(self):
+        monitor, container = self._monitor(cpu_percent_clear=70)
+        monitor._report_issue.return_value = False
+        monitor._check_thresholds(container, 95.0, 10.0)
+        assert not monitor.alarms.active("flappy", "cpu_percent")
+
+        monitor._report_issue.return_value = True
+        monitor._check_thresholds(container, 95.0, 10.0)
+        assert monitor.alarms.active("flappy", "cpu_percent")
+        assert monitor._report_issue.call_count == 2
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,148 @@
+#!/usr/bin/env python3
+"""
+单元16: 动态基线测试
+
+测试内容：
+- P² 分位数估计精度
+- 常数内存
+- baseline 阈值模式：学习期、偏离基线报警、异常样本按阈值计入、阈值不超过 100%、同一采样只计入一次
+"""
+import random
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.baseline import P2Quantile, QuantileSketch, BaselineTracker
+from watchdog.config import init_config, ContainerConfig
+
+
+class TestP2Quantile:
+    """P² 估计测试"""
+
+    def test_accuracy(self):
+        rng = random.Random(7)
+        data = [rng.gauss(50, 10) for _ in range(10000)]
+        sketch = QuantileSketch()
+        for value in data:
+            sketch.add(value)
+        ordered = sorted(data)
+        result = sketch.quantiles()
+        assert result["p50"] == pytest.approx(ordered[5000], abs=0.5)
+        assert result["p95"] == pytest.approx(ordered[9500], abs=1.0)
+        assert result["p99"] == pytest.approx(ordered[9900], abs=1.5)
+
+    def test_constant_memory(self):
+        estimator = P2Quantile(0.95)
+        for i in range(1000):
+            estimator.add(float(i))
+        assert len(estimator._heights) == 5
+        assert estimator.count == 1000
+
+    def test_few_samples(self):
+        estimator = P2Quantile(0.5)
+        assert estimator.value() is None
+        for value in (3.0, 1.0, 2.0):
+            estimator.add(value)
+        assert estimator.value() == 2.0
+
+
+class TestBaselineTracker:
+    """基线跟踪测试"""
+
+    def test_per_container_metric(self):
+        tracker = BaselineTracker()
+        for i in range(100):
+            tracker.observe("web", "cpu_percent", 10.0)
+            tracker.observe("db", "cpu_percent", 80.0)
+        assert tracker.baseline("web", "cpu_percent")["p99"] == 10.0
+        assert tracker.baseline("db", "cpu_percent")["samples"] == 100
+        assert tracker.baseline("web", "memory_percent") is None
+        tracker.forget("web")
+        assert tracker.baseline("web", "cpu_percent") is None
+
+
+class TestBaselineThresholds:
+    """baseline 阈值模式测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self, **thresholds):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.config.thresholds.baseline_min_samples = 50
+        monitor.config.thresholds.baseline_floor_percent = 20
+        container = ContainerConfig(name="bursty", thresholds={
+            "cpu_percent_critical": 80, "memory_percent_critical": 80, "threshold_mode": "baseline", **thresholds
+        })
+        monitor.config.containers = [container]
+        monitor._report_issue = MagicMock()
+        return monitor, container
+
+    def test_learning_period_uses_static(self):
+        monitor, container = self._monitor()
+        monitor._check_thresholds(container, 90.0, 10.0)
+        monitor._report_issue.assert_called_once_with("bursty", "CPU_HIGH")
+
+    def test_bursty_normal_load_not_reported(self):
+        """常态在 85%~95% 之间波动的容器，学习后不再按固定 80% 报警"""
+        monitor, container = self._monitor()
+        rng = random.Random(1)
+        for _ in range(50):
+            monitor.baselines.observe("bursty", "cpu_percent", rng.uniform(85, 95))
+            monitor.baselines.observe("bursty", "memory_percent", 10.0)
+
+        monitor._check_thresholds(container, 94.0, 10.0)
+        monitor._report_issue.assert_not_called()
+
+    def test_deviation_reported_and_clamped(self):
+        monitor, container = self._monitor(baseline_factor=2.0)
+        for _ in range(60):
+            monitor._check_thresholds(container, 10.0, 10.0)
+        monitor._report_issue.reset_mock()
+
+        # 基线 p99=10，阈值 max(10×2, 20)=20；异常样本按阈值计入
+        monitor._check_thresholds(container, 25.0, 10.0)
+        monitor._report_issue.assert_called_once_with("bursty", "CPU_HIGH")
+        baseline = monitor.baselines.baseline("bursty", "cpu_percent")
+        assert baseline["samples"] == 61
+        assert baseline["p99"] <= 20.0
+
+    def test_level_shift_learned(self):
+        """负载持续抬升到新水平后基线跟上，不会一直超过动态阈值"""
+        monitor, container = self._monitor(baseline_factor=2.0)
+        for _ in range(60):
+            monitor._check_thresholds(container, 10.0, 10.0)
+        thresholds = []
+        for _ in range(200):
+            monitor._check_thresholds(container, 30.0, 10.0)
+            thresholds.append(monitor._baseline_threshold(container, "cpu_percent", 30.0, 80.0, sampled_at=0))
+        assert thresholds[0] == 20.0
+        assert thresholds[-1] > 30.0
+
+    def test_threshold_capped_at_100(self):
+        monitor, container = self._monitor(baseline_factor=2.0)
+        for _ in range(60):
+            monitor.baselines.observe("bursty", "memory_percent", 70.0)
+        assert monitor._baseline_threshold(container, "memory_percent", 70.0, 80.0) == 100.0
+
+    def test_same_sample_observed_once(self):
+        """stream 模式反复检查同一缓存采样时，基线只计入一次"""
+        monitor, container = self._monitor()
+        for _ in range(5):
+            monitor._check_thresholds(container, 10.0, 10.0, sampled_at=1000.0)
+        monitor._check_thresholds(container, 10.0, 10.0, sampled_at=1001.0)
+        assert monitor.baselines.baseline("bursty", "cpu_percent")["samples"] == 2
+
+    def test_static_mode_unchanged(self):
+        monitor, container = self._monitor(threshold_mode="static")
+        monitor._check_thresholds(container, 79.0, 10.0)
+        monitor._report_issue.assert_not_called()
+        assert monitor.baselines.baseline("bursty", "cpu_percent") is None
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,117 @@
+#!/usr/bin/env python3
+"""
+单元9: cgroup v2 采样测试
+
+测试内容：
+- cgroup 目录解析（systemd scope）
+- CPU% 由 usage_usec 差值计算
+- 内存/OOM 计数读取
+- stats.backend=cgroup 时不调用 docker
+"""
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.cgroup import CgroupSampler, is_cgroup_v2
+from watchdog.evidence import parse_percent, parse_memory_mb
+
+CONTAINER_ID = "a" * 64
+
+
+def _write_scope(root: Path, usage_usec: int, memory_max: str = str(1024 * 1024 * 1024), oom_kill: int = 0):
+    (root / "cgroup.controllers").write_text("cpu memory io\n")
+    scope = root / "system.slice" / f"docker-{CONTAINER_ID}.scope"
+    scope.mkdir(parents=True, exist_ok=True)
+    (scope / "cpu.stat").write_text(f"usage_usec {usage_usec}\nuser_usec 0\nsystem_usec 0\n")
+    (scope / "memory.current").write_text(str(300 * 1024 * 1024))
+    (scope / "memory.stat").write_text(f"anon 1\ninactive_file {100 * 1024 * 1024}\n")
+    (scope / "memory.max").write_text(memory_max + "\n")
+    (scope / "memory.events").write_text(f"low 0\nhigh 0\nmax 3\noom 1\noom_kill {oom_kill}\n")
+    (scope / "io.stat").write_text("8:0 rbytes=2000 wbytes=1000 rios=1 wios=1\n")
+    (scope / "cgroup.procs").write_text("")
+    return scope
+
+
+@pytest.fixture
+def inspect_stub():
+    with patch("watchdog.cgroup._inspect_id_and_pid", return_value=(CONTAINER_ID, 0)) as stub:
+        yield stub
+
+
+class TestCgroupSampler:
+    """cgroup 采样测试"""
+
+    def test_detect_v2(self, tmp_path):
+        assert not is_cgroup_v2(str(tmp_path))
+        _write_scope(tmp_path, 0)
+        assert is_cgroup_v2(str(tmp_path))
+
+    def test_resolve_once(self, tmp_path, inspect_stub):
+        """测试 cgroup 目录只解析一次"""
+        scope = _write_scope(tmp_path, 0)
+        sampler = CgroupSampler(str(tmp_path))
+        assert sampler.resolve("web") == str(scope)
+        assert sampler.resolve("web") == str(scope)
+        assert inspect_stub.call_count == 1
+
+    def test_cpu_from_usage_delta(self, tmp_path, inspect_stub):
+        """测试 CPU% = usage_usec 差值 / 墙钟时间"""
+        _write_scope(tmp_path, 1_000_000)
+        sampler = CgroupSampler(str(tmp_path))
+        sampler.sample("web")
+
+        # 模拟 0.5 秒内消耗 0.25 秒 CPU -> 50%
+        with patch("watchdog.cgroup.time.monotonic") as monotonic:
+            monotonic.return_value = 100.0
+            sampler._prev_cpu["web"] = (99.5, 1_000_000)
+            _write_scope(tmp_path, 1_250_000)
+            stats = sampler.sample("web")
+
+        assert parse_percent(stats["cpu_percent"]) == pytest.approx(50.0)
+
+    def test_memory_and_oom(self, tmp_path, inspect_stub):
+        _write_scope(tmp_path, 0, oom_kill=2)
+        stats = CgroupSampler(str(tmp_path)).sample("web")
+        assert parse_memory_mb(stats["memory_usage"]) == pytest.approx(200.0)
+        assert stats["memory_usage"].endswith("/ 1GiB")
+        assert parse_percent(stats["memory_percent"]) == pytest.approx(19.53, abs=0.01)
+        assert stats["oom_kill_count"] == 2
+        assert stats["block_io"] == "2kB / 1kB"
+
+    def test_unlimited_memory_uses_host_total(self, tmp_path, inspect_stub):
+        _write_scope(tmp_path, 0, memory_max="max")
+        sampler = CgroupSampler(str(tmp_path))
+        sampler._host_memory = 2 * 1024 * 1024 * 1024
+        stats = sampler.sample("web")
+        assert stats["memory_usage"].endswith("/ 2GiB")
+
+    def test_unknown_container(self, tmp_path):
+        _write_scope(tmp_path, 0)
+        with patch("watchdog.cgroup._inspect_id_and_pid", return_value=("", 0)):
+            assert CgroupSampler(str(tmp_path)).sample("missing") is None
+
+
+class TestCgroupBackend:
+    """stats.backend=cgroup 集成测试"""
+
+    def test_collect_uses_cgroup(self, tmp_path, inspect_stub):
+        from watchdog.config import init_config
+        from watchdog.stats import collect_all_stats
+
+        _write_scope(tmp_path, 0)
+        config = init_config()
+        config.stats.backend = "cgroup"
+        config.stats.cgroup_root = str(tmp_path)
+
+        with patch("watchdog.stats._collect_api") as mock_api:
+            results = collect_all_stats(["web"])
+
+        mock_api.assert_not_called()
+        assert "web" in results
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,134 @@
+#!/usr/bin/env python3
+"""
+单元11: 并发探测测试
+
+测试内容：
+- 健康检查并发执行，周期耗时取决于最慢探测
+- 超过 deadline 的探测按健康检查失败处理
+- 上一轮未结束的探测本轮跳过
+- deadline 从探测开始执行时起算，排队时间不计入
+"""
+import sys
+import time
+import threading
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.config import init_config, ContainerConfig
+from watchdog.monitor import ContainerMonitor, PROBE_TIMEOUT
+
+
+def _monitor(names, timeout_seconds=1):
+    monitor = ContainerMonitor()
+    monitor.config.containers = [
+        ContainerConfig(name=name, health_check={"type": "command", "command": "true",
+                                                 "timeout_seconds": timeout_seconds})
+        for name in names
+    ]
+    for name in names:
+        monitor.state_table.apply_inspect(name, {"running": True, "status": "running"})
+    monitor._report_issue = MagicMock()
+    return monitor
+
+
+class TestConcurrentHealth:
+    """并发健康检查测试"""
+
+    def setup_method(self):
+        init_config()
+
+    @patch('watchdog.monitor.check_container_health')
+    def test_probes_run_in_parallel(self, mock_health):
+        def slow_probe(name, cfg):
+            time.sleep(0.3)
+            return {"healthy": True, "message": "ok"}
+        mock_health.side_effect = slow_probe
+        monitor = _monitor([f"c{i}" for i in range(8)])
+
+        started = time.monotonic()
+        monitor._check_all_containers_alive()
+        elapsed = time.monotonic() - started
+
+        assert mock_health.call_count == 8
+        assert elapsed < 1.0
+        monitor._report_issue.assert_not_called()
+        monitor.stop()
+
+    @patch('watchdog.monitor.HEALTH_PROBE_GRACE_SECONDS', 0.2)
+    @patch('watchdog.monitor.check_container_health')
+    def test_hung_probe_times_out(self, mock_health):
+        release = threading.Event()
+
+        def probe(name, cfg):
+            if name == "hung":
+                release.wait(5)
+            return {"healthy": True, "message": "ok"}
+        mock_health.side_effect = probe
+        monitor = _monitor(["hung", "fine"], timeout_seconds=0)
+
+        started = time.monotonic()
+        monitor._check_all_containers_alive()
+        elapsed = time.monotonic() - started
+
+        assert elapsed < 1.0
+        monitor._report_issue.assert_called_once_with("hung", "HEALTH_FAIL")
+
+        # 上一轮仍卡住的探测本轮跳过，不重复提交
+        mock_health.reset_mock()
+        monitor._check_all_containers_alive()
+        called = [call.args[0] for call in mock_health.call_args_list]
+        assert called == ["fine"]
+
+        release.set()
+        monitor.stop()
+
+
+class TestRunProbes:
+    """_run_probes 测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def test_collects_results_and_timeouts(self):
+        monitor = ContainerMonitor()
+        release = threading.Event()
+        results = monitor._run_probes("测试", {
+            "a": (lambda: 1, 1),
+            "b": (lambda: release.wait(5), 0.1),
+        })
+        assert results["a"] == 1
+        assert results["b"] is PROBE_TIMEOUT
+        release.set()
+        monitor.stop()
+
+    def test_queue_wait_not_counted(self):
+        """探测数超过线程数时，排队等待不计入 deadline"""
+        monitor = ContainerMonitor()
+        monitor.config.system.probe_workers = 1
+
+        def probe():
+            time.sleep(0.3)
+            return "ok"
+        results = monitor._run_probes("测试", {name: (probe, 0.5) for name in ("a", "b", "c")})
+        assert results == {"a": "ok", "b": "ok", "c": "ok"}
+        monitor.stop()
+
+    def test_queued_behind_hung_probe_not_timed_out(self):
+        """线程被卡住的探测占满时，排队的探测不判定为超时"""
+        monitor = ContainerMonitor()
+        monitor.config.system.probe_workers = 1
+        release = threading.Event()
+        results = monitor._run_probes("测试", {
+            "hung": (lambda: release.wait(5), 0.1),
+            "queued": (lambda: 1, 0.1),
+        })
+        assert results == {"hung": PROBE_TIMEOUT}
+        release.set()
+        monitor.stop()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -7,6 +7,7 @@
 - LLMConfig 解析
 - 环境变量解析
 - 容器配置加载
+- 运行时状态路径以项目根目录为基准
 """
 import os
 import sys
@@ -170,5 +171,17 @@ class TestConfigSingleton:
         assert get_config() is config2
 
 
+class TestStatePaths:
+    """运行时状态路径测试"""
+    
+    def test_relative_paths_anchored_to_project_root(self, tmp_path, monkeypatch):
+        """测试相对路径不随工作目录变化"""
+        monkeypatch.chdir(tmp_path)
+        config = Config()
+        root = Path(__file__).parent.parent.parent.resolve()
+        assert Path(config.events.cursor_file) == root / "state" / "events_cursor.json"
+        assert Path(config.stats.history_dir) == root / "state" / "metrics"
+
+
 if __name__ == "__main__":
     pytest.main([__file__, "-v"])
@@ -0,0 +1,196 @@
+#!/usr/bin/env python3
+"""
+单元7: Docker Engine API 客户端测试
+
+测试内容：
+- unix socket keep-alive 连接复用
+- 多路复用流拆分
+- stats 格式化与 CLI 输出对齐
+- API 不可用时回退 CLI，请求超时不回退
+"""
+import json
+import os
+import socket
+import sys
+import socketserver
+import tempfile
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.docker_api import (
+    DockerClient,
+    DockerNotFound,
+    demux_stream,
+    format_stats,
+    try_api,
+    API_UNAVAILABLE,
+)
+from watchdog.evidence import parse_percent, parse_memory_mb, parse_memory_limit_mb, parse_io_mb
+
+
+class _FakeDockerHandler(BaseHTTPRequestHandler):
+    """模拟 Docker daemon 的最小实现"""
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def _send(self, status, body, content_type="application/json"):
+        data = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        self.server.connections.add(id(self.connection))
+        if self.path.startswith("/containers/web/json"):
+            self._send(200, {"Id": "abcdef1234567890", "State": {"Running": True}})
+        elif self.path.startswith("/containers/web/top"):
+            self._send(200, {"Titles": ["PID", "CMD"], "Processes": [["1", "xmrig --donate 0"]]})
+        elif self.path.startswith("/containers/web/logs"):
+            frame = b"\x01\x00\x00\x00" + (5).to_bytes(4, "big") + b"hello"
+            self._send(200, frame, "application/vnd.docker.multiplexed-stream")
+        else:
+            self._send(404, {"message": "No such container"})
+
+
+class _FakeDockerServer(socketserver.ThreadingMixIn, socketserver.UnixStreamServer):
+    daemon_threads = True
+
+
+@pytest.fixture
+def fake_docker():
+    socket_path = os.path.join(tempfile.mkdtemp(), "docker.sock")
+    server = _FakeDockerServer(socket_path, _FakeDockerHandler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server, socket_path
+    server.shutdown()
+    server.server_close()
+
+
+class TestDockerClient:
+    """unix socket 客户端测试"""
+
+    def test_inspect_reuses_connection(self, fake_docker):
+        """测试连续请求复用同一条 keep-alive 连接"""
+        server, socket_path = fake_docker
+        client = DockerClient(socket_path, pool_size=2)
+
+        for _ in range(5):
+            info = client.inspect_container("web")
+            assert info["State"]["Running"] is True
+
+        assert len(server.connections) == 1
+        client.close()
+
+    def test_not_found_raises(self, fake_docker):
+        """测试 404 转换为 DockerNotFound"""
+        _, socket_path = fake_docker
+        client = DockerClient(socket_path)
+        with pytest.raises(DockerNotFound):
+            client.inspect_container("missing")
+
+    def test_logs_demuxed(self, fake_docker):
+        """测试日志按帧拆分"""
+        _, socket_path = fake_docker
+        client = DockerClient(socket_path)
+        assert client.container_logs("web", tail=10) == "hello"
+
+    def test_top(self, fake_docker):
+        """测试进程列表"""
+        _, socket_path = fake_docker
+        client = DockerClient(socket_path)
+        top = client.container_top("web")
+        assert top["Processes"][0][1] == "xmrig --donate 0"
+
+
+class TestDemux:
+    """多路复用流拆分测试"""
+
+    def test_split_stdout_stderr(self):
+        data = (b"\x01\x00\x00\x00" + (3).to_bytes(4, "big") + b"out"
+                + b"\x02\x00\x00\x00" + (3).to_bytes(4, "big") + b"err")
+        assert demux_stream(data) == (b"out", b"err")
+
+    def test_tty_raw_stream(self):
+        """TTY 容器无帧头，整体视为 stdout"""
+        assert demux_stream(b"plain text output") == (b"plain text output", b"")
+
+
+class TestFormatStats:
+    """stats 格式化测试"""
+
+    def test_matches_cli_format(self):
+        raw = {
+            "cpu_stats": {"cpu_usage": {"total_usage": 2_000_000}, "system_cpu_usage": 20_000_000, "online_cpus": 2},
+            "precpu_stats": {"cpu_usage": {"total_usage": 1_000_000}, "system_cpu_usage": 10_000_000},
+            "memory_stats": {"usage": 150 * 1024 * 1024, "limit": 1024 * 1024 * 1024,
+                             "stats": {"inactive_file": 50 * 1024 * 1024}},
+            "networks": {"eth0": {"rx_bytes": 1500, "tx_bytes": 648}},
+        }
+        stats = format_stats(raw)
+        assert parse_percent(stats["cpu_percent"]) == pytest.approx(20.0)
+        assert stats["memory_usage"] == "100MiB / 1GiB"
+        assert parse_memory_mb(stats["memory_usage"]) == pytest.approx(100.0)
+        assert parse_percent(stats["memory_percent"]) == pytest.approx(9.77, abs=0.01)
+        assert stats["net_io"] == "1.5kB / 648B"
+        assert parse_io_mb(stats["net_io"]) == pytest.approx((0.0015, 0.000648))
+
+    def test_parse_io_mb(self):
+        assert parse_io_mb("1.2GB / 3MiB") == pytest.approx((1200.0, 3.0))
+        assert parse_io_mb("--") is None
+
+    def test_parse_memory_limit_mb(self):
+        assert parse_memory_limit_mb("100MiB / 1GiB") == pytest.approx(1024.0)
+        assert parse_memory_limit_mb("500MB") is None
+        assert parse_memory_limit_mb("") is None
+
+
+class TestFallback:
+    """API 不可用回退测试"""
+
+    def test_api_disabled_returns_sentinel(self):
+        with patch("watchdog.docker_api.get_client", return_value=None):
+            assert try_api(lambda client: client.ping()) is API_UNAVAILABLE
+
+    def test_not_found_value(self, fake_docker):
+        _, socket_path = fake_docker
+        client = DockerClient(socket_path)
+        with patch("watchdog.docker_api.get_client", return_value=client):
+            assert try_api(lambda c: c.inspect_container("missing"), not_found="gone") == "gone"
+
+    def test_missing_socket_falls_back(self, tmp_path):
+        client = DockerClient(str(tmp_path / "missing.sock"))
+        with patch("watchdog.docker_api.get_client", return_value=client):
+            assert try_api(lambda c: c.inspect_container("web")) is API_UNAVAILABLE
+
+    def test_timeout_does_not_fall_back(self):
+        def slow(client):
+            raise socket.timeout("timed out")
+        with patch("watchdog.docker_api.get_client", return_value=object()):
+            assert try_api(slow, failed="failed") == "failed"
+            assert try_api(slow) is None
+
+    def test_exec_timeout_runs_once(self):
+        from watchdog.evidence import docker_exec
+        def slow(client):
+            raise socket.timeout("timed out")
+        with patch("watchdog.evidence.try_api", side_effect=lambda func, **kw: try_api(slow, **kw)), \
+                patch("watchdog.docker_api.get_client", return_value=object()), \
+                patch("watchdog.evidence.run_command") as run_command:
+            code, _, _ = docker_exec("web", ["netstat", "-ntu"])
+        assert code == -1
+        run_command.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,166 @@
+#!/usr/bin/env python3
+"""
+单元12: 异步健康检查引擎测试
+
+测试内容：
+- HTTP 探测状态码判断
+- keep-alive 连接复用
+- chunked 响应
+- TCP 可达/不可达
+- 批量探测
+- 跟随重定向
+- 监控停止时停止引擎
+"""
+import socket
+import sys
+import threading
+import pytest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.health import AsyncHealthEngine
+
+
+class _Handler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, *args):
+        pass
+
+    def do_GET(self):
+        self.server.connections.add(self.client_address)
+        if self.path == "/chunked":
+            self.send_response(200)
+            self.send_header("Transfer-Encoding", "chunked")
+            self.end_headers()
+            self.wfile.write(b"2\r\nok\r\n0\r\n\r\n")
+            return
+        if self.path in ("/moved", "/loop"):
+            self.send_response(302)
+            self.send_header("Location", "/health" if self.path == "/moved" else "/loop")
+            self.send_header("Content-Length", "0")
+            self.end_headers()
+            return
+        status = 503 if self.path == "/down" else 200
+        body = b"ok"
+        self.send_response(status)
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+
+class _Server(ThreadingHTTPServer):
+    daemon_threads = True
+    request_queue_size = 64
+
+
+@pytest.fixture
+def http_server():
+    server = _Server(("127.0.0.1", 0), _Handler)
+    server.connections = set()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def engine():
+    engine = AsyncHealthEngine()
+    yield engine
+    engine.stop()
+
+
+def _url(server, path="/health"):
+    return f"http://127.0.0.1:{server.server_address[1]}{path}"
+
+
+class TestHttpProbe:
+    """HTTP 探测测试"""
+
+    def test_healthy(self, http_server, engine):
+        result = engine.check({"type": "http", "endpoint": _url(http_server), "timeout_seconds": 2})
+        assert result == {"healthy": True, "message": "HTTP 200"}
+
+    def test_unexpected_status(self, http_server, engine):
+        result = engine.check({"type": "http", "endpoint": _url(http_server, "/down"), "timeout_seconds": 2})
+        assert result["healthy"] is False
+        assert "503" in result["message"]
+
+    def test_keep_alive_reuse(self, http_server, engine):
+        """测试连续探测复用同一连接"""
+        cfg = {"type": "http", "endpoint": _url(http_server), "timeout_seconds": 2}
+        for _ in range(5):
+            assert engine.check(cfg)["healthy"] is True
+        assert len(http_server.connections) == 1
+
+    def test_follows_redirects(self, http_server, engine):
+        """与 requests 一样跟随重定向，按最终状态码判断"""
+        result = engine.check({"type": "http", "endpoint": _url(http_server, "/moved"), "timeout_seconds": 2})
+        assert result == {"healthy": True, "message": "HTTP 200"}
+
+    def test_redirect_loop(self, http_server, engine):
+        result = engine.check({"type": "http", "endpoint": _url(http_server, "/loop"), "timeout_seconds": 5})
+        assert result["healthy"] is False
+
+    def test_chunked(self, http_server, engine):
+        cfg = {"type": "http", "endpoint": _url(http_server, "/chunked"), "timeout_seconds": 2}
+        assert engine.check(cfg)["healthy"] is True
+        assert engine.check(cfg)["healthy"] is True
+        assert len(http_server.connections) == 1
+
+    def test_connection_refused(self, engine):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        result = engine.check({"type": "http", "endpoint": f"http://127.0.0.1:{port}/", "timeout_seconds": 2})
+        assert result["healthy"] is False
+        assert result["message"].startswith("连接失败")
+
+    def test_check_many(self, http_server, engine):
+        configs = {f"c{i}": {"type": "http", "endpoint": _url(http_server), "timeout_seconds": 2}
+                   for i in range(20)}
+        results = engine.check_many(configs)
+        assert all(r["healthy"] for r in results.values())
+        assert len(results) == 20
+
+
+class TestTcpProbe:
+    """TCP 探测测试"""
+
+    def test_reachable(self, http_server, engine):
+        cfg = {"type": "tcp", "host": "127.0.0.1", "port": http_server.server_address[1], "timeout_seconds": 2}
+        result = engine.check(cfg)
+        assert result["healthy"] is True
+        assert "可达" in result["message"]
+
+    def test_unreachable(self, engine):
+        sock = socket.socket()
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+        sock.close()
+        result = engine.check({"type": "tcp", "host": "127.0.0.1", "port": port, "timeout_seconds": 2})
+        assert result == {"healthy": False, "message": f"TCP 127.0.0.1:{port} 不可达"}
+
+
+class TestEngineLifecycle:
+    """引擎生命周期测试"""
+
+    def test_monitor_stop_stops_engine(self):
+        from watchdog import health
+        from watchdog.config import init_config
+        from watchdog.monitor import ContainerMonitor
+        init_config()
+        engine = health.get_engine()
+        thread = engine._thread
+        ContainerMonitor().stop()
+        assert engine._loop is None
+        assert not thread.is_alive()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
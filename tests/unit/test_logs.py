@@ -0,0 +1,356 @@
+#!/usr/bin/env python3
+"""
+单元19: 日志增量读取测试
+
+测试内容：
+- RFC3339Nano 时间戳解析
+- 游标推进与 --since 边界去重
+- stdout/stderr 交错
+- 安全探测只扫描新日志、同一攻击日志只上报一次
+- json-file 日志文件直接读取：偏移、半行、轮转、截断、回退
+- 常驻日志环形缓冲与 follow 流解析（回填的旧日志不重新扫描，取消订阅断开长连接）
+- 两次探测之间未读即被覆盖的日志在覆盖前扫描
+"""
+import io
+import json
+import os
+import socket
+import sys
+import threading
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import ANY, MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.docker_api import StreamHandle, iter_log_lines
+from watchdog.logs import JsonFileTailer, LogCollector, LogCursor, LogFollower, LogRing, parse_log_timestamp
+from watchdog.config import init_config
+
+T0 = "2025-01-01T12:00:00.000000001Z"
+T1 = "2025-01-01T12:00:01.5Z"
+T2 = "2025-01-01T12:00:02.000000000Z"
+
+
+class TestTimestamp:
+    """时间戳解析测试"""
+
+    def test_parse(self):
+        assert parse_log_timestamp(T0) == (1735732800, 1)
+        assert parse_log_timestamp(T1) == (1735732801, 500000000)
+        assert parse_log_timestamp("2025-01-01T12:00:00Z") == (1735732800, 0)
+        assert parse_log_timestamp("hello") is None
+        assert parse_log_timestamp("2025-01-01T12:00:00.abcZ") is None
+
+
+class TestLogCursor:
+    """游标测试"""
+
+    def test_advance(self):
+        cursor = LogCursor()
+        assert cursor.since is None
+        assert cursor.advance(f"{T0} a\n{T1} b") == ["a", "b"]
+        assert cursor.since == "1735732801.500000000"
+
+    def test_since_is_inclusive(self):
+        cursor = LogCursor()
+        cursor.advance(f"{T0} a\n{T1} b")
+        # --since 会再次返回时间戳等于游标的行
+        assert cursor.advance(f"{T1} b\n{T1} c\n{T2} d") == ["c", "d"]
+        assert cursor.advance(f"{T2} d") == []
+
+    def test_interleaved_streams(self):
+        cursor = LogCursor()
+        cursor.advance(f"{T0} start")
+        # stdout 在前、stderr 在后，stderr 中的行时间更早
+        assert cursor.advance(f"{T2} out\n{T1} err") == ["out", "err"]
+        assert cursor.since == "1735732802.000000000"
+
+
+class TestLogFollower:
+    """增量读取测试"""
+
+    def test_fetch_uses_cursor(self):
+        follower = LogFollower(initial_tail=10)
+        with patch("watchdog.logs.fetch_logs", side_effect=[f"{T0} a", f"{T0} a\n{T1} b", None]) as fetch:
+            assert follower.read_new("web") == ["a"]
+            assert follower.read_new("web") == ["b"]
+            assert follower.read_new("web") == []
+        assert fetch.call_args_list[0][0] == ("web", None, 10)
+        assert fetch.call_args_list[1][0] == ("web", "1735732800.000000001", 10)
+
+
+def _entries(*texts):
+    return "".join(json.dumps({"log": text + "\n", "stream": "stdout", "time": T0}) + "\n" for text in texts)
+
+
+class TestJsonFileTailer:
+    """json-file 日志文件读取测试"""
+
+    @pytest.fixture
+    def log_file(self, tmp_path):
+        path = tmp_path / "c-json.log"
+        with patch("watchdog.logs._inspect_log_path", return_value=str(path)):
+            yield path
+
+    def test_initial_tail_then_incremental(self, log_file):
+        log_file.write_text(_entries("a", "b", "c"))
+        tailer = JsonFileTailer(initial_tail=2)
+        assert tailer.read_new("web") == ["b", "c"]
+        assert tailer.read_new("web") == []
+        with open(log_file, "a") as f:
+            f.write(_entries("d"))
+            # 写了一半的行不读取
+            f.write('{"log":"e')
+        assert tailer.read_new("web") == ["d"]
+        with open(log_file, "a") as f:
+            f.write('\\n","stream":"stderr","time":"%s"}\n' % T1)
+        assert tailer.read_new("web") == ["e"]
+        assert tailer.tail("web", 10) == ["a", "b", "c", "d", "e"]
+
+    def test_rotation(self, log_file):
+        log_file.write_text(_entries("a"))
+        tailer = JsonFileTailer()
+        tailer.read_new("web")
+        with open(log_file, "a") as f:
+            f.write(_entries("b"))
+        os.rename(log_file, str(log_file) + ".1")
+        log_file.write_text(_entries("c"))
+        assert tailer.read_new("web") == ["b", "c"]
+
+    def test_truncation(self, log_file):
+        log_file.write_text(_entries("a", "b"))
+        tailer = JsonFileTailer()
+        tailer.read_new("web")
+        with open(log_file, "r+") as f:
+            f.truncate(0)
+            f.write(_entries("c"))
+        assert tailer.read_new("web") == ["c"]
+
+    def test_follower_falls_back_to_docker(self):
+        follower = LogFollower(tailer=JsonFileTailer())
+        with patch("watchdog.logs._inspect_log_path", return_value=None), \
+                patch("watchdog.logs.fetch_logs", return_value=f"{T0} a") as fetch:
+            assert follower.read_new("web") == ["a"]
+        fetch.assert_called_once()
+
+
+def _frame(stream_type, payload):
+    return bytes([stream_type, 0, 0, 0]) + len(payload).to_bytes(4, "big") + payload
+
+
+def _wait_for(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if predicate():
+            return True
+        time.sleep(0.01)
+    return False
+
+
+class TestLogRing:
+    """日志环形缓冲测试"""
+
+    def test_recent_and_overwrite(self):
+        ring = LogRing(3)
+        ring.extend(["a", "b"])
+        lines, seq = ring.read_since(0)
+        assert (lines, seq) == (["a", "b"], 2)
+        ring.extend(["c", "d", "e"])
+        assert ring.recent(2) == ["d", "e"]
+        # 已被覆盖的 "c" 之前的行丢失
+        assert ring.read_since(seq) == (["c", "d", "e"], 5)
+        assert ring.read_since(5) == ([], 5)
+
+    def test_unread_overflow_scanned(self):
+        scan = MagicMock(side_effect=lambda text: ["evil"] if "evil" in text else [])
+        ring = LogRing(3, scan)
+        ring.mark_backfilled()
+        ring.extend(["a", "b"])
+        assert ring.read_since(None) == (["a", "b"], 2)
+        # 已读的 a、b 被覆盖不再扫描，未读的 evil、c 在覆盖前扫描
+        ring.extend(["evil", "c", "d", "e", "f"])
+        assert ring.take_overflow() == (2, ["evil"])
+        assert ring.take_overflow() == (0, [])
+        assert ring.read_since(2) == (["d", "e", "f"], 7)
+        scan.assert_called_once_with("evil\nc")
+
+    def test_backfill_overflow_not_scanned(self):
+        scan = MagicMock(return_value=[])
+        ring = LogRing(2, scan)
+        ring.extend(["old 1", "old 2", "old 3"])
+        ring.mark_backfilled()
+        ring.extend(["new"])
+        scan.assert_not_called()
+
+
+class TestFollowStream:
+    """logs follow 流解析测试"""
+
+    def test_multiplexed_lines_across_frames(self):
+        data = _frame(1, b"out 1\nout") + _frame(2, b"err 1\n") + _frame(1, b" 2\n")
+        assert list(iter_log_lines(io.BytesIO(data))) == ["out 1", "err 1", "out 2"]
+
+    def test_tty(self):
+        assert list(iter_log_lines(io.BytesIO(b"line one\nline two\n"))) == ["line one", "line two"]
+
+
+class TestLogCollector:
+    """常驻日志收集测试"""
+
+    def test_file_backend(self, tmp_path):
+        path = tmp_path / "c-json.log"
+        path.write_text(_entries("old 1", "old 2"))
+        with patch("watchdog.logs._inspect_log_path", return_value=str(path)):
+            collector = LogCollector(capacity=10, tailer=JsonFileTailer(), poll_interval=0.01)
+            collector.subscribe("web")
+            try:
+                assert _wait_for(lambda: collector.recent("web", 10) == ["old 1", "old 2"])
+                with open(path, "a") as f:
+                    f.write(_entries("new"))
+                assert _wait_for(lambda: collector.recent("web", 1) == ["new"])
+            finally:
+                collector.stop()
+        assert collector.read_since("web", 2) == (["new"], 3)
+        assert collector.recent("missing", 10) is None
+
+    def test_follow_reconnect_resumes(self):
+        client = MagicMock()
+        client.follow_container_logs.side_effect = [
+            iter([f"{T0} a", f"{T1} b"]),
+            iter([f"{T1} b", f"{T2} c"]),
+            iter([]),
+        ]
+        collector = LogCollector(capacity=10, retry_seconds=0.01)
+        with patch("watchdog.logs.get_client", return_value=client), \
+                patch("watchdog.logs.fetch_logs", return_value=f"{T0} a") as fetch:
+            collector.subscribe("web")
+            try:
+                assert _wait_for(lambda: collector.recent("web", 10) == ["a", "b", "c"])
+            finally:
+                collector.stop()
+        fetch.assert_called_once_with("web", None, 10)
+        first, second = client.follow_container_logs.call_args_list[:2]
+        assert first[1] == {"since": "1735732800.000000001", "tail": "all", "handle": ANY}
+        assert second[1] == {"since": "1735732801.500000000", "tail": "all", "handle": ANY}
+        # 回填的历史不算新日志
+        assert collector.read_since("web", None) == (["b", "c"], 3)
+
+    def test_unsubscribe_closes_idle_stream(self):
+        """没有输出的 follow 长连接在取消订阅时被断开，收集线程随即退出"""
+        reader, writer = socket.socketpair()
+        connected = threading.Event()
+
+        def follow(container_name, since=None, tail="all", handle=None):
+            conn = MagicMock(sock=reader)
+            assert handle.attach(conn)
+            connected.set()
+            while reader.recv(1024):
+                pass
+            yield from ()
+
+        client = MagicMock()
+        client.follow_container_logs.side_effect = follow
+        collector = LogCollector(capacity=10, retry_seconds=0.01)
+        try:
+            with patch("watchdog.logs.get_client", return_value=client), \
+                    patch("watchdog.logs.fetch_logs", return_value=""):
+                collector.subscribe("web")
+                thread = collector._threads["web"]
+                assert connected.wait(2)
+                collector.unsubscribe("web")
+                thread.join(2)
+                assert not thread.is_alive()
+        finally:
+            reader.close()
+            writer.close()
+
+    def test_stream_handle(self):
+        handle = StreamHandle()
+        conn = MagicMock()
+        assert handle.attach(conn)
+        handle.close()
+        conn.sock.shutdown.assert_called_once_with(socket.SHUT_RDWR)
+        assert not handle.attach(MagicMock())
+
+
+class TestSecurityProbe:
+    """安全探测增量扫描测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def test_attack_line_reported_once(self):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor._report_issue = MagicMock(return_value=True)
+        outputs = [
+            f"{T0} GET /?id=1 UNION SELECT password",
+            f"{T0} GET /?id=1 UNION SELECT password\n{T1} GET /index.html",
+        ]
+        with patch("watchdog.logs.fetch_logs", side_effect=outputs), \
+                patch("watchdog.monitor.security.check_new_processes", return_value=[]):
+            monitor._report_security("web", monitor._probe_security("web"))
+            monitor._report_security("web", monitor._probe_security("web"))
+        monitor._report_issue.assert_called_once_with("web", "SECURITY_LOG_ALERT")
+
+    def test_reads_ring_when_collecting(self):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.log_collector = LogCollector(capacity=10)
+        ring = monitor.log_collector._rings["web"] = LogRing(10)
+        # 回填完成前没有可扫描的新日志
+        ring.extend(["GET /?id=1 UNION SELECT password"])
+        assert monitor._read_new_logs("web") == []
+        ring.mark_backfilled()
+        ring.extend(["a", "b"])
+        assert monitor._read_new_logs("web") == ["a", "b"]
+        ring.extend(["c"])
+        assert monitor._read_new_logs("web") == ["c"]
+        assert monitor._read_new_logs("web") == []
+
+    def test_attack_before_burst_reported(self):
+        """两次探测之间写入超过容量：被覆盖的攻击日志仍上报一次"""
+        from watchdog.monitor import ContainerMonitor
+        from watchdog import security
+        monitor = ContainerMonitor()
+        monitor._report_issue = MagicMock(return_value=True)
+        monitor.log_collector = LogCollector(capacity=1000, scan=security.check_logs_for_injection)
+        ring = monitor.log_collector._rings["web"] = LogRing(1000, monitor.log_collector.scan)
+        ring.mark_backfilled()
+        ring.extend(["GET /?id=1 UNION SELECT password"])
+        ring.extend(f"GET /item/{i} 200" for i in range(1500))
+        with patch("watchdog.monitor.security.check_new_processes", return_value=[]):
+            findings = monitor._probe_security("web")
+            assert findings["injection_patterns"] == ["UNION SELECT"]
+            monitor._report_security("web", findings)
+            monitor._report_security("web", monitor._probe_security("web"))
+        monitor._report_issue.assert_called_once_with("web", "SECURITY_LOG_ALERT")
+
+    def test_backfill_not_rescanned_after_restart(self):
+        """重启后回填的旧攻击日志不再上报"""
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor._report_issue = MagicMock(return_value=True)
+        monitor.log_collector = LogCollector(capacity=10)
+        ring = monitor.log_collector._rings["web"] = LogRing(10)
+        ring.extend(["GET /?id=1 UNION SELECT password"])
+        ring.mark_backfilled()
+        with patch("watchdog.monitor.security.check_new_processes", return_value=[]):
+            monitor._report_security("web", monitor._probe_security("web"))
+        monitor._report_issue.assert_not_called()
+
+    def test_evidence_logs_from_ring(self):
+        from watchdog.evidence import get_container_logs
+        collector = LogCollector(capacity=10)
+        collector._rings["web"] = LogRing(10)
+        collector._rings["web"].extend(["before crash", "last words"])
+        with patch("watchdog.evidence.get_log_collector", return_value=collector), \
+                patch("watchdog.evidence.try_api") as try_api:
+            assert get_container_logs("web", 1) == "last words"
+        try_api.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -0,0 +1,315 @@
+#!/usr/bin/env python3
+"""
+单元15: 指标环形缓冲测试
+
+测试内容：
+- 环绕写入与按时间顺序读取
+- 窗口视图不复制数据
+- 读取期间被覆盖的样本丢弃（顺序锁）
+- 缺失指标记为 NaN
+- 内存占用
+- 文件映射环形缓冲重启后恢复（过期历史丢弃）
+- 1 分钟 / 1 小时汇总（P² 估计 p95，汇总文件重启后恢复）
+- 趋势引擎基于环形缓冲回归
+"""
+import math
+import random
+import sys
+import pytest
+from pathlib import Path
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from unittest.mock import patch
+
+from watchdog.metrics import (
+    MetricRing, MetricStore, MappedMetricRing, MAX_COLUMNS, RollupRing, RollupStore
+)
+from watchdog.trend import TrendEngine
+
+
+def _fill(ring, count, start=0):
+    for i in range(start, start + count):
+        ring.append(1000.0 + i, {"memory_mb": float(i)})
+
+
+class TestMetricRing:
+    """环形缓冲测试"""
+
+    def test_append_and_points(self):
+        ring = MetricRing(capacity=8)
+        _fill(ring, 3)
+        assert len(ring) == 3
+        assert list(ring.points("memory_mb")) == [(1000.0, 0.0), (1001.0, 1.0), (1002.0, 2.0)]
+
+    def test_wraparound_keeps_order(self):
+        ring = MetricRing(capacity=4)
+        _fill(ring, 6)
+        assert len(ring) == 4
+        assert ring.segments() == [(2, 4), (0, 2)]
+        assert [v for _, v in ring.points("memory_mb")] == [2.0, 3.0, 4.0, 5.0]
+        assert [v for _, v in ring.points("memory_mb", last=3)] == [3.0, 4.0, 5.0]
+
+    def test_window_is_view(self):
+        ring = MetricRing(capacity=4)
+        _fill(ring, 2)
+        (times, values), = ring.window("memory_mb")
+        assert isinstance(values, memoryview)
+        assert values.format == "f" and times.format == "q"
+        ring.values["memory_mb"][0] = 42.0
+        assert values[0] == 42.0
+
+    def test_overwrite_during_read_dropped(self):
+        """读取期间写者覆盖最旧的槽位，被覆盖的样本不返回"""
+        ring = MetricRing(capacity=4)
+        _fill(ring, 4)
+        segments = MetricRing.segments
+
+        def racing_segments(self, last=None):
+            result = segments(self, last)
+            _fill(self, 2, start=4)
+            return result
+        with patch.object(MetricRing, "segments", autospec=True, side_effect=racing_segments):
+            assert [v for _, v in ring.points("memory_mb")] == [2.0, 3.0]
+
+    def test_write_after_window_not_dropped(self):
+        ring = MetricRing(capacity=8)
+        _fill(ring, 4)
+        segments = MetricRing.segments
+
+        def racing_segments(self, last=None):
+            result = segments(self, last)
+            _fill(self, 2, start=4)
+            return result
+        with patch.object(MetricRing, "segments", autospec=True, side_effect=racing_segments):
+            assert [v for _, v in ring.points("memory_mb")] == [0.0, 1.0, 2.0, 3.0]
+
+    def test_missing_metric_is_nan(self):
+        ring = MetricRing(capacity=4)
+        ring.append(1.0, {"memory_mb": 1.0})
+        ring.append(2.0, {"memory_mb": 2.0, "cpu_percent": 5.0})
+        ring.append(3.0, {"memory_mb": 3.0, "cpu_percent": None})
+        assert math.isnan(ring.values["cpu_percent"][0])
+        assert list(ring.points("cpu_percent")) == [(2.0, 5.0)]
+        assert ring.latest("cpu_percent") is None
+        assert ring.latest("memory_mb") == (3.0, 3.0)
+
+    def test_footprint(self):
+        """1 小时 1 秒采样、5 项指标约 100KB"""
+        ring = MetricRing(capacity=3600)
+        ring.append(0.0, {m: 0.0 for m in ("a", "b", "c", "d", "e")})
+        assert ring.nbytes() == 3600 * (8 + 5 * 4)
+
+
+class TestMetricStore:
+    """指标存储测试"""
+
+    def test_per_container(self):
+        store = MetricStore(capacity=16)
+        store.append("web", {"memory_mb": 1.0}, timestamp=1.0)
+        store.append("db", {"memory_mb": 2.0}, timestamp=1.0)
+        assert sorted(store.names()) == ["db", "web"]
+        assert list(store.points("db", "memory_mb")) == [(1.0, 2.0)]
+        assert list(store.points("missing", "memory_mb")) == []
+        store.forget("db")
+        assert store.names() == ["web"]
+
+
+class TestMappedRing:
+    """文件映射环形缓冲测试"""
+
+    def test_reopen_restores_history(self, tmp_path):
+        path = str(tmp_path / "web.ring")
+        ring = MappedMetricRing(path, capacity=4)
+        _fill(ring, 6)
+        ring.append(2000.0, {"memory_mb": 9.0, "cpu_percent": 1.5})
+        ring.close()
+
+        reopened = MappedMetricRing(path, capacity=4)
+        assert len(reopened) == 4
+        assert [v for _, v in reopened.points("memory_mb")] == [3.0, 4.0, 5.0, 9.0]
+        assert list(reopened.points("cpu_percent")) == [(2000.0, 1.5)]
+        reopened.close()
+
+    def test_capacity_change_reinitializes(self, tmp_path):
+        path = str(tmp_path / "web.ring")
+        ring = MappedMetricRing(path, capacity=4)
+        _fill(ring, 2)
+        ring.close()
+
+        resized = MappedMetricRing(path, capacity=8)
+        assert len(resized) == 0
+        assert resized.values == {}
+        resized.close()
+
+    def test_too_many_columns(self, tmp_path):
+        ring = MappedMetricRing(str(tmp_path / "web.ring"), capacity=4)
+        ring.append(1.0, {f"m{i}": float(i) for i in range(MAX_COLUMNS + 2)})
+        assert ring.latest(f"m{MAX_COLUMNS + 1}") == (1.0, float(MAX_COLUMNS + 1))
+        ring.close()
+
+        reopened = MappedMetricRing(str(tmp_path / "web.ring"), capacity=4)
+        assert len(reopened.values) == MAX_COLUMNS
+        reopened.close()
+
+    def test_store_maps_existing_files(self, tmp_path):
+        directory = str(tmp_path / "metrics")
+        store = MetricStore(capacity=16, directory=directory)
+        store.append("web", {"memory_mb": 1.0}, timestamp=1.0)
+        store.append("db", {"memory_mb": 2.0}, timestamp=1.0)
+        store.close()
+
+        restored = MetricStore(capacity=16, directory=directory)
+        assert sorted(restored.names()) == ["db", "web"]
+        assert list(restored.points("web", "memory_mb")) == [(1.0, 1.0)]
+
+        restored.forget("db")
+        assert not (tmp_path / "metrics" / "db.ring").exists()
+        restored.close()
+
+    def test_store_drops_stale_history(self, tmp_path):
+        """恢复的历史中早于 max_age 的样本不参与回归，也不重放到汇总"""
+        directory = str(tmp_path / "metrics")
+        store = MetricStore(capacity=16, directory=directory)
+        with patch("watchdog.metrics.time.time", return_value=10000.0):
+            store.append("web", {"memory_mb": 1.0}, timestamp=1000.0)
+            store.append("web", {"memory_mb": 2.0}, timestamp=9500.0)
+            store.append("db", {"memory_mb": 3.0}, timestamp=1000.0)
+            store.close()
+
+            restored = MetricStore(capacity=16, directory=directory, max_age=3600)
+        assert list(restored.points("web", "memory_mb")) == [(9500.0, 2.0)]
+        assert list(restored.points("db", "memory_mb")) == []
+        # 已封闭的 1000s 桶来自汇总文件，9500s 的样本只重放一次
+        assert [(row.start, row.count) for row in restored.rollups.rows("web", "memory_mb", "1m")] == [
+            (960, 1), (9480, 1)
+        ]
+
+        restored.append("db", {"memory_mb": 4.0}, timestamp=10000.0)
+        assert list(restored.points("db", "memory_mb")) == [(10000.0, 4.0)]
+        restored.close()
+
+
+class TestRollups:
+    """多级汇总测试"""
+
+    def test_bucket_stats(self):
+        ring = RollupRing(bucket_seconds=60, capacity=4)
+        for second, value in enumerate(range(1, 21)):
+            ring.add(second, float(value))
+        ring.add(60, 100.0)
+
+        closed, current = ring.rows()
+        assert (closed.start, closed.count, closed.min, closed.max) == (0, 20, 1.0, 20.0)
+        assert closed.mean == pytest.approx(10.5)
+        assert closed.min <= closed.p95 <= closed.max
+        assert (current.start, current.count, current.mean) == (60, 1, 100.0)
+        assert ring.rows(include_open=False) == [closed]
+
+    def test_p95_estimate(self):
+        """p95 用 P² 估计，不保存桶内样本"""
+        values = list(range(1, 1001))
+        random.Random(0).shuffle(values)
+        ring = RollupRing(bucket_seconds=3600, capacity=4)
+        for second, value in enumerate(values):
+            ring.add(second, float(value))
+        assert ring.rows()[0].p95 == pytest.approx(950, rel=0.02)
+
+    def test_bounded_retention(self):
+        ring = RollupRing(bucket_seconds=60, capacity=3)
+        for minute in range(10):
+            ring.add(minute * 60, float(minute))
+        starts = [row.start for row in ring.rows()]
+        assert starts == [360, 420, 480, 540]
+        assert [row.start for row in ring.rows(since=450)] == [480, 540]
+
+    def test_late_sample_dropped(self):
+        ring = RollupRing(bucket_seconds=60, capacity=3)
+        ring.add(120, 1.0)
+        ring.add(30, 99.0)
+        assert [(row.start, row.max) for row in ring.rows()] == [(120, 1.0)]
+
+    def test_store_summary(self):
+        rollups = RollupStore()
+        for second in range(0, 7200, 10):
+            rollups.observe("web", {"cpu_percent": 10.0 if second < 3600 else 30.0}, float(second))
+        hourly = rollups.rows("web", "cpu_percent", "1h")
+        assert [row.start for row in hourly] == [0, 3600]
+        summary = rollups.summary("web", "cpu_percent", "1h")
+        assert summary["mean"] == pytest.approx(20.0)
+        assert (summary["min"], summary["max"], summary["p95"]) == (10.0, 30.0, 30.0)
+        assert len(rollups.recent("web", "cpu_percent", "1m", 600)) == 11
+
+    def test_metric_store_feeds_rollups(self, tmp_path):
+        directory = str(tmp_path / "metrics")
+        store = MetricStore(capacity=64, directory=directory)
+        for minute in range(5):
+            store.append("web", {"memory_mb": float(minute)}, timestamp=minute * 60.0)
+        assert len(store.rollups.rows("web", "memory_mb", "1m")) == 5
+        store.close()
+
+        # 重启后已封闭的桶从汇总文件恢复，未封闭的桶由原始历史重放补齐，不重复计入
+        restored = MetricStore(capacity=64, directory=directory)
+        assert [(row.mean, row.count) for row in restored.rollups.rows("web", "memory_mb", "1m")] == [
+            (0, 1), (1, 1), (2, 1), (3, 1), (4, 1)
+        ]
+        restored.close()
+
+    def test_rollups_outlive_raw_history(self, tmp_path):
+        """原始环形缓冲已覆盖的样本，其汇总仍从文件恢复"""
+        directory = str(tmp_path / "metrics")
+        store = MetricStore(capacity=4, directory=directory)
+        for hour in range(6):
+            store.append("web", {"cpu_percent": float(hour)}, timestamp=hour * 3600.0)
+        store.close()
+        assert (tmp_path / "metrics" / "web.rollup").exists()
+
+        restored = MetricStore(capacity=4, directory=directory)
+        assert [row.mean for row in restored.rollups.rows("web", "cpu_percent", "1h")] == [0, 1, 2, 3, 4, 5]
+        restored.forget("web")
+        assert not (tmp_path / "metrics" / "web.rollup").exists()
+        restored.close()
+
+    def test_daily_resource_summary(self):
+        from watchdog import reporting
+        store = MetricStore(capacity=64)
+        now = reporting.time.time()
+        store.append("web", {"cpu_percent": 20.0, "memory_percent": 40.0}, timestamp=now - 60)
+        store.append("web", {"cpu_percent": 40.0, "memory_percent": 50.0}, timestamp=now)
+        with patch("watchdog.reporting.get_metric_store", return_value=store):
+            summary = reporting.resource_summary(24)
+        assert summary["web"]["cpu_percent"]["max"] == 40.0
+        assert summary["web"]["memory_percent"]["min"] == 40.0
+        assert "memory_mb" not in summary["web"]
+
+
+class TestTrendOnRing:
+    """趋势引擎测试"""
+
+    def test_fit_uses_recent_window(self):
+        engine = TrendEngine(MetricStore(capacity=64), window=5)
+        # 前段平稳，最近 5 个样本每分钟增长 10MB
+        for minute in range(10):
+            engine.observe("web", {"memory_mb": 100.0}, timestamp=minute * 60.0)
+        for minute in range(10, 15):
+            engine.observe("web", {"memory_mb": 100.0 + 10 * (minute - 9)}, timestamp=minute * 60.0)
+        fit = engine.fit("web", "memory_mb")
+        assert fit.samples == 5
+        assert fit.slope == pytest.approx(10.0)
+        assert fit.r2 == pytest.approx(1.0)
+        assert set(engine.fits("web")) == {"memory_mb"}
+
+    def test_fit_rollup(self):
+        engine = TrendEngine(MetricStore(capacity=64))
+        # 每分钟 6 个样本，分钟内抖动，分钟均值每分钟增长 5MB
+        for minute in range(10):
+            for i, jitter in enumerate((-20, 20, -10, 10, 0, 0)):
+                engine.observe("web", {"memory_mb": 100.0 + 5 * minute + jitter}, timestamp=minute * 60.0 + i * 10)
+        fit = engine.fit_rollup("web", "memory_mb", "1m", 3600)
+        assert fit.samples == 10
+        assert fit.slope == pytest.approx(5.0)
+        assert fit.r2 == pytest.approx(1.0)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -7,10 +7,12 @@
 - 熔断机制
 - 去重逻辑
 - 证据收集集成
+- 并发上报只提交一次诊断，提交失败释放名额
 """
 import os
 import sys
 import time
+import threading
 import pytest
 from pathlib import Path
 from datetime import datetime, timedelta
@@ -54,6 +56,34 @@ class TestReportIssue:
         call_args = mock_diagnosis.call_args
         assert call_args[1]['async_mode'] == True
 
+    @patch('watchdog.agent.run_diagnosis')
+    @patch('watchdog.monitor.collect_evidence')
+    def test_concurrent_reports_deduped(self, mock_evidence, mock_diagnosis):
+        """测试证据收集期间其他线程对同一容器的上报被去重"""
+        def slow_evidence(*args):
+            time.sleep(0.2)
+            return {}
+        mock_evidence.side_effect = slow_evidence
+        monitor = ContainerMonitor()
+        threads = [threading.Thread(target=monitor._report_issue, args=("web", fault))
+                   for fault in ("CPU_HIGH", "HEALTH_FAIL", "PROCESS_CRASH", "MEMORY_HIGH")]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        mock_diagnosis.assert_called_once()
+
+    @patch('watchdog.agent.run_diagnosis')
+    @patch('watchdog.monitor.collect_evidence', side_effect=[RuntimeError("docker down"), {}])
+    def test_failed_report_releases_slot(self, mock_evidence, mock_diagnosis):
+        """测试提交失败后不占用去重/熔断名额"""
+        monitor = ContainerMonitor()
+        assert monitor._report_issue("web", "CPU_HIGH") is False
+        assert "web" not in monitor.last_report_time
+        assert monitor.report_history.get("web") == []
+        assert monitor._report_issue("web", "CPU_HIGH") is True
+        mock_diagnosis.assert_called_once()
+
 
 class TestCircuitBreaker:
     """熔断机制测试"""
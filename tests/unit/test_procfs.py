@@ -0,0 +1,310 @@
+#!/usr/bin/env python3
+"""
+单元20: /proc 进程检查测试
+
+测试内容：
+- cgroup.procs（含子 cgroup）列出 PID
+- cmdline 读取（NUL 分隔、空 cmdline 取 comm）
+- 每个 PID 只读取一次，退出的 PID 移出缓存
+- 规则变化后缓存失效
+- security.backend=proc 时不调用 docker top
+- 进程快照差异：(pid, 启动时间) 标识、PID 复用、execve 换程序、规则变化
+- docker top 输出解析
+- 同一个恶意进程只上报一次；上报被跳过时下一轮重新上报
+- /proc/net/tcp{,6} 地址解码与连接统计
+"""
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import MagicMock, patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.matcher import PatternMatcher
+from watchdog.procfs import (
+    ProcessInspector, ProcessTracker, decode_net_address, parse_net_connections, read_cgroup_pids
+)
+
+BLACKLIST = PatternMatcher({"process_blacklist": ["xmrig", "nc -e", "bash -i"]})
+
+
+def _proc(proc_root: Path, pid: int, cmdline: bytes, comm: bytes = b"", start: int = 100, exe: str = None):
+    directory = proc_root / str(pid)
+    directory.mkdir(parents=True, exist_ok=True)
+    (directory / "cmdline").write_bytes(cmdline)
+    (directory / "comm").write_bytes(comm)
+    if exe is not None:
+        if (directory / "exe").is_symlink():
+            (directory / "exe").unlink()
+        (directory / "exe").symlink_to(exe)
+    # starttime 为第 22 项；comm 中的空格和括号不影响解析
+    fields = ["S"] + ["0"] * 18 + [str(start), "0", "0"]
+    (directory / "stat").write_text(f"{pid} (a (b) c) " + " ".join(fields) + "\n")
+
+
+@pytest.fixture
+def container(tmp_path):
+    cgroup = tmp_path / "cgroup" / "docker-abc.scope"
+    (cgroup / "init.scope").mkdir(parents=True)
+    (cgroup / "cgroup.procs").write_text("10\n11\n")
+    (cgroup / "init.scope" / "cgroup.procs").write_text("12\n")
+    proc_root = tmp_path / "proc"
+    _proc(proc_root, 10, b"/usr/bin/python\0app.py\0")
+    _proc(proc_root, 11, b"nc\0-e\0/bin/sh\0")
+    _proc(proc_root, 12, b"", b"xmrig\n")
+    sampler = MagicMock()
+    sampler.resolve.return_value = str(cgroup)
+    return ProcessInspector(sampler, str(proc_root)), cgroup, proc_root
+
+
+class TestProcessInspector:
+    """进程检查测试"""
+
+    def test_pids_include_child_cgroups(self, container):
+        _, cgroup, _ = container
+        assert sorted(read_cgroup_pids(str(cgroup))) == [10, 11, 12]
+
+    def test_cmdline(self, container):
+        inspector, _, _ = container
+        assert inspector.cmdline(11) == "nc -e /bin/sh"
+        assert inspector.cmdline(12) == "xmrig"
+        assert inspector.cmdline(99) is None
+
+    def test_scan(self, container):
+        inspector, _, _ = container
+        assert sorted(inspector.scan("web", BLACKLIST)) == ["nc -e", "xmrig"]
+
+    def test_only_new_pids_read(self, container):
+        inspector, cgroup, proc_root = container
+        inspector.scan("web", BLACKLIST)
+        (cgroup / "cgroup.procs").write_text("10\n13\n")
+        _proc(proc_root, 13, b"bash\0-i\0")
+        with patch.object(inspector, "cmdline", wraps=inspector.cmdline) as cmdline:
+            assert sorted(inspector.scan("web", BLACKLIST)) == ["bash -i", "xmrig"]
+        cmdline.assert_called_once_with(13)
+        assert sorted(pid for pid, _ in inspector._cache["web"]) == [10, 12, 13]
+
+    def test_rules_change_invalidates_cache(self, container):
+        inspector, _, _ = container
+        inspector.scan("web", BLACKLIST)
+        assert inspector.scan("web", PatternMatcher({"p": ["python"]})) == ["python"]
+
+    def test_start_time(self, container):
+        inspector, _, proc_root = container
+        _proc(proc_root, 20, b"sleep\0", start=4242)
+        assert inspector.start_time(20) == "4242"
+        assert inspector.start_time(99) is None
+
+    def test_pid_reuse_rereads_cmdline(self, container):
+        inspector, cgroup, proc_root = container
+        inspector.processes("web")
+        # PID 11 退出后被新进程复用
+        _proc(proc_root, 11, b"sleep\0", start=200)
+        assert inspector.processes("web")[(11, "200")] == "sleep"
+
+    def test_execve_rereads_cmdline(self, container):
+        """execve 换成黑名单程序时 (pid, 启动时间) 不变，按可执行文件变化重新读取并匹配"""
+        inspector, _, proc_root = container
+        _proc(proc_root, 10, b"/bin/sh\0-c\0start.sh\0", exe="/bin/sh")
+        assert sorted(inspector.scan("web", BLACKLIST)) == ["nc -e", "xmrig"]
+        with patch.object(inspector, "cmdline", wraps=inspector.cmdline) as cmdline:
+            inspector.scan("web", BLACKLIST)
+        cmdline.assert_not_called()
+
+        _proc(proc_root, 10, b"/tmp/xmrig\0--donate-level=1\0", exe="/tmp/xmrig")
+        assert sorted(inspector.scan("web", BLACKLIST)) == ["nc -e", "xmrig", "xmrig"]
+        assert inspector.processes("web")[(10, "100")] == "/tmp/xmrig --donate-level=1"
+
+    def test_unresolved_container(self, container):
+        inspector, _, _ = container
+        inspector.sampler.resolve.return_value = None
+        assert inspector.scan("web", BLACKLIST) is None
+
+
+class TestCheckProcesses:
+    """security.check_processes 后端选择测试"""
+
+    def test_proc_backend_skips_docker_top(self, container):
+        from watchdog import security
+        inspector, _, _ = container
+        with patch("watchdog.security.get_process_inspector", return_value=inspector), \
+                patch("watchdog.security.try_api") as try_api:
+            assert "xmrig" in security.check_processes("web")
+        try_api.assert_not_called()
+
+
+class TestProcessTracker:
+    """进程快照差异测试"""
+
+    def test_diff(self):
+        tracker = ProcessTracker()
+        delta = tracker.diff("web", {(1, "100"): "init", (2, "100"): "app"})
+        assert sorted(delta.spawned) == [(1, "100"), (2, "100")]
+        delta = tracker.diff("web", {(1, "100"): "init", (3, "150"): "xmrig"})
+        assert delta.spawned == {(3, "150"): "xmrig"}
+        assert delta.exited == {(2, "100"): "app"}
+        assert tracker.diff("web", {(1, "100"): "init", (3, "150"): "xmrig"}).spawned == {}
+
+    def test_pid_reuse_is_new_process(self):
+        tracker = ProcessTracker()
+        tracker.diff("web", {(2, "100"): "app"})
+        delta = tracker.diff("web", {(2, "300"): "nc -e /bin/sh"})
+        assert delta.spawned == {(2, "300"): "nc -e /bin/sh"}
+        assert delta.exited == {(2, "100"): "app"}
+
+    def test_execve_is_new_process(self):
+        tracker = ProcessTracker()
+        tracker.diff("web", {(2, "100"): "/bin/sh -c start.sh"})
+        delta = tracker.diff("web", {(2, "100"): "/tmp/xmrig"})
+        assert delta.spawned == {(2, "100"): "/tmp/xmrig"}
+        assert delta.exited == {}
+
+    def test_token_change_respawns_all(self):
+        tracker = ProcessTracker()
+        tracker.diff("web", {(1, "100"): "init"}, token="v1")
+        assert tracker.diff("web", {(1, "100"): "init"}, token="v1").spawned == {}
+        assert tracker.diff("web", {(1, "100"): "init"}, token="v2").spawned == {(1, "100"): "init"}
+
+
+class TestNewProcesses:
+    """边沿触发的恶意进程检查测试"""
+
+    TOP = {
+        "Titles": ["UID", "PID", "PPID", "C", "STIME", "TTY", "TIME", "CMD"],
+        "Processes": [
+            ["root", "10", "1", "0", "12:00", "?", "00:00:00", "python app.py"],
+            ["root", "11", "10", "0", "12:05", "?", "00:00:01", "nc -e /bin/sh"],
+        ],
+    }
+
+    def test_list_processes_from_docker_top(self):
+        from watchdog import security
+        with patch("watchdog.security.get_process_inspector", return_value=None), \
+                patch("watchdog.security.try_api", return_value=self.TOP):
+            assert security.list_processes("web") == {
+                (10, "python app.py"): "python app.py",
+                (11, "nc -e /bin/sh"): "nc -e /bin/sh",
+            }
+
+    def test_docker_top_stime_rollover_not_new(self):
+        """STIME 跨天从 HH:MM 变为日期时，长期运行的恶意进程不重新上报"""
+        from watchdog import security
+        tracker = ProcessTracker()
+        next_day = {
+            "Titles": self.TOP["Titles"],
+            "Processes": [row[:4] + ["Jan01"] + row[5:] for row in self.TOP["Processes"]],
+        }
+        with patch("watchdog.security.get_process_inspector", return_value=None), \
+                patch("watchdog.security.try_api", return_value=self.TOP):
+            assert security.check_new_processes("web", tracker) == ["nc -e"]
+            tracker.acknowledge("web")
+        with patch("watchdog.security.get_process_inspector", return_value=None), \
+                patch("watchdog.security.try_api", return_value=next_day):
+            assert security.check_new_processes("web", tracker) == []
+
+    def test_list_processes_from_cli(self):
+        from watchdog import security
+        from watchdog.docker_api import API_UNAVAILABLE
+        stdout = (
+            "UID  PID  PPID  C  STIME  TTY  TIME      CMD\n"
+            "root 11   10    0  12:05  ?    00:00:01  nc -e /bin/sh\n"
+        )
+        with patch("watchdog.security.get_process_inspector", return_value=None), \
+                patch("watchdog.security.try_api", return_value=API_UNAVAILABLE), \
+                patch("watchdog.security.run_command", return_value=(0, stdout, "")):
+            assert security.list_processes("web") == {(11, "nc -e /bin/sh"): "nc -e /bin/sh"}
+
+    def test_reported_once(self, container):
+        from watchdog import security
+        inspector, cgroup, proc_root = container
+        tracker = ProcessTracker()
+        with patch("watchdog.security.get_process_inspector", return_value=inspector):
+            assert sorted(security.check_new_processes("web", tracker)) == ["nc -e", "xmrig"]
+            tracker.acknowledge("web")
+            assert security.check_new_processes("web", tracker) == []
+            (cgroup / "cgroup.procs").write_text("10\n11\n13\n")
+            _proc(proc_root, 13, b"bash\0-i\0")
+            assert security.check_new_processes("web", tracker) == ["bash -i"]
+
+    def test_unacknowledged_reported_again(self, container):
+        """上报被跳过（未确认）时仍在运行的恶意进程下一轮继续返回，已退出的不再返回"""
+        from watchdog import security
+        inspector, cgroup, _ = container
+        tracker = ProcessTracker()
+        with patch("watchdog.security.get_process_inspector", return_value=inspector):
+            assert sorted(security.check_new_processes("web", tracker)) == ["nc -e", "xmrig"]
+            (cgroup / "cgroup.procs").write_text("10\n12\n")
+            assert security.check_new_processes("web", tracker) == ["xmrig"]
+            tracker.acknowledge("web")
+            assert security.check_new_processes("web", tracker) == []
+
+    def test_suppressed_report_retried(self, container):
+        """首次上报被熔断/去重跳过时，下一轮安全检查重新上报"""
+        from watchdog.config import init_config
+        from watchdog.monitor import ContainerMonitor
+        init_config()
+        inspector, _, _ = container
+        monitor = ContainerMonitor()
+        monitor._report_issue = MagicMock(side_effect=lambda name, fault_type: fault_type == "MALICIOUS_PROCESS"
+                                          and monitor._report_issue.call_count > 1)
+        with patch("watchdog.security.get_process_inspector", return_value=inspector), \
+                patch.object(monitor, "_read_new_logs", return_value=[]):
+            for _ in range(3):
+                monitor._report_security("web", monitor._probe_security("web"))
+        assert [c.args for c in monitor._report_issue.call_args_list] == [("web", "MALICIOUS_PROCESS")] * 2
+
+
+TCP = """  sl  local_address rem_address   st tx_queue rx_queue tr tm->when retrnsmt   uid  timeout inode
+   0: 0200A8C0:0050 0501A8C0:D431 01 00000000:00000000 00:00000000 00000000     0        0 1 1
+   1: 0200A8C0:0050 0501A8C0:D432 01 00000000:00000000 00:00000000 00000000     0        0 2 1
+   2: 0100007F:1F90 0100007F:A000 01 00000000:00000000 00:00000000 00000000     0        0 3 1
+   3: 00000000:0050 00000000:0000 0A 00000000:00000000 00:00000000 00000000     0        0 4 1
+   4: 0200A8C0:0050 0100000A:D433 06 00000000:00000000 00:00000000 00000000     0        0 5 1
+"""
+TCP6 = """  sl  local_address                         remote_address                        st tx_queue rx_queue
+   0: 00000000000000000000000000000000:0050 0000000000000000FFFF00000100000A:D431 01 00000000:00000000
+   1: 00000000000000000000000000000000:0050 B80D0120000000000000000001000000:D432 01 00000000:00000000
+   2: 00000000000000000000000001000000:0050 00000000000000000000000001000000:D433 01 00000000:00000000
+"""
+
+
+class TestNetConnections:
+    """/proc/net 连接统计测试"""
+
+    def test_decode(self):
+        assert decode_net_address("0501A8C0") == "192.168.1.5"
+        assert decode_net_address("0000000000000000FFFF00000100000A") == "10.0.0.1"
+        assert decode_net_address("B80D0120000000000000000001000000") == "2001:db8::1"
+
+    def test_parse_established_only(self):
+        # 回环、LISTEN(0A)、TIME_WAIT(06) 不计入
+        assert parse_net_connections(TCP) == {"192.168.1.5": 2}
+        assert parse_net_connections(TCP6, {"10.0.0.1": 1}) == {"10.0.0.1": 2, "2001:db8::1": 1}
+
+    def test_inspector_connections(self, container):
+        inspector, _, proc_root = container
+        net = proc_root / "10" / "net"
+        net.mkdir()
+        (net / "tcp").write_text(TCP)
+        (net / "udp").write_text(TCP.splitlines()[0] + "\n")
+        # 未启用 IPv6 时没有 tcp6/udp6
+        assert inspector.connections("web") == {"192.168.1.5": 2}
+        (net / "tcp6").write_text(TCP6)
+        (net / "udp6").write_text("")
+        assert inspector.connections("web") == {"192.168.1.5": 2, "10.0.0.1": 1, "2001:db8::1": 1}
+
+    def test_evidence_skips_exec(self, container):
+        from watchdog.evidence import get_network_connections
+        inspector, _, proc_root = container
+        net = proc_root / "10" / "net"
+        net.mkdir()
+        for table in ("tcp", "udp"):
+            (net / table).write_text(TCP)
+        with patch("watchdog.security.get_process_inspector", return_value=inspector), \
+                patch("watchdog.evidence.docker_exec") as docker_exec:
+            assert get_network_connections("web") == {"192.168.1.5": 4}
+        docker_exec.assert_not_called()
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
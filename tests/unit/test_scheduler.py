@@ -0,0 +1,235 @@
+#!/usr/bin/env python3
+"""
+单元13: 健康检查调度器测试
+
+测试内容：
+- 时间轮调度、取消、跨圈任务
+- 每容器独立间隔与首轮错开
+- 未结束的探测跳过并按超时处理（排队时间不计入超时）
+- 调度器运行时的健康检查结果上报
+- 间隔不小于超时；关闭调度器时由存活检查执行健康检查
+"""
+import sys
+import time
+import pytest
+from concurrent.futures import Future
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.config import init_config, ContainerConfig
+from watchdog.scheduler import TimerWheel, HealthScheduler
+from watchdog.monitor import _Probe
+
+
+def _advance(wheel, ticks):
+    fired = []
+    for _ in range(ticks):
+        fired.extend(key for key, _ in wheel.advance())
+    return fired
+
+
+def _done_future(result=None):
+    future = Future()
+    future.set_result(result)
+    return future
+
+
+class TestTimerWheel:
+    """时间轮测试"""
+
+    def test_fires_after_delay(self):
+        wheel = TimerWheel(tick_seconds=1, wheel_size=8)
+        wheel.schedule("a", 3)
+        assert _advance(wheel, 2) == []
+        assert _advance(wheel, 1) == ["a"]
+        assert len(wheel) == 0
+
+    def test_multiple_rounds(self):
+        wheel = TimerWheel(tick_seconds=1, wheel_size=4)
+        wheel.schedule("a", 10)
+        assert _advance(wheel, 9) == []
+        assert _advance(wheel, 1) == ["a"]
+
+    def test_cancel_and_reschedule(self):
+        wheel = TimerWheel(tick_seconds=1, wheel_size=8)
+        wheel.schedule("a", 2)
+        wheel.cancel("a")
+        assert _advance(wheel, 8) == []
+
+        wheel.schedule("b", 2)
+        wheel.schedule("b", 5)
+        assert _advance(wheel, 4) == []
+        assert _advance(wheel, 1) == ["b"]
+
+
+class TestHealthScheduler:
+    """调度器测试"""
+
+    def test_independent_intervals(self):
+        dispatch = MagicMock(side_effect=lambda name, cfg: _done_future())
+        scheduler = HealthScheduler(dispatch, tick_seconds=1, wheel_size=16)
+        scheduler.add("fast", {"interval_seconds": 2, "timeout_seconds": 1}, initial_delay=2)
+        scheduler.add("slow", {"interval_seconds": 5, "timeout_seconds": 1}, initial_delay=5)
+
+        for _ in range(10):
+            scheduler.tick()
+
+        names = [call.args[0] for call in dispatch.call_args_list]
+        assert names.count("fast") == 5
+        assert names.count("slow") == 2
+
+    def test_initial_offsets_spread(self):
+        dispatch = MagicMock(side_effect=lambda name, cfg: _done_future())
+        scheduler = HealthScheduler(dispatch, default_interval=4, tick_seconds=1, wheel_size=16)
+        scheduler.add_all({f"c{i}": {"timeout_seconds": 1} for i in range(4)})
+
+        fired_per_tick = []
+        for _ in range(4):
+            dispatch.reset_mock()
+            scheduler.tick()
+            fired_per_tick.append(dispatch.call_count)
+        assert fired_per_tick == [1, 1, 1, 1]
+
+    def test_jitter_bounds(self):
+        scheduler = HealthScheduler(MagicMock(), tick_seconds=0.5)
+        delays = [scheduler._next_delay({"interval_seconds": 10, "jitter_seconds": 2}) for _ in range(200)]
+        assert all(8 <= d <= 12 for d in delays)
+        assert len(set(delays)) > 1
+
+    def test_interval_not_below_timeout(self):
+        scheduler = HealthScheduler(MagicMock(), tick_seconds=0.5)
+        config = {"interval_seconds": 2, "timeout_seconds": 10, "jitter_seconds": 1}
+        assert scheduler.interval_of(config) == 10
+        assert all(scheduler._next_delay(config) >= 10 for _ in range(50))
+
+    def test_overrun_skips_and_reports(self):
+        pending = Future()
+        dispatch = MagicMock(return_value=pending)
+        on_overrun = MagicMock()
+        scheduler = HealthScheduler(dispatch, tick_seconds=1, wheel_size=8, on_overrun=on_overrun)
+        scheduler.add("web", {"interval_seconds": 1, "timeout_seconds": 1}, initial_delay=1)
+
+        scheduler.tick()
+        scheduler.tick()
+        assert dispatch.call_count == 1
+        on_overrun.assert_called_once_with("web")
+
+        pending.set_result({"healthy": True})
+        scheduler.tick()
+        assert dispatch.call_count == 2
+
+    def test_remove(self):
+        dispatch = MagicMock(side_effect=lambda name, cfg: _done_future())
+        scheduler = HealthScheduler(dispatch, tick_seconds=1, wheel_size=8)
+        scheduler.add("web", {"interval_seconds": 1}, initial_delay=1)
+        scheduler.remove("web")
+        for _ in range(3):
+            scheduler.tick()
+        dispatch.assert_not_called()
+
+    def test_thread_runs(self):
+        dispatch = MagicMock(side_effect=lambda name, cfg: _done_future())
+        scheduler = HealthScheduler(dispatch, tick_seconds=0.05)
+        scheduler.add("web", {"interval_seconds": 0.05, "timeout_seconds": 0.05}, initial_delay=0.05)
+        scheduler.start()
+        time.sleep(0.5)
+        scheduler.stop()
+        assert dispatch.call_count >= 3
+
+
+class TestMonitorIntegration:
+    """监控集成测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.config.containers = [
+            ContainerConfig(name="web", health_check={"type": "command", "command": "true"})
+        ]
+        monitor.state_table.apply_inspect("web", {"running": True, "status": "running"})
+        monitor._report_issue = MagicMock()
+        return monitor
+
+    @patch('watchdog.monitor.check_container_health')
+    def test_unhealthy_result_reported(self, mock_health):
+        mock_health.return_value = {"healthy": False, "message": "down"}
+        monitor = self._monitor()
+
+        future = monitor._dispatch_health_check("web", monitor.config.containers[0].health_check)
+        future.result(timeout=2)
+        # 上报在线程池中异步执行
+        deadline = time.monotonic() + 2
+        while not monitor._report_issue.called and time.monotonic() < deadline:
+            time.sleep(0.01)
+        monitor.stop()
+
+        monitor._report_issue.assert_called_once_with("web", "HEALTH_FAIL")
+
+    @patch('watchdog.monitor.check_container_health')
+    def test_stopped_container_not_probed(self, mock_health):
+        monitor = self._monitor()
+        monitor.state_table.apply_inspect("web", {"running": False, "status": "exited"})
+        assert monitor._dispatch_health_check("web", {"type": "command"}) is None
+        mock_health.assert_not_called()
+        monitor.stop()
+
+    def test_overrun_while_queued_not_reported(self):
+        monitor = self._monitor()
+        monitor._report_async = MagicMock()
+        # 探测仍在线程池队列中，尚未开始执行
+        monitor._health_probes["web"] = _Probe(MagicMock(), 7)
+        monitor._on_health_overrun("web")
+        monitor._report_async.assert_not_called()
+
+        # 已开始执行但未超过 deadline
+        monitor._health_probes["web"] = _Probe(MagicMock(), 7, time.monotonic())
+        monitor._on_health_overrun("web")
+        monitor._report_async.assert_not_called()
+
+        # 开始执行后超过 deadline
+        monitor._health_probes["web"] = _Probe(MagicMock(), 7, time.monotonic() - 8)
+        monitor._on_health_overrun("web")
+        monitor._report_async.assert_called_once_with("web", "HEALTH_FAIL")
+        monitor.stop()
+
+    @patch('watchdog.monitor.check_container_health')
+    def test_result_clears_probe(self, mock_health):
+        mock_health.return_value = {"healthy": True}
+        monitor = self._monitor()
+        future = monitor._dispatch_health_check("web", monitor.config.containers[0].health_check)
+        future.result(timeout=2)
+        deadline = time.monotonic() + 2
+        while "web" in monitor._health_probes and time.monotonic() < deadline:
+            time.sleep(0.01)
+        assert "web" not in monitor._health_probes
+        monitor.stop()
+
+    @patch('watchdog.monitor.check_container_health')
+    def test_alive_pass_skips_scheduled_health(self, mock_health):
+        monitor = self._monitor()
+        monitor.health_scheduler = HealthScheduler(MagicMock())
+        monitor._check_all_containers_alive()
+        mock_health.assert_not_called()
+        monitor._report_issue.assert_not_called()
+
+    @patch('watchdog.monitor.check_container_health', return_value={"healthy": False, "message": "down"})
+    def test_alive_pass_runs_health_without_scheduler(self, mock_health):
+        monitor = self._monitor()
+        monitor.config.system.health_scheduler = False
+        with patch('watchdog.monitor.HealthScheduler') as scheduler_cls, \
+                patch.object(monitor, '_polling_loop'), patch.object(monitor, '_events_loop'):
+            monitor.start()
+        scheduler_cls.assert_not_called()
+        monitor._check_all_containers_alive()
+        monitor.stop()
+        mock_health.assert_called_once()
+        monitor._report_issue.assert_called_once_with("web", "HEALTH_FAIL")
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
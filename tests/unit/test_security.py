@@ -0,0 +1,147 @@
+#!/usr/bin/env python3
+"""
+单元18: 日志特征多模式匹配测试
+
+测试内容：
+- 命中位置与分类
+- 重叠 / 嵌套特征
+- 子串查找与自动机两种方式结果一致，按特征数量选择
+- check_logs_for_injection 返回值与兜底规则
+- 规则缓存与文件变化热加载
+"""
+import os
+import random
+import sys
+import pytest
+from pathlib import Path
+from unittest.mock import patch
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog import matcher as matcher_module
+from watchdog.matcher import PatternMatch, PatternMatcher
+from watchdog import security
+
+
+@pytest.mark.parametrize("automaton", [False, True])
+class TestPatternMatcher:
+    """多模式匹配器测试（子串查找与 Aho-Corasick 自动机）"""
+
+    def test_offsets_and_categories(self, automaton):
+        matcher = PatternMatcher({"sql": ["UNION SELECT"], "cmd": ["whoami"]}, automaton)
+        text = "id=1 UNION SELECT; whoami"
+        assert matcher.findall(text) == [
+            PatternMatch(5, "UNION SELECT", "sql"),
+            PatternMatch(19, "whoami", "cmd"),
+        ]
+
+    def test_overlapping_and_nested(self, automaton):
+        matcher = PatternMatcher({"a": ["SQL syntax", "syntax error", "tax"]}, automaton)
+        found = [(m.offset, m.pattern) for m in matcher.findall("SQL syntax error")]
+        assert sorted(found) == [(0, "SQL syntax"), (4, "syntax error"), (7, "tax")]
+
+    def test_same_pattern_in_two_categories(self, automaton):
+        matcher = PatternMatcher({"a": ["curl http"], "b": ["curl http"]}, automaton)
+        assert {m.category for m in matcher.findall("curl http://x")} == {"a", "b"}
+        assert matcher.found("curl http://x") == ["curl http"]
+
+    def test_matches_naive_search(self, automaton):
+        rng = random.Random(3)
+        patterns = ["".join(rng.choice("ab") for _ in range(rng.randint(1, 5))) for _ in range(50)]
+        matcher = PatternMatcher({"x": patterns}, automaton)
+        for _ in range(20):
+            text = "".join(rng.choice("abc") for _ in range(200))
+            expected = sorted(
+                (i, p) for p in set(patterns) for i in range(len(text)) if text.startswith(p, i)
+            )
+            got = sorted(set((m.offset, m.pattern) for m in matcher.finditer(text)))
+            assert got == expected
+            # 按结束位置顺序返回
+            ends = [m.offset + len(m.pattern) for m in matcher.finditer(text)]
+            assert ends == sorted(ends)
+
+    def test_empty(self, automaton):
+        matcher = PatternMatcher({"x": ["", None], "y": None}, automaton)
+        assert len(matcher) == 0
+        assert matcher.findall("anything") == []
+
+
+class TestMatcherStrategy:
+    """按特征数量选择匹配方式"""
+
+    def test_shipped_rules_use_substring_search(self):
+        rules = security.RulesCache().get()
+        assert rules.log_matcher.automaton is False
+        assert rules.process_matcher.automaton is False
+
+    def test_large_rule_set_uses_automaton(self):
+        patterns = [f"sig-{i:04d}" for i in range(matcher_module.SUBSTRING_SEARCH_MAX_PATTERNS + 1)]
+        assert PatternMatcher({"x": patterns}).automaton is True
+        assert PatternMatcher({"x": patterns[:-1]}).automaton is False
+
+
+class TestLogScan:
+    """日志特征检查测试"""
+
+    def test_rule_order_and_unique(self):
+        rules = {"log_patterns": {"sql": ["UNION SELECT", "syntax error"], "xss": ["<script>"]}}
+        with patch("watchdog.security.get_security_rules", return_value=security.SecurityRules(rules)):
+            logs = "<script> syntax error UNION SELECT UNION SELECT"
+            assert security.check_logs_for_injection(logs) == ["UNION SELECT", "syntax error", "<script>"]
+            assert [m.category for m in security.scan_logs("<script>")] == ["xss"]
+
+    def test_default_rules(self):
+        with patch("watchdog.security.get_security_rules", return_value=security.SecurityRules({})):
+            assert security.check_logs_for_injection("GET /etc/passwd") == ["/etc/passwd"]
+            assert security.check_logs_for_injection("GET /index.html") == []
+
+
+    def test_process_blacklist(self):
+        rules = security.SecurityRules({"process_blacklist": ["xmrig", "nc -e"]})
+        top = {"Processes": [["root", "1", "/xmrig --pool x"], ["root", "2", "sleep 10"]]}
+        with patch("watchdog.security.get_security_rules", return_value=rules), \
+                patch("watchdog.security.try_api", return_value=top):
+            assert security.check_processes("web") == ["xmrig"]
+
+
+class TestRulesCache:
+    """规则缓存测试"""
+
+    def _write(self, path, pattern, mtime):
+        path.write_text(f"log_patterns:\n  custom:\n    - \"{pattern}\"\n", encoding="utf-8")
+        os.utime(path, (mtime, mtime))
+
+    def test_parse_once(self, tmp_path):
+        path = tmp_path / "rules.yml"
+        self._write(path, "evil", 1000)
+        cache = security.RulesCache(str(path))
+        with patch("watchdog.security.yaml.safe_load", wraps=security.yaml.safe_load) as safe_load:
+            first = cache.get()
+            assert cache.get() is first
+            assert safe_load.call_count == 1
+        assert first.log_matcher.found("an evil line") == ["evil"]
+
+    def test_reload_on_change(self, tmp_path):
+        path = tmp_path / "rules.yml"
+        self._write(path, "evil", 1000)
+        cache = security.RulesCache(str(path))
+        cache.get()
+        self._write(path, "wicked", 2000)
+        assert cache.get().log_matcher.found("wicked evil") == ["wicked"]
+
+    def test_broken_file_keeps_rules(self, tmp_path):
+        path = tmp_path / "rules.yml"
+        self._write(path, "evil", 1000)
+        cache = security.RulesCache(str(path))
+        rules = cache.get()
+        path.write_text("log_patterns: [unclosed", encoding="utf-8")
+        os.utime(path, (2000, 2000))
+        assert cache.get() is rules
+
+    def test_missing_file_uses_defaults(self, tmp_path):
+        cache = security.RulesCache(str(tmp_path / "missing.yml"))
+        assert cache.get().log_matcher.found("cat /flag") == ["cat /flag"]
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
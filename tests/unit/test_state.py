@@ -0,0 +1,277 @@
+#!/usr/bin/env python3
+"""
+单元10: 容器状态表测试
+
+测试内容：
+- Docker 事件驱动状态更新（含 destroy 删除）
+- inspect 对账覆盖状态（请求失败不覆盖，过期的 inspect 不回滚事件）
+- 存活检查只查状态表
+- 事件游标持久化与 --since 回放（断线时长从最后确认连通起算）
+"""
+import sys
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.config import init_config
+from watchdog.state import ContainerStateTable, EventCursor
+
+
+def _event(action, name="web", **attributes):
+    attributes["name"] = name
+    return {"Action": action, "Actor": {"Attributes": attributes}}
+
+
+class TestContainerStateTable:
+    """状态表测试"""
+
+    def test_start_then_die(self):
+        table = ContainerStateTable()
+        table.apply_event(_event("start"))
+        assert table.get("web").running is True
+
+        table.apply_event(_event("die", exitCode="1"))
+        state = table.get("web")
+        assert state.running is False
+        assert state.exit_code == 1
+        assert state.source == "event"
+
+    def test_oom_and_restart(self):
+        table = ContainerStateTable()
+        table.apply_event(_event("oom"))
+        table.apply_event(_event("restart"))
+        state = table.get("web")
+        assert state.oom_killed is True
+        assert state.running is True
+        assert state.restart_count == 1
+
+    def test_health_status(self):
+        table = ContainerStateTable()
+        table.apply_event(_event("health_status: unhealthy"))
+        assert table.get("web").health == "unhealthy"
+
+    def test_kill_does_not_change_running(self):
+        table = ContainerStateTable()
+        table.apply_event(_event("start"))
+        table.apply_event(_event("kill", signal="1"))
+        assert table.get("web").running is True
+
+    def test_apply_inspect(self):
+        table = ContainerStateTable()
+        table.apply_inspect("web", {"running": True, "status": "running", "restart_count": 4})
+        assert table.get("web").restart_count == 4
+
+        table.apply_inspect("web", None)
+        assert table.get("web").exists is False
+
+    def test_returned_state_is_copy(self):
+        table = ContainerStateTable()
+        state = table.apply_event(_event("start"))
+        state.running = False
+        assert table.get("web").running is True
+        table.get("web").running = False
+        assert table.get("web").running is True
+
+    def test_destroy_marks_missing(self):
+        table = ContainerStateTable()
+        table.apply_event(_event("start"))
+        table.apply_event(_event("destroy"))
+        assert table.get("web").exists is False
+        assert table.get("web").running is False
+
+
+class TestEventSourcedLiveness:
+    """存活检查测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.config.containers = [c for c in monitor.config.containers if c.name == "crash-loop"]
+        monitor.config.containers[0].health_check = {}
+        monitor._report_issue = MagicMock()
+        return monitor
+
+    @patch('watchdog.monitor.get_container_info')
+    def test_alive_check_uses_table(self, mock_info):
+        """测试对账后存活检查不再 inspect"""
+        mock_info.return_value = {"running": True, "status": "running"}
+        monitor = self._monitor()
+        monitor._reconcile_states()
+        assert mock_info.call_count == 1
+
+        monitor._check_all_containers_alive()
+        monitor._check_all_containers_alive()
+
+        assert mock_info.call_count == 1
+        monitor._report_issue.assert_not_called()
+
+    @patch('watchdog.monitor.get_container_info')
+    def test_die_event_marks_not_running(self, mock_info):
+        mock_info.return_value = {"running": True, "status": "running"}
+        monitor = self._monitor()
+        monitor._reconcile_states()
+
+        monitor._handle_docker_event(_event("die", name="crash-loop", exitCode="1"))
+        monitor._report_issue.reset_mock()
+        monitor._check_all_containers_alive()
+
+        monitor._report_issue.assert_called_once_with("crash-loop", "PROCESS_CRASH")
+
+    @patch('watchdog.monitor.get_container_info')
+    def test_destroyed_container_not_reported(self, mock_info):
+        """测试容器被删除后存活检查不再上报 PROCESS_CRASH"""
+        mock_info.return_value = {"running": True, "status": "running"}
+        monitor = self._monitor()
+        monitor._reconcile_states()
+
+        monitor._handle_docker_event(_event("die", name="crash-loop", exitCode="0"))
+        monitor._handle_docker_event(_event("destroy", name="crash-loop"))
+        monitor._report_issue.reset_mock()
+        monitor._check_all_containers_alive()
+
+        monitor._report_issue.assert_not_called()
+
+    def test_start_event_not_reported(self):
+        monitor = self._monitor()
+        monitor._handle_docker_event(_event("start", name="crash-loop"))
+        monitor._report_issue.assert_not_called()
+        assert monitor.state_table.get("crash-loop").running is True
+
+    @patch('watchdog.monitor.get_container_info')
+    def test_inspect_failure_keeps_state(self, mock_info):
+        """inspect 超时/出错不当作容器不存在"""
+        from watchdog.evidence import INSPECT_FAILED
+        mock_info.return_value = {"running": True, "status": "running"}
+        monitor = self._monitor()
+        monitor._reconcile_states()
+
+        mock_info.return_value = INSPECT_FAILED
+        with patch('watchdog.monitor.forget_container') as forget:
+            monitor._reconcile_states()
+        forget.assert_not_called()
+        assert mock_info.call_args[1] == {"failed": INSPECT_FAILED}
+        state = monitor.state_table.get("crash-loop")
+        assert (state.exists, state.running) == (True, True)
+
+    def test_stale_inspect_does_not_roll_back_event(self):
+        """inspect 发起之后到达的事件不被 inspect 结果覆盖"""
+        table = ContainerStateTable()
+        started_at = time.time()
+        table.apply_event(_event("die", exitCode="137"))
+        state = table.apply_inspect("web", {"running": True, "status": "running"}, started_at)
+        assert (state.running, state.exit_code) == (False, 137)
+        # 事件之后发起的 inspect 正常覆盖
+        state = table.apply_inspect("web", {"running": True, "status": "running"}, time.time() + 1)
+        assert state.running is True
+
+    def test_unhealthy_event_reported(self):
+        monitor = self._monitor()
+        monitor._handle_docker_event(_event("health_status: unhealthy", name="crash-loop"))
+        monitor._report_issue.assert_called_once_with("crash-loop", "HEALTH_FAIL")
+
+
+class TestEventCursor:
+    """事件游标测试"""
+
+    def _timed(self, action, time_nano, id="c1"):
+        event = _event(action)
+        event.update({"id": id, "timeNano": time_nano})
+        return event
+
+    def test_accept_and_dedupe(self, tmp_path):
+        cursor = EventCursor(str(tmp_path / "cursor.json"))
+        assert cursor.accept(self._timed("start", 100))
+        assert cursor.accept(self._timed("die", 200))
+        # --since 回放的重叠部分
+        assert not cursor.accept(self._timed("start", 100))
+        assert not cursor.accept(self._timed("die", 200))
+        # 同一时刻的其他事件仍需处理
+        assert cursor.accept(self._timed("die", 200, id="c2"))
+
+    def test_persist_and_reload(self, tmp_path):
+        path = str(tmp_path / "state" / "cursor.json")
+        cursor = EventCursor(path)
+        cursor.accept(self._timed("die", 1_700_000_000_123_456_789))
+        cursor.flush()
+
+        reloaded = EventCursor(path)
+        assert reloaded.last_time_nano == 1_700_000_000_123_456_789
+        assert reloaded.since_arg() == "1700000000.123456789"
+
+    def test_reset_starts_from_now(self, tmp_path):
+        path = tmp_path / "cursor.json"
+        cursor = EventCursor(str(path))
+        cursor.accept(self._timed("die", 100))
+        cursor.flush()
+        cursor.reset(now=1_700_000_000.5)
+        assert cursor.since_arg() == "1700000000.500000000"
+        assert EventCursor(str(path)).last_time_nano == 1_700_000_000_500_000_000
+
+    def test_gap_from_last_alive(self, tmp_path):
+        """安静主机上长时间没有事件，断线时长从最后确认连通起算"""
+        path = str(tmp_path / "cursor.json")
+        cursor = EventCursor(path)
+        cursor.accept(self._timed("die", int((time.time() - 3600) * 1e9)))
+        cursor.mark_alive(time.time() - 5)
+        assert cursor.gap_seconds() == pytest.approx(5, abs=1)
+        cursor.flush()
+        # 重启后仍从持久化的连通时间起算
+        assert EventCursor(path).gap_seconds() == pytest.approx(5, abs=1)
+
+
+class TestResumeSince:
+    """重连回放测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def _monitor(self, tmp_path):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.event_cursor = EventCursor(str(tmp_path / "cursor.json"))
+        monitor._reconcile_states = MagicMock()
+        return monitor
+
+    def test_first_start_no_since(self, tmp_path):
+        monitor = self._monitor(tmp_path)
+        assert monitor._resume_since() is None
+        monitor._reconcile_states.assert_not_called()
+        # 之后的重连从首次连接时刻回放
+        assert monitor._resume_since() == monitor.event_cursor.since_arg()
+
+    def test_short_gap_replays(self, tmp_path):
+        monitor = self._monitor(tmp_path)
+        monitor.event_cursor.last_time_nano = int((time.time() - 30) * 1e9)
+        assert monitor._resume_since() == monitor.event_cursor.since_arg()
+        monitor._reconcile_states.assert_not_called()
+
+    def test_quiet_stream_replays(self, tmp_path):
+        """最后一个事件很久以前，但事件流刚断开：回放而不是对账"""
+        monitor = self._monitor(tmp_path)
+        gap = monitor.config.events.max_replay_seconds + 60
+        last_event = int((time.time() - gap) * 1e9)
+        monitor.event_cursor.last_time_nano = last_event
+        monitor.event_cursor.mark_alive(time.time() - 10)
+        assert monitor._resume_since() == monitor.event_cursor.since_arg()
+        assert monitor.event_cursor.last_time_nano == last_event
+        monitor._reconcile_states.assert_not_called()
+
+    def test_long_gap_reconciles(self, tmp_path):
+        monitor = self._monitor(tmp_path)
+        gap = monitor.config.events.max_replay_seconds + 60
+        monitor.event_cursor.last_time_nano = int((time.time() - gap) * 1e9)
+        since = monitor._resume_since()
+        monitor._reconcile_states.assert_called_once()
+        # 游标移到对账时刻，之后的断线仍可回放
+        assert since == monitor.event_cursor.since_arg()
+        assert float(since) == pytest.approx(time.time(), abs=5)
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
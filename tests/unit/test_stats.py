@@ -0,0 +1,194 @@
+#!/usr/bin/env python3
+"""
+单元8: 资源采样测试
+
+测试内容：
+- 最新采样表读写与过期
+- 批量 docker stats（CLI 回退路径）
+- 资源检查只进行一次批量采样
+- 流式订阅写入采样表
+- 容器删除后清理采样状态
+"""
+import json
+import sys
+import time
+import pytest
+from pathlib import Path
+from unittest.mock import patch, MagicMock
+
+sys.path.insert(0, str(Path(__file__).parent.parent.parent))
+
+from watchdog.config import init_config
+from watchdog import stats as stats_module
+from watchdog.stats import StatsTable, StatsStreamer, collect_all_stats, forget_container, get_stats, get_stats_table
+
+
+def _cli_line(name, cpu, mem):
+    return json.dumps({
+        "Name": name, "CPUPerc": cpu, "MemPerc": mem,
+        "MemUsage": "100MiB / 1GiB", "NetIO": "0B / 0B", "BlockIO": "0B / 0B"
+    })
+
+
+class TestStatsTable:
+    """采样表测试"""
+
+    def test_get_fresh_sample(self):
+        table = StatsTable()
+        table.update("web", {"cpu_percent": "1%"})
+        assert table.get("web", max_age=10) == {"cpu_percent": "1%"}
+
+    def test_expired_sample(self):
+        table = StatsTable()
+        table.update("web", {"cpu_percent": "1%"}, timestamp=time.time() - 100)
+        assert table.get("web", max_age=10) is None
+        assert table.get("web") == {"cpu_percent": "1%"}
+
+    def test_missing_sample(self):
+        assert StatsTable().get("nope") is None
+
+
+class TestCollectAllStats:
+    """批量采样测试"""
+
+    def setup_method(self):
+        init_config()
+
+    @patch('watchdog.docker_api.get_client', return_value=None)
+    @patch('watchdog.stats.run_command')
+    def test_single_cli_call(self, mock_run, _):
+        """测试 CLI 回退时只执行一次 docker stats"""
+        stdout = "\n".join([_cli_line("a", "10.00%", "20.00%"), _cli_line("b", "30.00%", "40.00%")])
+        mock_run.return_value = (0, stdout, "")
+
+        results = collect_all_stats(["a", "b", "missing"])
+
+        assert mock_run.call_count == 1
+        cmd = mock_run.call_args[0][0]
+        assert cmd[-3:] == ["a", "b", "missing"]
+        assert set(results) == {"a", "b"}
+        assert results["b"]["cpu_percent"] == "30.00%"
+        assert get_stats_table().get("a")["memory_percent"] == "20.00%"
+
+    @patch('watchdog.stats.sample_container')
+    def test_get_stats_reads_table(self, mock_sample):
+        """测试采样表命中时不再现场采样"""
+        get_stats_table().update("cached", {"cpu_percent": "5%"})
+        assert get_stats("cached", max_age=60) == {"cpu_percent": "5%"}
+        mock_sample.assert_not_called()
+
+    @patch('watchdog.stats.sample_container', return_value={"cpu_percent": "7%"})
+    def test_get_stats_refreshes_stale(self, mock_sample):
+        """测试采样过期时现场采样并回写"""
+        get_stats_table().update("stale", {"cpu_percent": "5%"}, timestamp=time.time() - 600)
+        assert get_stats("stale", max_age=60) == {"cpu_percent": "7%"}
+        assert get_stats_table().get("stale") == {"cpu_percent": "7%"}
+
+    def test_forget_container(self):
+        get_stats_table().update("gone", {"cpu_percent": "5%"})
+        stats_module._last_cpu_stats["gone"] = {"system_cpu_usage": 1}
+        forget_container("gone")
+        assert get_stats_table().get("gone") is None
+        assert "gone" not in stats_module._last_cpu_stats
+
+    @patch('watchdog.monitor.get_container_info', return_value=None)
+    def test_reconcile_forgets_missing(self, _):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        name = monitor.config.containers[0].name
+        stats_module._last_cpu_stats[name] = {"system_cpu_usage": 1}
+        monitor._reconcile_states()
+        assert name not in stats_module._last_cpu_stats
+
+    def test_forget_clears_monitor_state(self):
+        """删除后重建的容器不继承旧实例的趋势、基线、报警和日志游标"""
+        from watchdog.alarm import AlarmRule
+        from watchdog.logs import LogCollector, LogRing
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.trend.observe("gone", {"memory_mb": 1.0})
+        monitor.baselines.observe("gone", "cpu_percent", 10.0)
+        monitor.alarms.update("gone", "cpu_percent", 95.0, AlarmRule(critical=90, clear=90), 0.0)
+        monitor.alarms.latch("gone", "cpu_percent")
+        monitor.log_collector = LogCollector(capacity=10)
+        ring = monitor.log_collector._rings["gone"] = LogRing(10)
+        ring.extend(["old"])
+        ring.mark_backfilled()
+        ring.extend(["attack from the old instance"])
+        monitor._log_seq["gone"] = 1
+
+        monitor._forget_container("gone")
+        assert monitor.trend.store.metrics("gone") == []
+        assert monitor.baselines.baseline("gone", "cpu_percent") is None
+        assert not monitor.alarms.active("gone", "cpu_percent")
+        assert monitor._read_new_logs("gone") == []
+
+
+class TestResourceCheck:
+    """资源检查集成测试"""
+
+    def setup_method(self):
+        init_config()
+
+    @patch('watchdog.monitor.collect_all_stats')
+    def test_resource_check_batches(self, mock_collect):
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor._probe_security = MagicMock(return_value={})
+        monitor._report_issue = MagicMock()
+        mock_collect.return_value = {
+            "cpu-stress": {"cpu_percent": "99.00%", "memory_percent": "10.00%", "memory_usage": "10MiB / 1GiB"}
+        }
+
+        monitor._check_all_containers_resources()
+
+        mock_collect.assert_called_once()
+        monitor._report_issue.assert_called_once_with("cpu-stress", "CPU_HIGH")
+
+
+class TestStatsStreamer:
+    """流式订阅测试"""
+
+    def setup_method(self):
+        init_config()
+
+    def test_stream_feeds_table(self):
+        raw = {
+            "cpu_stats": {"cpu_usage": {"total_usage": 200}, "system_cpu_usage": 1000, "online_cpus": 1},
+            "precpu_stats": {"cpu_usage": {"total_usage": 100}, "system_cpu_usage": 500},
+            "memory_stats": {"usage": 512, "limit": 1024},
+        }
+        client = MagicMock()
+        client.stream_container_stats.return_value = iter([raw])
+        table = StatsTable()
+        streamer = StatsStreamer(table, retry_seconds=0.01)
+
+        with patch('watchdog.stats.get_client', return_value=client):
+            streamer.subscribe("web")
+            deadline = time.time() + 2
+            while table.get("web") is None and time.time() < deadline:
+                time.sleep(0.01)
+            streamer.stop()
+
+        assert table.get("web")["cpu_percent"] == "20.00%"
+        assert table.get("web")["memory_percent"] == "50.00%"
+        assert streamer.subscriptions() == []
+
+    @patch('watchdog.monitor.collect_all_stats')
+    def test_stream_mode_reads_table(self, mock_collect):
+        """测试 stream 模式下资源检查只读采样表"""
+        from watchdog.monitor import ContainerMonitor
+        monitor = ContainerMonitor()
+        monitor.stats_streamer = MagicMock()
+        get_stats_table().update("cpu-stress", {"cpu_percent": "99.00%", "memory_percent": "10.00%"})
+        get_stats_table().update("normal-app", {"cpu_percent": "1.00%"}, timestamp=time.time() - 3600)
+
+        samples = monitor._current_stats()
+
+        mock_collect.assert_not_called()
+        assert "cpu-stress" in samples
+        assert "normal-app" not in samples
+
+
+if __name__ == "__main__":
+    pytest.main([__file__, "-v"])
@@ -1,5 +1,4 @@
 import unittest
-from collections import deque
 from datetime import datetime, timedelta
 from unittest.mock import MagicMock, patch
 import sys
@@ -8,20 +7,20 @@ from pathlib import Path
 # Add project root to path
 sys.path.insert(0, str(Path(__file__).parent.parent.parent))
 
+from watchdog.config import init_config
 from watchdog.monitor import ContainerMonitor
+from watchdog.trend import fit_line, seconds_until
 
 class TestTrendAnalysis(unittest.TestCase):
     def setUp(self):
+        init_config()
         self.monitor = ContainerMonitor()
-        # Mock config
-        self.monitor.config = MagicMock()
         self.monitor.config.containers = []
         
     @patch('watchdog.monitor.datetime')
     def test_trend_analysis_slope(self, mock_datetime):
         """Test memory leak detection slope calculation"""
         container_name = "test-container"
-        self.monitor.stats_history[container_name] = deque(maxlen=10)
         
         # Setup time sequence
         base_time = datetime(2025, 1, 1, 12, 0, 0)
@@ -50,19 +49,172 @@ class TestTrendAnalysis(unittest.TestCase):
     def test_trend_analysis_no_leak(self):
         """Test stable memory does not trigger leak detection"""
         container_name = "stable-container"
-        self.monitor.stats_history[container_name] = deque(maxlen=10)
-        history = self.monitor.stats_history[container_name]
         
-        base_time = datetime.now()
-        history.append((base_time, 100.0))
-        history.append((base_time + timedelta(minutes=1), 102.0))
-        history.append((base_time + timedelta(minutes=2), 101.0))
+        base_time = datetime.now().timestamp()
+        self.monitor.trend.observe(container_name, {"memory_mb": 100.0}, base_time)
+        self.monitor.trend.observe(container_name, {"memory_mb": 102.0}, base_time + 60)
+        self.monitor.trend.observe(container_name, {"memory_mb": 101.0}, base_time + 120)
         
         self.monitor._report_issue = MagicMock()
         
         self.monitor._check_trend(container_name, 101.0, 40.0)
         
         self.monitor._report_issue.assert_not_called()
+    
+    @patch('watchdog.monitor.datetime')
+    def test_single_spike_not_leak(self, mock_datetime):
+        """Test a single spike (e.g. GC pause) does not trigger leak detection"""
+        container_name = "spiky-container"
+        self.monitor._report_issue = MagicMock()
+        base_time = datetime(2025, 1, 1, 12, 0, 0)
+        
+        # First/last slope would be (160 - 100) / 9 min > 10 MB/min if the spike is the last sample
+        for minute, mem in enumerate([100, 101, 99, 100, 102, 100, 101, 99, 100, 160]):
+            mock_datetime.now.return_value = base_time + timedelta(minutes=minute)
+            self.monitor._check_trend(container_name, float(mem), 60.0)
+        
+        self.monitor._report_issue.assert_not_called()
+    
+    @patch('watchdog.monitor.datetime')
+    def test_per_container_rule(self, mock_datetime):
+        """Test leak thresholds can be overridden per container"""
+        from watchdog.config import ContainerConfig
+        container_name = "slow-leak"
+        self.monitor.config.containers = [
+            ContainerConfig(name=container_name, thresholds={"leak_slope_mb_per_min": 2})
+        ]
+        self.monitor._report_issue = MagicMock()
+        base_time = datetime(2025, 1, 1, 12, 0, 0)
+        
+        for minute in range(5):
+            mock_datetime.now.return_value = base_time + timedelta(minutes=minute)
+            self.monitor._check_trend(container_name, 100.0 + 3 * minute, 60.0)
+        
+        self.monitor._report_issue.assert_called_with(container_name, "MEMORY_LEAK_SUSPECTED")
+
+class TestOomForecast(unittest.TestCase):
+    def setUp(self):
+        init_config()
+        self.monitor = ContainerMonitor()
+        self.monitor.config.containers = []
+        self.monitor._report_issue = MagicMock()
+    
+    def _grow(self, mock_datetime, container_name, minutes, start_mb, mb_per_min, limit_mb, memory_percent=40.0):
+        base_time = datetime(2025, 1, 1, 12, 0, 0)
+        for minute in range(minutes):
+            mock_datetime.now.return_value = base_time + timedelta(minutes=minute)
+            self.monitor._check_trend(container_name, start_mb + mb_per_min * minute, memory_percent,
+                                      memory_limit_mb=limit_mb)
+    
+    @patch('watchdog.monitor.datetime')
+    def test_predicted_oom(self, mock_datetime):
+        """Growth reaching the limit within the horizon reports PREDICTED_OOM with the forecast"""
+        # 5 MB/min, 180MB after 5 samples, 200MB limit -> 4 min left
+        self._grow(mock_datetime, "oom-soon", 5, 160.0, 5.0, 200.0)
+        
+        container_name, fault_type, details = self.monitor._report_issue.call_args[0]
+        self.assertEqual((container_name, fault_type), ("oom-soon", "PREDICTED_OOM"))
+        self.assertEqual(details["oom_forecast"]["seconds_to_oom"], 240)
+        self.assertEqual(details["oom_forecast"]["memory_limit_mb"], 200.0)
+    
+    @patch('watchdog.monitor.datetime')
+    def test_far_from_limit(self, mock_datetime):
+        """Growth that needs longer than the horizon is not reported"""
+        self._grow(mock_datetime, "oom-later", 5, 100.0, 5.0, 1024.0)
+        self.monitor._report_issue.assert_not_called()
+    
+    @patch('watchdog.monitor.datetime')
+    def test_takes_precedence_over_leak(self, mock_datetime):
+        """When both fire, only PREDICTED_OOM is reported"""
+        self._grow(mock_datetime, "leaky", 5, 160.0, 10.0, 240.0, memory_percent=80.0)
+        fault_types = [call[0][1] for call in self.monitor._report_issue.call_args_list]
+        self.assertIn("PREDICTED_OOM", fault_types)
+        self.assertNotIn("MEMORY_LEAK_SUSPECTED", fault_types)
+    
+    @patch('watchdog.monitor.datetime')
+    def test_disabled_per_container(self, mock_datetime):
+        from watchdog.config import ContainerConfig
+        self.monitor.config.containers = [
+            ContainerConfig(name="no-forecast", thresholds={"oom_forecast_horizon_seconds": 0})
+        ]
+        self._grow(mock_datetime, "no-forecast", 5, 160.0, 5.0, 200.0)
+        self.monitor._report_issue.assert_not_called()
+    
+    def test_limit_from_inspect(self):
+        """The forecast limit is HostConfig.Memory; unlimited containers are not forecast"""
+        table = self.monitor.state_table
+        limited = table.apply_inspect("limited", {"running": True, "memory_limit": 512 * 1024 * 1024})
+        unlimited = table.apply_inspect("unlimited", {"running": True, "memory_limit": 0})
+        self.assertEqual(self.monitor._memory_limit_mb(limited), 512.0)
+        self.assertIsNone(self.monitor._memory_limit_mb(unlimited))
+        self.assertIsNone(self.monitor._memory_limit_mb(None))
+    
+    @patch('watchdog.monitor.datetime')
+    def test_unlimited_container_not_forecast(self, mock_datetime):
+        """docker stats reports host RAM as the limit when none is set; that must not drive a forecast"""
+        self._grow(mock_datetime, "unlimited", 5, 160.0, 5.0, None)
+        fault_types = [call[0][1] for call in self.monitor._report_issue.call_args_list]
+        self.assertNotIn("PREDICTED_OOM", fault_types)
+    
+    def test_seconds_until(self):
+        fit = fit_line([0, 60, 120], [10.0, 12.0, 14.0])
+        self.assertAlmostEqual(seconds_until(fit, 14.0, 20.0), 180.0)
+        self.assertEqual(seconds_until(fit, 25.0, 20.0), 0.0)
+        flat = fit_line([0, 60, 120], [10.0, 10.0, 10.0])
+        self.assertIsNone(seconds_until(flat, 10.0, 20.0))
+
+class TestTrendEvidence(unittest.TestCase):
+    def setUp(self):
+        init_config()
+        self.monitor = ContainerMonitor()
+        self.monitor.config.containers = []
+    
+    @patch('watchdog.monitor.collect_evidence')
+    def test_report_includes_metric_trends(self, mock_collect):
+        """CPU / restart / network fits are attached to the evidence"""
+        for minute in range(5):
+            self.monitor.trend.observe("web", {"cpu_percent": 10.0 + 5 * minute, "restart_count": 1.0,
+                                               "net_rx_mb": 2.0 * minute}, timestamp=minute * 60.0)
+        with patch('watchdog.agent.run_diagnosis'):
+            self.monitor._report_issue("web", "HIGH_CPU", {"extra": 1})
+        
+        details = mock_collect.call_args[0][2]
+        self.assertEqual(details["extra"], 1)
+        trends = details["trends"]
+        self.assertAlmostEqual(trends["cpu_percent"]["slope_per_min"], 5.0)
+        self.assertAlmostEqual(trends["net_rx_mb"]["slope_per_min"], 2.0)
+        self.assertEqual(trends["restart_count"]["slope_per_min"], 0.0)
+        self.assertEqual(trends["cpu_percent"]["samples"], 5)
+    
+    @patch('watchdog.monitor.collect_evidence')
+    def test_no_trends_without_history(self, mock_collect):
+        with patch('watchdog.agent.run_diagnosis'):
+            self.monitor._report_issue("web", "HIGH_CPU")
+        self.assertIsNone(mock_collect.call_args[0][2])
+
+class TestFitLine(unittest.TestCase):
+    def test_perfect_line(self):
+        fit = fit_line([0, 60, 120, 180], [10.0, 12.0, 14.0, 16.0])
+        self.assertAlmostEqual(fit.slope, 2.0)
+        self.assertAlmostEqual(fit.r2, 1.0)
+        self.assertAlmostEqual(fit.slope_low, 2.0)
+        self.assertEqual(fit.span_seconds, 180)
+    
+    def test_noisy_confidence_interval(self):
+        fit = fit_line([0, 60, 120, 180, 240], [10.0, 14.0, 11.0, 15.0, 12.0])
+        self.assertLess(fit.slope_low, 0)
+        self.assertGreater(fit.slope_high, fit.slope)
+        self.assertLess(fit.r2, 0.5)
+    
+    def test_large_offset_precision(self):
+        """Epoch timestamps and large counters do not lose the slope to cancellation"""
+        t0 = 1.7e9
+        fit = fit_line([t0, t0 + 60, t0 + 120, t0 + 180], [1e12, 1e12 + 1, 1e12 + 2, 1e12 + 3])
+        self.assertAlmostEqual(fit.slope, 1.0)
+        self.assertAlmostEqual(fit.r2, 1.0)
+    
+    def test_too_few_samples(self):
+        self.assertIsNone(fit_line([0, 60], [1.0, 2.0]))
 
 if __name__ == '__main__':
     unittest.main()
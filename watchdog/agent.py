@@ -89,7 +89,7 @@ Level 2 (攻击成功/失陷):
 3. 资源使用 70%-90% → command: ALERT_ONLY
 4. 资源使用 >90% 且容器健康 → command: ALERT_ONLY
 5. 资源使用 >90% 且容器不健康 → command: RESTART
-6. 内存泄漏疑似 (MEMORY_LEAK_SUSPECTED) → command: RESTART (预防性重启)
+6. 内存泄漏疑似 (MEMORY_LEAK_SUSPECTED) 或预测即将 OOM (PREDICTED_OOM，见 evidence.oom_forecast) → command: RESTART (预防性重启，赶在 OOM Kill 之前)
 7. 安全事件 Level 1 (仅日志特征) → command: ALERT_ONLY (标记为 ATTACK_ATTEMPT)
 8. 安全事件 Level 2 (恶意进程/实锤) → command: COMMIT (标记为 SECURITY_INCIDENT)
 9. 已重启 3 次以上仍异常 → command: STOP
@@ -97,7 +97,7 @@ Level 2 (攻击成功/失陷):
 
 【输出格式】必须是纯 JSON，无其他内容：
 {
-  "fault_type": "CPU_HIGH|MEMORY_HIGH|PROCESS_CRASH|OOM_KILLED|HEALTH_FAIL|MEMORY_LEAK_SUSPECTED|ATTACK_ATTEMPT|SECURITY_INCIDENT|NO_ERROR",
+  "fault_type": "CPU_HIGH|MEMORY_HIGH|PROCESS_CRASH|OOM_KILLED|HEALTH_FAIL|MEMORY_LEAK_SUSPECTED|PREDICTED_OOM|ATTACK_ATTEMPT|SECURITY_INCIDENT|NO_ERROR",
   "command": "RESTART|STOP|COMMIT|ALERT_ONLY|NONE",
   "params": {
     "container_name": "容器名",
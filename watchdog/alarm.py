@@ -0,0 +1,93 @@
+"""
+阈值报警状态模块
+单个采样超过临界阈值不再立即上报：需要持续超过 sustain_seconds 且最近 K 个采样中至少 M 个超标；
+上报后进入报警状态，直到指标回落到恢复阈值（clear）以下才解除，避免在阈值附近抖动的容器反复触发诊断
+"""
+from collections import deque
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+
+@dataclass
+class AlarmRule:
+    """报警判定参数"""
+    critical: float
+    clear: float  # 恢复阈值，不高于 critical
+    sustain_seconds: float = 0.0  # 超标持续时间
+    min_samples: int = 1  # 最近 window 个采样中至少 min_samples 个超标
+    window: int = 1
+
+
+class ThresholdAlarm:
+    """单个 (容器, 指标) 的报警状态"""
+
+    __slots__ = ("samples", "since", "active", "last_at")
+
+    def __init__(self, window: int = 1):
+        self.samples = deque(maxlen=max(1, window))
+        self.since: Optional[float] = None  # 本轮连续超标开始时间（回落到临界阈值以下时重置）
+        self.active = False
+        self.last_at: Optional[float] = None  # 最近一次计入的采样时间
+
+    def update(self, value: float, rule: AlarmRule, now: float, sampled_at: float = None) -> bool:
+        """
+        记录一次采样，返回是否应当上报（报警状态中不重复上报）
+        给出 sampled_at 时持续时间按采样时间计算，不晚于上次计入的采样视为同一采样重复检查，不再计入
+        """
+        if sampled_at is not None:
+            if self.last_at is not None and sampled_at <= self.last_at:
+                return False
+            self.last_at = now = sampled_at
+
+        if self.samples.maxlen != max(1, rule.window):
+            self.samples = deque(self.samples, maxlen=max(1, rule.window))
+
+        breach = value >= rule.critical
+        self.samples.append(breach)
+        if not breach:
+            # 持续时间从最近一次连续超标开始计算，落在恢复阈值与临界阈值之间同样中断计时
+            self.since = None
+            if value < rule.clear:
+                self.active = False
+            return False
+        if self.since is None:
+            self.since = now
+
+        if self.active or self.since is None:
+            return False
+        return now - self.since >= rule.sustain_seconds and sum(self.samples) >= rule.min_samples
+
+
+class AlarmTable:
+    """所有容器、指标的报警状态"""
+
+    def __init__(self):
+        self._alarms: Dict[Tuple[str, str], ThresholdAlarm] = {}
+        self._lock = Lock()
+
+    def update(self, container_name: str, metric: str, value: float, rule: AlarmRule, now: float,
+               sampled_at: float = None) -> bool:
+        key = (container_name, metric)
+        with self._lock:
+            alarm = self._alarms.get(key)
+            if alarm is None:
+                alarm = self._alarms[key] = ThresholdAlarm(rule.window)
+            return alarm.update(value, rule, now, sampled_at)
+
+    def latch(self, container_name: str, metric: str):
+        """标记已上报，回落到恢复阈值以下前不再上报"""
+        with self._lock:
+            alarm = self._alarms.get((container_name, metric))
+            if alarm is not None:
+                alarm.active = True
+
+    def active(self, container_name: str, metric: str) -> bool:
+        with self._lock:
+            alarm = self._alarms.get((container_name, metric))
+            return alarm is not None and alarm.active
+
+    def forget(self, container_name: str):
+        with self._lock:
+            for key in [key for key in self._alarms if key[0] == container_name]:
+                del self._alarms[key]
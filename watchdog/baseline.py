@@ -0,0 +1,142 @@
+"""
+动态基线模块
+每个 (容器, 指标) 用 P² 算法流式估计 p50/p95/p99，内存占用恒定（每个分位数 5 个标记点），
+用于替代对负载波动大的容器不适用的固定百分比阈值
+"""
+from threading import Lock
+from typing import Dict, Optional, Tuple
+
+# 基线估计的分位数
+BASELINE_QUANTILES = (0.5, 0.95, 0.99)
+
+
+class P2Quantile:
+    """
+    P² 分位数估计（Jain & Chlamtac, 1985）
+    维护 5 个标记点的高度和位置，每个样本 O(1) 更新，不保存样本本身
+    """
+
+    __slots__ = ("p", "count", "_heights", "_positions", "_desired", "_increments")
+
+    def __init__(self, p: float):
+        self.p = p
+        self.count = 0
+        self._heights = []
+        self._positions = [0.0, 1.0, 2.0, 3.0, 4.0]
+        self._desired = [0.0, 2 * p, 4 * p, 2 + 2 * p, 4.0]
+        self._increments = [0.0, p / 2, p, (1 + p) / 2, 1.0]
+
+    def add(self, x: float):
+        self.count += 1
+        q = self._heights
+        if self.count <= 5:
+            q.append(x)
+            if self.count == 5:
+                q.sort()
+            return
+
+        n = self._positions
+        if x < q[0]:
+            q[0] = x
+            k = 0
+        elif x >= q[4]:
+            q[4] = x
+            k = 3
+        else:
+            k = 0
+            while x >= q[k + 1]:
+                k += 1
+
+        for i in range(k + 1, 5):
+            n[i] += 1
+        for i in range(5):
+            self._desired[i] += self._increments[i]
+
+        for i in (1, 2, 3):
+            d = self._desired[i] - n[i]
+            if (d >= 1 and n[i + 1] - n[i] > 1) or (d <= -1 and n[i - 1] - n[i] < -1):
+                step = 1 if d > 0 else -1
+                candidate = self._parabolic(i, step)
+                if q[i - 1] < candidate < q[i + 1]:
+                    q[i] = candidate
+                else:
+                    q[i] = q[i] + step * (q[i + step] - q[i]) / (n[i + step] - n[i])
+                n[i] += step
+
+    def _parabolic(self, i: int, step: int) -> float:
+        q, n = self._heights, self._positions
+        return q[i] + step / (n[i + 1] - n[i - 1]) * (
+            (n[i] - n[i - 1] + step) * (q[i + 1] - q[i]) / (n[i + 1] - n[i])
+            + (n[i + 1] - n[i] - step) * (q[i] - q[i - 1]) / (n[i] - n[i - 1])
+        )
+
+    def value(self) -> Optional[float]:
+        if self.count == 0:
+            return None
+        if self.count < 5:
+            ordered = sorted(self._heights)
+            return ordered[min(len(ordered) - 1, int(self.p * len(ordered)))]
+        return self._heights[2]
+
+
+class QuantileSketch:
+    """一组分位数的 P² 估计"""
+
+    __slots__ = ("estimators",)
+
+    def __init__(self, quantiles: Tuple[float, ...] = BASELINE_QUANTILES):
+        self.estimators = [P2Quantile(p) for p in quantiles]
+
+    @property
+    def count(self) -> int:
+        return self.estimators[0].count
+
+    def add(self, value: float):
+        for estimator in self.estimators:
+            estimator.add(value)
+
+    def quantiles(self) -> Dict[str, float]:
+        """{"p50": ..., "p95": ..., "p99": ...}"""
+        return {f"p{round(e.p * 100):d}": e.value() for e in self.estimators}
+
+
+class BaselineTracker:
+    """所有容器、指标的动态基线"""
+
+    def __init__(self, quantiles: Tuple[float, ...] = BASELINE_QUANTILES):
+        self.quantiles = quantiles
+        self._sketches: Dict[Tuple[str, str], QuantileSketch] = {}
+        self._observed_at: Dict[Tuple[str, str], float] = {}
+        self._lock = Lock()
+
+    def observe(self, container_name: str, metric: str, value: float, timestamp: float = None):
+        """
+        计入一个样本；指定采样时间戳时同一采样只计入一次
+        （stream 模式每秒检查一次缓存的最新采样，采样本身可能还没更新）
+        """
+        key = (container_name, metric)
+        with self._lock:
+            if timestamp is not None:
+                if self._observed_at.get(key) == timestamp:
+                    return
+                self._observed_at[key] = timestamp
+            sketch = self._sketches.get(key)
+            if sketch is None:
+                sketch = self._sketches[key] = QuantileSketch(self.quantiles)
+            sketch.add(value)
+
+    def baseline(self, container_name: str, metric: str) -> Optional[Dict[str, float]]:
+        """学习到的基线分位数及样本数，未观测过时返回 None"""
+        with self._lock:
+            sketch = self._sketches.get((container_name, metric))
+            if sketch is None:
+                return None
+            result = sketch.quantiles()
+            result["samples"] = sketch.count
+            return result
+
+    def forget(self, container_name: str):
+        with self._lock:
+            for key in [key for key in self._sketches if key[0] == container_name]:
+                del self._sketches[key]
+                self._observed_at.pop(key, None)
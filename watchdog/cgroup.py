@@ -0,0 +1,264 @@
+"""
+cgroup v2 资源采样模块
+直接读取 /sys/fs/cgroup 下容器 scope 的统计文件，不 fork 任何进程
+"""
+import os
+import time
+import json
+import logging
+from threading import Lock
+from typing import Dict, Any, List, Optional, Tuple
+
+from .utils import run_command
+from .docker_api import try_api, bytes_size, human_size, API_UNAVAILABLE
+
+logger = logging.getLogger(__name__)
+
+CGROUP_ROOT = "/sys/fs/cgroup"
+
+# 首次采样没有上一轮 CPU 计数时，间隔该时长再读一次以计算 CPU%
+_PRIME_INTERVAL_SECONDS = 0.1
+
+
+def is_cgroup_v2(root: str = CGROUP_ROOT) -> bool:
+    """是否为 cgroup v2 unified 层级"""
+    return os.path.exists(os.path.join(root, "cgroup.controllers"))
+
+
+def _read_file(path: str) -> str:
+    with open(path, "r") as f:
+        return f.read()
+
+
+def _read_int(path: str) -> Optional[int]:
+    try:
+        value = _read_file(path).strip()
+    except OSError:
+        return None
+    if value == "max":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
+
+def _read_kv(path: str) -> Dict[str, int]:
+    """解析 "key value" 形式的统计文件（cpu.stat/memory.stat/memory.events）"""
+    result = {}
+    try:
+        content = _read_file(path)
+    except OSError:
+        return result
+    for line in content.splitlines():
+        parts = line.split()
+        if len(parts) == 2:
+            try:
+                result[parts[0]] = int(parts[1])
+            except ValueError:
+                continue
+    return result
+
+
+def _host_memory_bytes() -> int:
+    """宿主机内存总量（memory.max 为 max 时作为上限，与 docker stats 一致）"""
+    try:
+        for line in _read_file("/proc/meminfo").splitlines():
+            if line.startswith("MemTotal:"):
+                return int(line.split()[1]) * 1024
+    except (OSError, ValueError, IndexError):
+        pass
+    return 0
+
+
+def _inspect_id_and_pid(container_name: str) -> Tuple[str, int]:
+    """获取容器完整 ID 和 init 进程 PID"""
+    info = try_api(lambda client: client.inspect_container(container_name))
+    if info is API_UNAVAILABLE:
+        code, stdout, _ = run_command([
+            'docker', 'inspect', '--format', '{{json .}}', container_name
+        ])
+        if code != 0:
+            return "", 0
+        try:
+            info = json.loads(stdout)
+        except json.JSONDecodeError:
+            return "", 0
+    if not info:
+        return "", 0
+    return info.get("Id", ""), (info.get("State") or {}).get("Pid", 0)
+
+
+class CgroupSampler:
+    """
+    cgroup v2 采样器
+    每个容器的 cgroup 目录只解析一次（目录消失后重新解析），
+    CPU% 由两次 cpu.stat usage_usec 的差值除以墙钟时间得出（100% = 一个核，与 docker stats 一致）
+    """
+
+    def __init__(self, root: str = CGROUP_ROOT):
+        self.root = root
+        self._lock = Lock()
+        self._paths: Dict[str, str] = {}
+        self._prev_cpu: Dict[str, Tuple[float, int]] = {}
+        self._host_memory = _host_memory_bytes()
+
+    def resolve(self, container_name: str) -> Optional[str]:
+        """解析容器 cgroup 目录（systemd / cgroupfs 驱动，最后回退 /proc/<pid>/cgroup）"""
+        with self._lock:
+            path = self._paths.get(container_name)
+        if path and os.path.isdir(path):
+            return path
+
+        container_id, pid = _inspect_id_and_pid(container_name)
+        if not container_id:
+            return None
+
+        candidates = [
+            os.path.join(self.root, "system.slice", f"docker-{container_id}.scope"),
+            os.path.join(self.root, "docker", container_id),
+        ]
+        if pid:
+            try:
+                for line in _read_file(f"/proc/{pid}/cgroup").splitlines():
+                    if line.startswith("0::"):
+                        candidates.append(os.path.join(self.root, line[3:].lstrip("/")))
+            except OSError:
+                pass
+
+        for candidate in candidates:
+            if os.path.isfile(os.path.join(candidate, "cpu.stat")):
+                with self._lock:
+                    self._paths[container_name] = candidate
+                    self._prev_cpu.pop(container_name, None)
+                return candidate
+
+        logger.debug(f"未找到容器 {container_name} 的 cgroup 目录")
+        return None
+
+    def sample(self, container_name: str) -> Optional[Dict[str, Any]]:
+        """采样单个容器，返回格式同 get_container_stats，额外包含 oom_kill_count"""
+        return self.sample_many([container_name]).get(container_name)
+
+    def sample_many(self, container_names: List[str]) -> Dict[str, Dict[str, Any]]:
+        """批量采样；首次采样的容器统一等待一次再读，避免逐个等待"""
+        paths = {}
+        for name in container_names:
+            path = self.resolve(name)
+            if path:
+                paths[name] = path
+
+        with self._lock:
+            unprimed = [name for name in paths if name not in self._prev_cpu]
+        if unprimed:
+            for name in unprimed:
+                self._read_cpu(name, paths[name])
+            time.sleep(_PRIME_INTERVAL_SECONDS)
+
+        results = {}
+        for name, path in paths.items():
+            stats = self._read_stats(name, path)
+            if stats is not None:
+                results[name] = stats
+        return results
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._paths.pop(container_name, None)
+            self._prev_cpu.pop(container_name, None)
+
+    def _read_cpu(self, container_name: str, path: str) -> Optional[float]:
+        """读取 usage_usec 并返回相对上一次读取的 CPU%（无上一次时返回 None）"""
+        usage = _read_kv(os.path.join(path, "cpu.stat")).get("usage_usec")
+        if usage is None:
+            return None
+        now = time.monotonic()
+        with self._lock:
+            previous = self._prev_cpu.get(container_name)
+            self._prev_cpu[container_name] = (now, usage)
+        if previous is None:
+            return None
+        prev_time, prev_usage = previous
+        elapsed_usec = (now - prev_time) * 1_000_000
+        if elapsed_usec <= 0 or usage < prev_usage:
+            return 0.0
+        return (usage - prev_usage) / elapsed_usec * 100.0
+
+    def _read_stats(self, container_name: str, path: str) -> Optional[Dict[str, Any]]:
+        cpu_percent = self._read_cpu(container_name, path)
+        if cpu_percent is None:
+            # cgroup 已消失（容器被删除），下次重新解析
+            if not os.path.isdir(path):
+                self.forget(container_name)
+                return None
+            cpu_percent = 0.0
+
+        mem_current = _read_int(os.path.join(path, "memory.current")) or 0
+        # 与 docker stats 一致：扣除 inactive_file 缓存
+        inactive_file = _read_kv(os.path.join(path, "memory.stat")).get("inactive_file", 0)
+        if inactive_file < mem_current:
+            mem_current -= inactive_file
+        mem_limit = _read_int(os.path.join(path, "memory.max")) or self._host_memory
+        mem_percent = mem_current / mem_limit * 100.0 if mem_limit else 0.0
+
+        events = _read_kv(os.path.join(path, "memory.events"))
+
+        blk_read = blk_write = 0
+        try:
+            for line in _read_file(os.path.join(path, "io.stat")).splitlines():
+                for field in line.split()[1:]:
+                    key, _, value = field.partition("=")
+                    if key == "rbytes":
+                        blk_read += int(value)
+                    elif key == "wbytes":
+                        blk_write += int(value)
+        except (OSError, ValueError):
+            pass
+
+        rx, tx = self._read_net(path)
+
+        return {
+            "cpu_percent": f"{cpu_percent:.2f}%",
+            "memory_usage": f"{bytes_size(mem_current)} / {bytes_size(mem_limit)}",
+            "memory_percent": f"{mem_percent:.2f}%",
+            "net_io": f"{human_size(rx)} / {human_size(tx)}",
+            "block_io": f"{human_size(blk_read)} / {human_size(blk_write)}",
+            "oom_kill_count": events.get("oom_kill", 0)
+        }
+
+    def _read_net(self, path: str) -> Tuple[int, int]:
+        """通过 cgroup 内任一进程的 /proc/<pid>/net/dev 读取容器网络命名空间流量"""
+        try:
+            pids = _read_file(os.path.join(path, "cgroup.procs")).split()
+            if not pids:
+                return 0, 0
+            content = _read_file(f"/proc/{pids[0]}/net/dev")
+        except OSError:
+            return 0, 0
+
+        rx = tx = 0
+        for line in content.splitlines()[2:]:
+            iface, _, data = line.partition(":")
+            if iface.strip() == "lo":
+                continue
+            fields = data.split()
+            if len(fields) >= 9:
+                rx += int(fields[0])
+                tx += int(fields[8])
+        return rx, tx
+
+
+_sampler: Optional[CgroupSampler] = None
+_sampler_lock = Lock()
+
+
+def get_sampler(root: str = CGROUP_ROOT) -> Optional[CgroupSampler]:
+    """获取全局 cgroup 采样器，非 cgroup v2 主机返回 None"""
+    global _sampler
+    if not is_cgroup_v2(root):
+        return None
+    if _sampler is None or _sampler.root != root:
+        with _sampler_lock:
+            if _sampler is None or _sampler.root != root:
+                _sampler = CgroupSampler(root)
+    return _sampler
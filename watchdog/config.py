@@ -4,9 +4,12 @@
 import os
 import yaml
 from pathlib import Path
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional
 from dataclasses import dataclass, field
 
+# 项目根目录：默认配置目录的上级，相对路径的运行时状态（state/）以此为基准
+PROJECT_ROOT = Path(__file__).parent.parent
+
 
 @dataclass
 class CircuitBreakerConfig:
@@ -54,10 +57,64 @@ class ExecutorConfig:
     port: int = 9999
     allowed_actions: List[str] = field(default_factory=lambda: ["RESTART", "STOP", "INSPECT"])
 
+@dataclass
+class DockerConfig:
+    """Docker Engine API 配置（unix socket 直连，失败时回退 docker CLI）"""
+    use_api: bool = True
+    socket_path: str = "/var/run/docker.sock"
+    pool_size: int = 8
+    timeout_seconds: int = 10
+
+
+@dataclass
+class StatsConfig:
+    """资源采样配置"""
+    mode: str = "poll"  # poll: 每个资源周期批量采样; stream: 长连接订阅，采样表实时更新
+    backend: str = "docker"  # docker: Engine API / CLI; cgroup: 直接读取 cgroup v2 文件
+    cgroup_root: str = "/sys/fs/cgroup"
+    stream_check_interval_seconds: int = 1  # stream 模式下阈值检查间隔
+    stream_stale_seconds: int = 10  # 超过该时间未更新的流式采样视为失效
+    adaptive: bool = False  # poll 模式下按负载调整每个容器的采样间隔
+    adaptive_max_multiple: int = 8  # 稳定容器采样间隔上限 = check_interval_seconds 的倍数（不低于 resource_check_interval_seconds）
+    adaptive_stable_ratio: float = 0.5  # 负载低于临界阈值的该比例视为稳定，间隔逐次翻倍
+    adaptive_near_ratio: float = 0.8  # 负载达到临界阈值的该比例或持续上升时，按 check_interval_seconds 采样
+    history_dir: str = str(PROJECT_ROOT / "state" / "metrics")  # 指标历史环形缓冲文件目录（mmap，重启后恢复），为空则只保存在内存中
+    history_capacity: int = 4096  # 每个容器保留的样本数
+
+
+@dataclass
+class EventsConfig:
+    """Docker 事件流配置"""
+    cursor_file: str = str(PROJECT_ROOT / "state" / "events_cursor.json")  # 最后处理事件时间，重连/重启后据此回放
+    max_replay_seconds: int = 600  # 断线（从最后一次确认连通起算）超过该时长不再回放，改为对账
+    backoff_initial_seconds: float = 1
+    backoff_max_seconds: float = 60
+
+
+@dataclass
+class LogsConfig:
+    """容器日志读取配置"""
+    backend: str = "docker"  # docker: Engine API / CLI; file: 直接读取 json-file 日志文件
+    docker_root: str = "/var/lib/docker"
+    ring_lines: int = 1000  # 每个容器常驻内存的最近日志行数，0 表示不常驻收集
+    follow_interval_seconds: float = 1  # file 后端常驻收集时读取日志文件的间隔
+
+
+@dataclass
+class SecurityConfig:
+    """安全取证配置"""
+    backend: str = "docker"  # docker: docker top / exec netstat; proc: 读取容器 cgroup.procs 与宿主机 /proc（需 cgroup v2）
+    proc_root: str = "/proc"
+
+
 @dataclass
 class SystemConfig:
     check_interval_seconds: int = 30
     resource_check_interval_seconds: int = 120
+    reconcile_interval_seconds: int = 300  # 全量 inspect 对账间隔，其余时间存活状态由事件流维护
+    probe_workers: int = 16  # 健康/安全探测并发线程数
+    probe_timeout_seconds: int = 30  # 单个安全探测的 deadline（健康检查使用自身 timeout_seconds）
+    health_scheduler: bool = True  # 健康检查由调度器按各自间隔执行；false 时在存活检查周期内统一执行
     evidence_log_lines: int = 50
     log_level: str = "INFO"
     log_file: str = "/opt/watchdog/logs/watchdog.log"
@@ -69,6 +126,27 @@ class ThresholdConfig:
     cpu_critical: int = 90
     memory_warning: int = 70
     memory_critical: int = 85
+    # CPU_HIGH / MEMORY_HIGH 上报条件（容器可在 thresholds 中覆盖，恢复阈值为 cpu_percent_clear / memory_percent_clear）
+    cpu_clear: Optional[float] = None  # 恢复阈值，上报后回落到该值以下才会再次上报；None 表示等于临界阈值
+    memory_clear: Optional[float] = None
+    sustain_seconds: int = 0  # 超标持续时间
+    sustain_samples: int = 1  # 最近 sustain_window 个采样中至少 sustain_samples 个超标
+    sustain_window: int = 1
+    # 内存泄漏判定（最小二乘回归，容器可在 watchlist.yml 的 thresholds 中覆盖同名配置）
+    leak_slope_mb_per_min: float = 10.0  # 内存增长斜率下限
+    leak_min_r2: float = 0.8  # 拟合优度下限，过滤 GC 抖动和单次尖峰
+    leak_min_span_seconds: int = 60  # 样本最小时间跨度
+    leak_memory_percent: float = 50.0  # 内存占用下限
+    leak_window_minutes: int = 60  # 回归窗口（对 1 分钟汇总均值回归）
+    # OOM 预测（按内存增长斜率估算到达内存限制的时间，容器可在 thresholds 中覆盖）
+    oom_forecast_horizon_seconds: int = 900  # 预计到达限制的时间低于该值时报警，0 表示关闭
+    oom_forecast_window_minutes: int = 30  # 回归窗口（对 1 分钟汇总均值回归）
+    oom_forecast_min_r2: float = 0.8  # 拟合优度下限
+    # 阈值模式：static 固定百分比；baseline 相对学习到的 p99 基线（容器可用 threshold_mode 覆盖）
+    mode: str = "static"
+    baseline_factor: float = 1.5  # 超过 p99 × factor 报警
+    baseline_floor_percent: float = 50.0  # 动态阈值下限，避免低负载容器的小幅波动报警
+    baseline_min_samples: int = 60  # 学习期样本数，学习期内使用固定阈值
 
 
 @dataclass
@@ -87,7 +165,7 @@ class Config:
     def __init__(self, config_dir: str = None):
         if config_dir is None:
             # 默认配置目录
-            config_dir = Path(__file__).parent.parent / "config"
+            config_dir = PROJECT_ROOT / "config"
         
         self.config_dir = Path(config_dir)
         self.system = SystemConfig()
@@ -96,6 +174,11 @@ class Config:
         self.dify = DifyConfig()  # 保留以便向后兼容
         self.email = EmailConfig()
         self.executor = ExecutorConfig()
+        self.docker = DockerConfig()
+        self.stats = StatsConfig()
+        self.events = EventsConfig()
+        self.logs = LogsConfig()
+        self.security = SecurityConfig()
         self.thresholds = ThresholdConfig()
         self.containers: List[ContainerConfig] = []
         
@@ -116,6 +199,10 @@ class Config:
         sys_cfg = data.get('system', {})
         self.system.check_interval_seconds = sys_cfg.get('check_interval_seconds', 30)
         self.system.resource_check_interval_seconds = sys_cfg.get('resource_check_interval_seconds', 120)
+        self.system.reconcile_interval_seconds = sys_cfg.get('reconcile_interval_seconds', 300)
+        self.system.probe_workers = sys_cfg.get('probe_workers', 16)
+        self.system.probe_timeout_seconds = sys_cfg.get('probe_timeout_seconds', 30)
+        self.system.health_scheduler = sys_cfg.get('health_scheduler', True)
         self.system.evidence_log_lines = sys_cfg.get('evidence_log_lines', 50)
         self.system.log_level = sys_cfg.get('log_level', 'INFO')
         self.system.log_file = sys_cfg.get('log_file', '/opt/watchdog/logs/watchdog.log')
@@ -162,12 +249,69 @@ class Config:
         self.executor.port = exec_cfg.get('port', 9999)
         self.executor.allowed_actions = exec_cfg.get('allowed_actions', ['RESTART', 'STOP', 'INSPECT'])
         
+        # Docker API 配置
+        docker_cfg = data.get('docker', {})
+        self.docker.use_api = docker_cfg.get('use_api', True)
+        self.docker.socket_path = docker_cfg.get('socket_path', '/var/run/docker.sock')
+        self.docker.pool_size = docker_cfg.get('pool_size', 8)
+        self.docker.timeout_seconds = docker_cfg.get('timeout_seconds', 10)
+        
+        # 资源采样配置
+        stats_cfg = data.get('stats', {})
+        self.stats.mode = stats_cfg.get('mode', 'poll')
+        self.stats.backend = stats_cfg.get('backend', 'docker')
+        self.stats.cgroup_root = stats_cfg.get('cgroup_root', '/sys/fs/cgroup')
+        self.stats.stream_check_interval_seconds = stats_cfg.get('stream_check_interval_seconds', 1)
+        self.stats.stream_stale_seconds = stats_cfg.get('stream_stale_seconds', 10)
+        self.stats.adaptive = stats_cfg.get('adaptive', False)
+        self.stats.adaptive_max_multiple = stats_cfg.get('adaptive_max_multiple', 8)
+        self.stats.adaptive_stable_ratio = stats_cfg.get('adaptive_stable_ratio', 0.5)
+        self.stats.adaptive_near_ratio = stats_cfg.get('adaptive_near_ratio', 0.8)
+        self.stats.history_dir = self._resolve_path(stats_cfg.get('history_dir', 'state/metrics'))
+        self.stats.history_capacity = stats_cfg.get('history_capacity', 4096)
+        
+        # Docker 事件流配置
+        events_cfg = data.get('events', {})
+        self.events.cursor_file = self._resolve_path(events_cfg.get('cursor_file', 'state/events_cursor.json'))
+        self.events.max_replay_seconds = events_cfg.get('max_replay_seconds', 600)
+        self.events.backoff_initial_seconds = events_cfg.get('backoff_initial_seconds', 1)
+        self.events.backoff_max_seconds = events_cfg.get('backoff_max_seconds', 60)
+        
+        # 容器日志读取配置
+        logs_cfg = data.get('logs', {})
+        self.logs.backend = logs_cfg.get('backend', 'docker')
+        self.logs.docker_root = logs_cfg.get('docker_root', '/var/lib/docker')
+        self.logs.ring_lines = logs_cfg.get('ring_lines', 1000)
+        self.logs.follow_interval_seconds = logs_cfg.get('follow_interval_seconds', 1)
+        
+        # 安全取证配置
+        security_cfg = data.get('security', {})
+        self.security.backend = security_cfg.get('backend', 'docker')
+        self.security.proc_root = security_cfg.get('proc_root', '/proc')
+        
         # 全局阈值配置
         thresh_cfg = data.get('thresholds', {})
         self.thresholds.cpu_warning = thresh_cfg.get('cpu_warning', 70)
         self.thresholds.cpu_critical = thresh_cfg.get('cpu_critical', 90)
         self.thresholds.memory_warning = thresh_cfg.get('memory_warning', 70)
         self.thresholds.memory_critical = thresh_cfg.get('memory_critical', 85)
+        self.thresholds.cpu_clear = thresh_cfg.get('cpu_clear')
+        self.thresholds.memory_clear = thresh_cfg.get('memory_clear')
+        self.thresholds.sustain_seconds = thresh_cfg.get('sustain_seconds', 0)
+        self.thresholds.sustain_samples = thresh_cfg.get('sustain_samples', 1)
+        self.thresholds.sustain_window = thresh_cfg.get('sustain_window', 1)
+        self.thresholds.leak_slope_mb_per_min = thresh_cfg.get('leak_slope_mb_per_min', 10.0)
+        self.thresholds.leak_min_r2 = thresh_cfg.get('leak_min_r2', 0.8)
+        self.thresholds.leak_min_span_seconds = thresh_cfg.get('leak_min_span_seconds', 60)
+        self.thresholds.leak_memory_percent = thresh_cfg.get('leak_memory_percent', 50.0)
+        self.thresholds.leak_window_minutes = thresh_cfg.get('leak_window_minutes', 60)
+        self.thresholds.oom_forecast_horizon_seconds = thresh_cfg.get('oom_forecast_horizon_seconds', 900)
+        self.thresholds.oom_forecast_window_minutes = thresh_cfg.get('oom_forecast_window_minutes', 30)
+        self.thresholds.oom_forecast_min_r2 = thresh_cfg.get('oom_forecast_min_r2', 0.8)
+        self.thresholds.mode = thresh_cfg.get('mode', 'static')
+        self.thresholds.baseline_factor = thresh_cfg.get('baseline_factor', 1.5)
+        self.thresholds.baseline_floor_percent = thresh_cfg.get('baseline_floor_percent', 50.0)
+        self.thresholds.baseline_min_samples = thresh_cfg.get('baseline_min_samples', 60)
     
     def _load_watchlist(self):
         """加载监控容器列表"""
@@ -203,6 +347,15 @@ class Config:
         
         return value
     
+    def _resolve_path(self, value: str) -> str:
+        """相对路径以项目根目录（配置目录的上级）为基准，不随启动时的工作目录变化；空值保持为空"""
+        if not value:
+            return value
+        path = Path(value)
+        if not path.is_absolute():
+            path = self.config_dir.parent / path
+        return str(path)
+    
     def get_container(self, name: str) -> ContainerConfig:
         """获取容器配置"""
         for container in self.containers:
@@ -0,0 +1,475 @@
+"""
+Docker Engine API 客户端模块
+通过 unix socket 直接访问 Docker Engine，复用 keep-alive 连接，避免每次探测都 fork docker CLI
+"""
+import http.client
+import json
+import logging
+import os
+import socket
+import threading
+from queue import LifoQueue, Empty, Full
+from typing import Dict, Any, List, Optional, Tuple, Iterator, Callable, Union
+from urllib.parse import quote, urlencode
+
+from .config import get_config
+
+logger = logging.getLogger(__name__)
+
+
+class DockerAPIError(Exception):
+    """Docker API 返回非 2xx 状态码"""
+
+    def __init__(self, status: int, message: str = ""):
+        super().__init__(f"Docker API {status}: {message}")
+        self.status = status
+        self.message = message
+
+
+class DockerNotFound(DockerAPIError):
+    """容器（或 exec 实例）不存在"""
+
+
+class UnixHTTPConnection(http.client.HTTPConnection):
+    """基于 unix socket 的 HTTP 连接"""
+
+    def __init__(self, socket_path: str, timeout: float = 10):
+        super().__init__("localhost", timeout=timeout)
+        self.socket_path = socket_path
+
+    def connect(self):
+        sock = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+        sock.settimeout(self.timeout)
+        sock.connect(self.socket_path)
+        self.sock = sock
+
+
+class StreamHandle:
+    """
+    长连接的关闭句柄
+    读超时为 None 的连接在容器没有输出时会一直阻塞，其他线程调用 close() 断开，阻塞的读取随即返回
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn: Optional[http.client.HTTPConnection] = None
+        self.closed = False
+
+    def attach(self, conn: http.client.HTTPConnection) -> bool:
+        """登记已建立的连接，句柄已关闭时返回 False"""
+        with self._lock:
+            if self.closed:
+                return False
+            self._conn = conn
+            return True
+
+    def close(self):
+        with self._lock:
+            self.closed = True
+            conn, self._conn = self._conn, None
+        if conn is not None and conn.sock is not None:
+            try:
+                # 只 shutdown，socket 由读线程在退出时关闭
+                conn.sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+# keep-alive 连接被 daemon 关闭后复用时抛出的异常，遇到时换新连接重试一次
+_STALE_CONNECTION_ERRORS = (
+    http.client.RemoteDisconnected,
+    http.client.CannotSendRequest,
+    http.client.BadStatusLine,
+    ConnectionResetError,
+    BrokenPipeError,
+)
+
+
+class DockerClient:
+    """
+    Docker Engine API 客户端
+    维护一个 keep-alive 连接池，请求结束后连接归还复用；流式接口使用独立连接
+    """
+
+    def __init__(self, socket_path: str = "/var/run/docker.sock", pool_size: int = 8, timeout: float = 10):
+        self.socket_path = socket_path
+        self.timeout = timeout
+        self._pool: LifoQueue = LifoQueue(maxsize=pool_size)
+
+    # ---------- 连接池 ----------
+
+    def _acquire(self) -> UnixHTTPConnection:
+        try:
+            return self._pool.get_nowait()
+        except Empty:
+            return UnixHTTPConnection(self.socket_path, timeout=self.timeout)
+
+    def _release(self, conn: UnixHTTPConnection):
+        try:
+            self._pool.put_nowait(conn)
+        except Full:
+            conn.close()
+
+    def close(self):
+        """关闭池中所有连接"""
+        while True:
+            try:
+                self._pool.get_nowait().close()
+            except Empty:
+                break
+
+    # ---------- 基础请求 ----------
+
+    def request(self, method: str, path: str, params: Dict[str, Any] = None,
+                body: Any = None, timeout: float = None) -> Tuple[int, bytes]:
+        """发送请求并读完响应体，返回 (status, body)"""
+        url = path + ("?" + urlencode(params) if params else "")
+        headers = {"Host": "docker"}
+        payload = None
+        if body is not None:
+            payload = json.dumps(body).encode("utf-8")
+            headers["Content-Type"] = "application/json"
+
+        for attempt in range(2):
+            conn = self._acquire()
+            conn.timeout = timeout or self.timeout
+            if conn.sock is not None:
+                conn.sock.settimeout(conn.timeout)
+            try:
+                conn.request(method, url, body=payload, headers=headers)
+                response = conn.getresponse()
+                data = response.read()
+            except _STALE_CONNECTION_ERRORS:
+                conn.close()
+                if attempt == 0:
+                    continue
+                raise
+            except Exception:
+                conn.close()
+                raise
+
+            if response.will_close:
+                conn.close()
+            else:
+                self._release(conn)
+            return response.status, data
+
+    def get_json(self, path: str, params: Dict[str, Any] = None, timeout: float = None) -> Any:
+        """GET 并解析 JSON，非 2xx 抛出 DockerAPIError"""
+        status, data = self.request("GET", path, params=params, timeout=timeout)
+        _raise_for_status(status, data)
+        return json.loads(data) if data else None
+
+    def stream(self, path: str, params: Dict[str, Any] = None, timeout: float = None) -> Iterator[bytes]:
+        """
+        流式 GET，逐行产出响应内容（stats/events 等长连接接口）
+        使用独立连接，调用方关闭生成器即断开
+        """
+        url = path + ("?" + urlencode(params) if params else "")
+        conn = UnixHTTPConnection(self.socket_path, timeout=timeout or self.timeout)
+        try:
+            conn.request("GET", url, headers={"Host": "docker"})
+            response = conn.getresponse()
+            if response.status >= 300:
+                _raise_for_status(response.status, response.read())
+            while True:
+                line = response.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if line:
+                    yield line
+        finally:
+            conn.close()
+
+    # ---------- 容器接口 ----------
+
+    def ping(self) -> bool:
+        """检查 daemon 是否可达"""
+        try:
+            status, _ = self.request("GET", "/_ping", timeout=2)
+            return status == 200
+        except OSError:
+            return False
+
+    def inspect_container(self, container_name: str) -> Dict[str, Any]:
+        """等价于 docker inspect"""
+        return self.get_json(f"/containers/{_quote(container_name)}/json")
+
+    def container_stats(self, container_name: str, one_shot: bool = False) -> Dict[str, Any]:
+        """
+        单次资源采样（原始 stats JSON）
+        one_shot=False 时 daemon 会等待第二次采样以填充 precpu_stats；
+        one_shot=True 立即返回，precpu_stats 为空，由调用方提供上一次采样
+        """
+        params = {"stream": "false"}
+        if one_shot:
+            params["one-shot"] = "true"
+        return self.get_json(f"/containers/{_quote(container_name)}/stats", params=params)
+
+    def stream_container_stats(self, container_name: str) -> Iterator[Dict[str, Any]]:
+        """持续产出原始 stats（stream=true，daemon 约每秒推送一次）"""
+        for line in self.stream(f"/containers/{_quote(container_name)}/stats", params={"stream": "true"}):
+            yield json.loads(line)
+
+    def container_logs(self, container_name: str, tail: Union[int, str] = 50, since: Union[int, str] = None,
+                       timestamps: bool = False) -> str:
+        """
+        等价于 docker logs --tail，stdout/stderr 合并返回
+        tail 可为 "all"；since 可为带小数（纳秒）的 Unix 时间戳字符串
+        """
+        params = {"stdout": "1", "stderr": "1", "tail": str(tail)}
+        if since is not None:
+            params["since"] = str(since)
+        if timestamps:
+            params["timestamps"] = "1"
+        status, data = self.request("GET", f"/containers/{_quote(container_name)}/logs", params=params)
+        _raise_for_status(status, data)
+        stdout, stderr = demux_stream(data)
+        return (stdout + stderr).decode("utf-8", errors="replace").strip()
+
+    def follow_container_logs(self, container_name: str, since: Union[int, str] = None,
+                              tail: Union[int, str] = "all", handle: StreamHandle = None) -> Iterator[str]:
+        """
+        等价于 docker logs --follow --timestamps，按到达顺序逐行产出（带时间戳前缀）
+        使用独立连接且不设读超时（容器可能长时间没有输出）；
+        调用方关闭生成器即断开，其他线程通过 handle.close() 断开
+        """
+        params = {"stdout": "1", "stderr": "1", "follow": "1", "timestamps": "1", "tail": str(tail)}
+        if since is not None:
+            params["since"] = str(since)
+        url = f"/containers/{_quote(container_name)}/logs?" + urlencode(params)
+        conn = UnixHTTPConnection(self.socket_path, timeout=None)
+        try:
+            conn.connect()
+            if handle is not None and not handle.attach(conn):
+                return
+            conn.request("GET", url, headers={"Host": "docker"})
+            response = conn.getresponse()
+            if response.status >= 300:
+                _raise_for_status(response.status, response.read())
+            yield from iter_log_lines(response)
+        finally:
+            conn.close()
+
+    def container_top(self, container_name: str) -> Dict[str, Any]:
+        """等价于 docker top，返回 {"Titles": [...], "Processes": [[...], ...]}"""
+        return self.get_json(f"/containers/{_quote(container_name)}/top")
+
+    def exec_run(self, container_name: str, cmd: List[str], timeout: float = None) -> Tuple[int, str, str]:
+        """等价于 docker exec，返回 (exit_code, stdout, stderr)"""
+        status, data = self.request(
+            "POST", f"/containers/{_quote(container_name)}/exec",
+            body={"Cmd": cmd, "AttachStdout": True, "AttachStderr": True},
+            timeout=timeout
+        )
+        _raise_for_status(status, data)
+        exec_id = json.loads(data)["Id"]
+
+        status, data = self.request(
+            "POST", f"/exec/{exec_id}/start",
+            body={"Detach": False, "Tty": False},
+            timeout=timeout
+        )
+        _raise_for_status(status, data)
+        stdout, stderr = demux_stream(data)
+
+        info = self.get_json(f"/exec/{exec_id}/json", timeout=timeout)
+        exit_code = info.get("ExitCode")
+        return (
+            exit_code if exit_code is not None else -1,
+            stdout.decode("utf-8", errors="replace").strip(),
+            stderr.decode("utf-8", errors="replace").strip()
+        )
+
+
+def _quote(name: str) -> str:
+    return quote(name, safe="")
+
+
+def _raise_for_status(status: int, data: bytes):
+    if status < 300:
+        return
+    try:
+        message = json.loads(data).get("message", "")
+    except (ValueError, AttributeError):
+        message = data.decode("utf-8", errors="replace")
+    if status == 404:
+        raise DockerNotFound(status, message)
+    raise DockerAPIError(status, message)
+
+
+def demux_stream(data: bytes) -> Tuple[bytes, bytes]:
+    """
+    拆分 Docker 多路复用流（非 TTY 容器的 logs/exec 输出）
+    帧格式: [stream_type(1) 0 0 0 size(4, big endian)] + payload
+    TTY 容器输出不带帧头，整体视为 stdout
+    """
+    stdout, stderr = [], []
+    i = 0
+    while i + 8 <= len(data):
+        stream_type = data[i]
+        if stream_type not in (0, 1, 2) or data[i + 1:i + 4] != b"\x00\x00\x00":
+            return data, b""
+        size = int.from_bytes(data[i + 4:i + 8], "big")
+        chunk = data[i + 8:i + 8 + size]
+        (stderr if stream_type == 2 else stdout).append(chunk)
+        i += 8 + size
+    if i < len(data):
+        # 剩余不足一个帧头，说明并非多路复用格式
+        if i == 0:
+            return data, b""
+        stdout.append(data[i:])
+    return b"".join(stdout), b"".join(stderr)
+
+
+def iter_log_lines(response) -> Iterator[str]:
+    """
+    逐行解析 logs 长连接输出（response 需支持 read(n)/readline()）
+    非 TTY 容器为多路复用帧，按 stdout/stderr 分别拼接跨帧的行；TTY 容器为原始输出
+    """
+    header = response.read(8)
+    if len(header) == 8 and header[0] in (0, 1, 2) and header[1:4] == b"\x00\x00\x00":
+        pending: Dict[int, bytes] = {}
+        while len(header) == 8:
+            size = int.from_bytes(header[4:8], "big")
+            *lines, rest = (pending.pop(header[0], b"") + response.read(size)).split(b"\n")
+            if rest:
+                pending[header[0]] = rest
+            for line in lines:
+                yield line.decode("utf-8", errors="replace").rstrip("\r")
+            header = response.read(8)
+        for rest in pending.values():
+            yield rest.decode("utf-8", errors="replace").rstrip("\r")
+        return
+
+    data = header + response.readline() if header else b""
+    while data:
+        for line in data.splitlines():
+            yield line.decode("utf-8", errors="replace")
+        data = response.readline()
+
+
+# ============================================
+# stats 格式化（与 docker stats CLI 输出保持一致）
+# ============================================
+
+def _human_size(size: float, base: int, units: List[str], precision: int) -> str:
+    i = 0
+    while size >= base and i < len(units) - 1:
+        size /= base
+        i += 1
+    return f"{size:.{precision}g}{units[i]}"
+
+
+def bytes_size(size: float) -> str:
+    """二进制单位，如 100MiB（对应 docker stats 的 MemUsage）"""
+    return _human_size(size, 1024, ["B", "KiB", "MiB", "GiB", "TiB", "PiB"], 4)
+
+
+def human_size(size: float) -> str:
+    """十进制单位，如 1.23kB（对应 docker stats 的 NetIO/BlockIO）"""
+    return _human_size(size, 1000, ["B", "kB", "MB", "GB", "TB", "PB"], 3)
+
+
+def format_stats(raw: Dict[str, Any]) -> Dict[str, Any]:
+    """
+    将 Engine API 的原始 stats 转换为 get_container_stats 的返回格式
+    计算方式与 docker CLI 相同（CPU 按 precpu 差值，内存扣除 inactive_file 缓存）
+    """
+    cpu_stats = raw.get("cpu_stats") or {}
+    precpu_stats = raw.get("precpu_stats") or {}
+    cpu_usage = cpu_stats.get("cpu_usage") or {}
+    precpu_usage = precpu_stats.get("cpu_usage") or {}
+
+    cpu_percent = 0.0
+    cpu_delta = cpu_usage.get("total_usage", 0) - precpu_usage.get("total_usage", 0)
+    system_delta = cpu_stats.get("system_cpu_usage", 0) - precpu_stats.get("system_cpu_usage", 0)
+    online_cpus = cpu_stats.get("online_cpus") or len(cpu_usage.get("percpu_usage") or []) or 1
+    if system_delta > 0 and cpu_delta > 0:
+        cpu_percent = cpu_delta / system_delta * online_cpus * 100.0
+
+    memory_stats = raw.get("memory_stats") or {}
+    mem_usage = memory_stats.get("usage", 0)
+    mem_detail = memory_stats.get("stats") or {}
+    # cgroup v1: total_inactive_file, cgroup v2: inactive_file
+    cache = mem_detail.get("total_inactive_file", mem_detail.get("inactive_file", 0))
+    if cache < mem_usage:
+        mem_usage -= cache
+    mem_limit = memory_stats.get("limit", 0)
+    mem_percent = mem_usage / mem_limit * 100.0 if mem_limit else 0.0
+
+    rx = tx = 0
+    for net in (raw.get("networks") or {}).values():
+        rx += net.get("rx_bytes", 0)
+        tx += net.get("tx_bytes", 0)
+
+    blk_read = blk_write = 0
+    for entry in (raw.get("blkio_stats") or {}).get("io_service_bytes_recursive") or []:
+        op = entry.get("op", "").lower()
+        if op == "read":
+            blk_read += entry.get("value", 0)
+        elif op == "write":
+            blk_write += entry.get("value", 0)
+
+    return {
+        "cpu_percent": f"{cpu_percent:.2f}%",
+        "memory_usage": f"{bytes_size(mem_usage)} / {bytes_size(mem_limit)}",
+        "memory_percent": f"{mem_percent:.2f}%",
+        "net_io": f"{human_size(rx)} / {human_size(tx)}",
+        "block_io": f"{human_size(blk_read)} / {human_size(blk_write)}"
+    }
+
+
+# ============================================
+# 全局客户端
+# ============================================
+
+# try_api 的哨兵返回值：API 不可用，调用方应回退到 docker CLI
+API_UNAVAILABLE = object()
+
+_client: Optional[DockerClient] = None
+_client_lock = threading.Lock()
+
+
+def get_client() -> Optional[DockerClient]:
+    """获取全局 Docker API 客户端，未启用或 socket 不存在时返回 None"""
+    global _client
+    docker_cfg = get_config().docker
+    if not docker_cfg.use_api or not os.path.exists(docker_cfg.socket_path):
+        return None
+    if _client is None:
+        with _client_lock:
+            if _client is None:
+                _client = DockerClient(
+                    socket_path=docker_cfg.socket_path,
+                    pool_size=docker_cfg.pool_size,
+                    timeout=docker_cfg.timeout_seconds
+                )
+    return _client
+
+
+def try_api(func: Callable[[DockerClient], Any], not_found: Any = None, failed: Any = None) -> Any:
+    """
+    通过 API 执行 func(client)
+    - 容器不存在时返回 not_found
+    - API 未启用、socket 不存在或连接失败时返回 API_UNAVAILABLE，由调用方回退到 CLI
+    - 请求超时或 daemon 返回错误时返回 failed，不回退 CLI
+      （请求可能已在 daemon 执行，如 exec；回退会重复执行并让调用方等待两次超时）
+    """
+    client = get_client()
+    if client is None:
+        return API_UNAVAILABLE
+    try:
+        return func(client)
+    except DockerNotFound:
+        return not_found
+    except (ConnectionError, FileNotFoundError) as e:
+        logger.debug(f"Docker API 连接失败，回退到 CLI: {e}")
+        return API_UNAVAILABLE
+    except socket.timeout as e:
+        logger.warning(f"Docker API 请求超时: {e}")
+        return failed
+    except (DockerAPIError, OSError, http.client.HTTPException, ValueError, KeyError) as e:
+        logger.warning(f"Docker API 调用失败: {e}")
+        return failed
@@ -2,16 +2,32 @@
 证据收集模块
 """
 import json
+import re
 import shlex
 from datetime import datetime
-from typing import Dict, Any, Optional
+from typing import Dict, Any, Optional, Tuple
 from .config import get_config
 from .utils import run_command
+from .docker_api import try_api, API_UNAVAILABLE
+from .health import get_engine as get_health_engine
+from .logs import get_log_collector, get_tailer
 from . import security
+from . import stats as stats_module
 
 
-def get_container_info(container_name: str) -> Optional[Dict[str, Any]]:
-    """获取容器基本信息"""
+# inspect 请求失败（超时、daemon 出错）的哨兵，与容器不存在（None）区分，由调用方通过 failed 参数选用
+INSPECT_FAILED = object()
+
+
+def inspect_container(container_name: str, failed: Any = None) -> Optional[Dict[str, Any]]:
+    """
+    获取 docker inspect 原始 JSON（优先 Engine API，失败回退 CLI）
+    容器不存在返回 None；请求失败返回 failed（默认同样为 None）
+    """
+    info = try_api(lambda client: client.inspect_container(container_name), failed=failed)
+    if info is not API_UNAVAILABLE:
+        return info
+    
     code, stdout, stderr = run_command([
         'docker', 'inspect', 
         '--format', '{{json .}}',
@@ -19,10 +35,21 @@ def get_container_info(container_name: str) -> Optional[Dict[str, Any]]:
     ])
     
     if code != 0:
-        return None
+        return None if "No such" in stderr else failed
+    
+    try:
+        return json.loads(stdout)
+    except json.JSONDecodeError:
+        return failed
+
+
+def get_container_info(container_name: str, failed: Any = None) -> Optional[Dict[str, Any]]:
+    """获取容器基本信息；容器不存在返回 None，inspect 请求失败返回 failed（默认 None）"""
+    info = inspect_container(container_name, failed)
+    if info is None or info is failed:
+        return info
     
     try:
-        info = json.loads(stdout)
         state = info.get("State", {})
         host_config = info.get("HostConfig", {})
         network = info.get("NetworkSettings", {})
@@ -36,6 +63,7 @@ def get_container_info(container_name: str) -> Optional[Dict[str, Any]]:
             "running": state.get("Running", False),
             "restarting": state.get("Restarting", False),
             "paused": state.get("Paused", False),
+            "health": (state.get("Health") or {}).get("Status", ""),  # Docker HEALTHCHECK 状态
             "oom_killed": state.get("OOMKilled", False),  # OOM 判断关键
             "exit_code": state.get("ExitCode", 0),
             "error": state.get("Error", ""),  # 错误原因（如端口冲突）
@@ -51,36 +79,38 @@ def get_container_info(container_name: str) -> Optional[Dict[str, Any]]:
             "ip_address": network.get("IPAddress", ""),
             "ports": network.get("Ports", {})
         }
-    except json.JSONDecodeError:
+    except AttributeError:
         return None
 
 
 def get_container_stats(container_name: str) -> Optional[Dict[str, Any]]:
-    """获取容器资源使用情况"""
-    code, stdout, stderr = run_command([
-        'docker', 'stats', '--no-stream',
-        '--format', '{{json .}}',
-        container_name
-    ])
-    
-    if code != 0:
-        return None
-    
-    try:
-        stats = json.loads(stdout)
-        return {
-            "cpu_percent": stats.get("CPUPerc", "0%"),
-            "memory_usage": stats.get("MemUsage", ""),
-            "memory_percent": stats.get("MemPerc", "0%"),
-            "net_io": stats.get("NetIO", ""),
-            "block_io": stats.get("BlockIO", "")
-        }
-    except json.JSONDecodeError:
-        return None
+    """获取容器资源使用情况（现场采样）"""
+    return stats_module.sample_container(container_name)
 
 
 def get_container_logs(container_name: str, lines: int = 50) -> str:
-    """获取容器最近日志"""
+    """获取容器最近日志（超长时保留最新的 2000 个字符）"""
+    # 常驻收集的环形缓冲中有该容器时直接读取，无需再拉取
+    collector = get_log_collector()
+    if collector is not None:
+        recent = collector.recent(container_name, lines)
+        if recent:
+            return "\n".join(recent)[-2000:]
+    
+    logs_config = get_config().logs
+    if logs_config.backend == "file":
+        tail = get_tailer(logs_config.docker_root).tail(container_name, lines)
+        if tail is not None:
+            return "\n".join(tail)[-2000:]
+    
+    logs = try_api(lambda client: client.container_logs(container_name, tail=lines), failed=False)
+    if logs is None:
+        return "获取日志失败: 容器不存在"
+    if logs is False:
+        return "获取日志失败: Docker API 请求超时或出错"
+    if logs is not API_UNAVAILABLE:
+        return logs[-2000:]
+    
     code, stdout, stderr = run_command([
         'docker', 'logs', '--tail', str(lines),
         container_name
@@ -90,7 +120,19 @@ def get_container_logs(container_name: str, lines: int = 50) -> str:
         return f"获取日志失败: {stderr}"
     
     logs = stdout if stdout else stderr
-    return logs[:2000]
+    return logs[-2000:]
+
+
+def docker_exec(container_name: str, cmd: list, timeout: int = 10) -> tuple:
+    """在容器内执行命令，返回 (code, stdout, stderr)，与 run_command 一致"""
+    result = try_api(
+        lambda client: client.exec_run(container_name, cmd, timeout=timeout),
+        not_found=(-1, "", f"No such container: {container_name}"),
+        failed=(-1, "", "命令超时或 Docker API 调用失败")
+    )
+    if result is not API_UNAVAILABLE:
+        return result
+    return run_command(['docker', 'exec', container_name] + cmd, timeout=timeout)
 
 
 def check_container_health(container_name: str, health_config: Dict) -> Dict[str, Any]:
@@ -108,47 +150,13 @@ def check_container_health(container_name: str, health_config: Dict) -> Dict[str
 
 
 def _check_http_health(config: Dict) -> Dict[str, Any]:
-    """HTTP 健康检查"""
-    import urllib.request
-    import urllib.error
-    
-    endpoint = config.get("endpoint", "")
-    expected_status = config.get("expected_status", 200)
-    timeout = config.get("timeout_seconds", 5)
-    
-    try:
-        req = urllib.request.Request(endpoint)
-        with urllib.request.urlopen(req, timeout=timeout) as response:
-            if response.status == expected_status:
-                return {"healthy": True, "message": f"HTTP {response.status}"}
-            else:
-                return {"healthy": False, "message": f"HTTP {response.status}, 期望 {expected_status}"}
-    except urllib.error.URLError as e:
-        return {"healthy": False, "message": f"连接失败: {e.reason}"}
-    except Exception as e:
-        return {"healthy": False, "message": str(e)}
+    """HTTP 健康检查（异步引擎，复用 keep-alive 连接）"""
+    return get_health_engine().check(config)
 
 
 def _check_tcp_health(config: Dict) -> Dict[str, Any]:
-    """TCP 端口健康检查"""
-    import socket
-    
-    host = config.get("host", "localhost")
-    port = config.get("port", 80)
-    timeout = config.get("timeout_seconds", 5)
-    
-    try:
-        sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
-        sock.settimeout(timeout)
-        result = sock.connect_ex((host, port))
-        sock.close()
-        
-        if result == 0:
-            return {"healthy": True, "message": f"TCP {host}:{port} 可达"}
-        else:
-            return {"healthy": False, "message": f"TCP {host}:{port} 不可达"}
-    except Exception as e:
-        return {"healthy": False, "message": str(e)}
+    """TCP 端口健康检查（异步引擎）"""
+    return get_health_engine().check(config)
 
 
 def _check_command_health(container_name: str, config: Dict) -> Dict[str, Any]:
@@ -157,10 +165,7 @@ def _check_command_health(container_name: str, config: Dict) -> Dict[str, Any]:
     expected_output = config.get("expected_output", "")
     timeout = config.get("timeout_seconds", 5)
     
-    code, stdout, stderr = run_command(
-        ['docker', 'exec', container_name] + shlex.split(command),
-        timeout=timeout
-    )
+    code, stdout, stderr = docker_exec(container_name, shlex.split(command), timeout=timeout)
     
     if code == 0 and expected_output in stdout:
         return {"healthy": True, "message": stdout[:100]}
@@ -168,8 +173,9 @@ def _check_command_health(container_name: str, config: Dict) -> Dict[str, Any]:
         return {"healthy": False, "message": f"命令返回: {stdout or stderr}"}
 
 
-def collect_evidence(container_name: str, fault_type: str = "UNKNOWN") -> Dict[str, Any]:
-    """收集完整证据包"""
+def collect_evidence(container_name: str, fault_type: str = "UNKNOWN",
+                     details: Dict[str, Any] = None) -> Dict[str, Any]:
+    """收集完整证据包（details 为检测方附加的现场数据，合并到 evidence 中）"""
     config = get_config()
     container_config = config.get_container(container_name)
     
@@ -178,7 +184,10 @@ def collect_evidence(container_name: str, fault_type: str = "UNKNOWN") -> Dict[s
         "status": "unknown"
     }
     
-    stats = get_container_stats(container_name) or {
+    # 优先复用最近一轮资源检查的采样，避免故障现场再等待一次 docker stats
+    stats = stats_module.get_stats(
+        container_name, max_age=config.system.resource_check_interval_seconds
+    ) or {
         "cpu_percent": "0%",
         "memory_percent": "0%"
     }
@@ -212,11 +221,13 @@ def collect_evidence(container_name: str, fault_type: str = "UNKNOWN") -> Dict[s
             "cpu_percent": stats.get("cpu_percent", "0%"),
             "memory_percent": stats.get("memory_percent", "0%"),
             "memory_usage": stats.get("memory_usage", ""),
+            "oom_kill_count": stats.get("oom_kill_count"),  # 仅 cgroup 后端提供
             "logs_tail": logs,
             "security_issues": security_issues,  # 新增字段
             "active_connections": active_ips,    # 新增字段
             "restart_count_24h": container_info.get("restart_count", 0),
-            "health_check": health_result
+            "health_check": health_result,
+            **(details or {})
         },
         "fault_type": fault_type,
         "thresholds": {
@@ -268,16 +279,57 @@ def parse_memory_mb(mem_str: str) -> float:
         return 0.0
 
 
+def parse_memory_limit_mb(mem_str: str) -> Optional[float]:
+    """
+    解析内存字符串中的限制部分，返回 MB 数值
+    输入格式示例: "100MiB / 1GiB" -> 1024.0；没有限制部分或无法解析时返回 None
+    """
+    if not mem_str or '/' not in mem_str:
+        return None
+    limit_mb = parse_memory_mb(mem_str.split('/', 1)[1])
+    return limit_mb if limit_mb > 0 else None
+
+
+_SIZE_UNITS_MB = {
+    "b": 1 / 1000 / 1000,
+    "kb": 1 / 1000, "mb": 1.0, "gb": 1000.0, "tb": 1000.0 * 1000,
+    "kib": 1 / 1024, "mib": 1.0, "gib": 1024.0, "tib": 1024.0 * 1024,
+}
+
+
+def parse_io_mb(io_str: str) -> Optional[Tuple[float, float]]:
+    """
+    解析 NetIO/BlockIO 字符串，返回 (输入 MB, 输出 MB)
+    输入格式示例: "1.23kB / 4.56MB"；无法解析时返回 None
+    """
+    try:
+        parts = io_str.split('/')
+        if len(parts) != 2:
+            return None
+        values = []
+        for part in parts:
+            match = re.match(r'^\s*([\d.]+)\s*([A-Za-z]*)\s*$', part)
+            unit = (match.group(2) or "B").lower()
+            values.append(float(match.group(1)) * _SIZE_UNITS_MB[unit])
+        return values[0], values[1]
+    except (AttributeError, KeyError, ValueError):
+        return None
+
+
 def get_network_connections(container_name: str) -> Dict[str, int]:
     """
     获取容器的活跃网络连接 (IP及其连接数)
     返回格式: {"192.168.1.5": 10, "10.0.0.1": 2}
+    security.backend=proc 时直接读取容器的 /proc/<pid>/net/*，否则（或解析不到 cgroup 时）在容器内执行 netstat
     """
+    inspector = security.get_process_inspector()
+    if inspector is not None:
+        connections = inspector.connections(container_name)
+        if connections is not None:
+            return connections
+
     # 尝试使用 netstat
-    code, stdout, stderr = run_command([
-        'docker', 'exec', container_name, 
-        'netstat', '-ntu'
-    ])
+    code, stdout, stderr = docker_exec(container_name, ['netstat', '-ntu'])
     
     ip_counts = {}
     if code == 0:
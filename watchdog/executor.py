@@ -7,7 +7,8 @@ import shlex
 from datetime import datetime
 from typing import Dict, Any
 from .config import get_config
-from .evidence import get_container_info, get_container_stats, check_container_health
+from .evidence import get_container_info, check_container_health
+from .stats import get_stats
 
 
 COMMAND_TEMPLATES = {
@@ -246,8 +247,8 @@ def _execute_restart_with_retry(container_name: str, container_config, max_retri
         
         attempt_result["running"] = True
         
-        # 获取资源使用
-        stats = get_container_stats(container_name)
+        # 获取资源使用（采样表中重启后的数据可直接复用，否则现场采样）
+        stats = get_stats(container_name, max_age=delay_seconds)
         if stats is None:
             attempt_result["success"] = False
             attempt_result["reason"] = "无法获取容器资源状态"
@@ -0,0 +1,253 @@
+"""
+异步健康检查引擎
+单个后台线程运行 asyncio 事件循环，HTTP 探测复用每个端点的 keep-alive 连接，
+TCP 探测使用非阻塞连接，可同时执行成千上万个探测；返回格式与 check_container_health 一致
+HTTP 探测与 requests 一样跟随重定向，按最终响应的状态码判断
+"""
+import asyncio
+import logging
+import ssl
+from concurrent.futures import Future
+from threading import Thread, Lock
+from typing import Dict, Any, List, Tuple, Optional
+from urllib.parse import urljoin, urlsplit
+
+logger = logging.getLogger(__name__)
+
+# 每个端点保留的空闲连接上限
+MAX_IDLE_PER_ENDPOINT = 4
+
+# 跟随重定向的次数上限（同 requests）
+MAX_REDIRECTS = 30
+REDIRECT_STATUSES = (301, 302, 303, 307, 308)
+
+_Endpoint = Tuple[str, str, int]
+
+
+class _StaleConnection(Exception):
+    """复用的空闲连接已被服务端关闭"""
+
+
+class AsyncHealthEngine:
+    """asyncio 健康检查引擎（HTTP keep-alive 连接池 + TCP 探测）"""
+
+    def __init__(self, max_idle_per_endpoint: int = MAX_IDLE_PER_ENDPOINT):
+        self.max_idle_per_endpoint = max_idle_per_endpoint
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._thread: Optional[Thread] = None
+        self._lock = Lock()
+        # 仅在事件循环线程内访问
+        self._idle: Dict[_Endpoint, List[Tuple[asyncio.StreamReader, asyncio.StreamWriter]]] = {}
+
+    # ---------- 生命周期 ----------
+
+    def start(self):
+        with self._lock:
+            if self._loop is not None:
+                return
+            self._loop = asyncio.new_event_loop()
+            self._thread = Thread(target=self._loop.run_forever, name="health-engine", daemon=True)
+            self._thread.start()
+
+    def stop(self):
+        with self._lock:
+            loop, thread = self._loop, self._thread
+            self._loop = self._thread = None
+        if loop is None:
+            return
+        asyncio.run_coroutine_threadsafe(self._close_idle(), loop).result(timeout=5)
+        loop.call_soon_threadsafe(loop.stop)
+        thread.join(timeout=5)
+        loop.close()
+
+    async def _close_idle(self):
+        for connections in self._idle.values():
+            for _, writer in connections:
+                writer.close()
+        self._idle.clear()
+
+    # ---------- 对外接口 ----------
+
+    def submit(self, config: Dict[str, Any]) -> Future:
+        """提交一个 http/tcp 探测，返回 concurrent.futures.Future（结果为 {"healthy", "message"}）"""
+        self.start()
+        return asyncio.run_coroutine_threadsafe(self.probe(config), self._loop)
+
+    def check(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        """同步执行单个探测"""
+        timeout = config.get("timeout_seconds", 5)
+        return self.submit(config).result(timeout=timeout + 5)
+
+    def check_many(self, configs: Dict[str, Dict[str, Any]]) -> Dict[str, Dict[str, Any]]:
+        """并发执行一批探测，返回 {key: result}"""
+        futures = {key: self.submit(cfg) for key, cfg in configs.items()}
+        return {key: future.result() for key, future in futures.items()}
+
+    async def probe(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        check_type = config.get("type", "")
+        if check_type == "http":
+            return await self._check_http(config)
+        if check_type == "tcp":
+            return await self._check_tcp(config)
+        return {"healthy": True, "message": "无健康检查配置"}
+
+    # ---------- TCP ----------
+
+    async def _check_tcp(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        host = config.get("host", "localhost")
+        port = config.get("port", 80)
+        timeout = config.get("timeout_seconds", 5)
+
+        try:
+            _, writer = await asyncio.wait_for(asyncio.open_connection(host, port), timeout)
+            writer.close()
+            return {"healthy": True, "message": f"TCP {host}:{port} 可达"}
+        except (OSError, asyncio.TimeoutError):
+            return {"healthy": False, "message": f"TCP {host}:{port} 不可达"}
+        except Exception as e:
+            return {"healthy": False, "message": str(e)}
+
+    # ---------- HTTP ----------
+
+    async def _check_http(self, config: Dict[str, Any]) -> Dict[str, Any]:
+        endpoint = config.get("endpoint", "")
+        expected_status = config.get("expected_status", 200)
+        timeout = config.get("timeout_seconds", 5)
+
+        try:
+            status = await asyncio.wait_for(self._http_get(endpoint), timeout)
+        except asyncio.TimeoutError:
+            return {"healthy": False, "message": "连接失败: 超时"}
+        except (OSError, ValueError, asyncio.IncompleteReadError) as e:
+            return {"healthy": False, "message": f"连接失败: {e}"}
+        except Exception as e:
+            return {"healthy": False, "message": str(e)}
+
+        if status == expected_status:
+            return {"healthy": True, "message": f"HTTP {status}"}
+        return {"healthy": False, "message": f"HTTP {status}, 期望 {expected_status}"}
+
+    async def _http_get(self, url: str) -> int:
+        """GET 请求并返回最终状态码（跟随重定向）"""
+        for _ in range(MAX_REDIRECTS + 1):
+            status, location = await self._http_get_once(url)
+            if status not in REDIRECT_STATUSES or not location:
+                return status
+            url = urljoin(url, location)
+        raise ValueError(f"重定向次数超过 {MAX_REDIRECTS}")
+
+    async def _http_get_once(self, url: str) -> Tuple[int, Optional[str]]:
+        """单次 GET 请求，返回 (状态码, Location)；优先复用空闲连接，复用失败时换新连接重试一次"""
+        parts = urlsplit(url)
+        if parts.scheme not in ("http", "https") or not parts.hostname:
+            raise ValueError(f"无效的健康检查地址: {url}")
+        endpoint = (parts.scheme, parts.hostname, parts.port or (443 if parts.scheme == "https" else 80))
+        path = parts.path or "/"
+        if parts.query:
+            path += "?" + parts.query
+        host_header = parts.netloc.rsplit("@", 1)[-1]
+
+        connection = self._take_idle(endpoint)
+        if connection is not None:
+            try:
+                return await self._request(endpoint, connection, path, host_header)
+            except (_StaleConnection, ConnectionError, asyncio.IncompleteReadError):
+                pass
+
+        connection = await self._connect(endpoint)
+        return await self._request(endpoint, connection, path, host_header)
+
+    def _take_idle(self, endpoint: _Endpoint):
+        connections = self._idle.get(endpoint)
+        while connections:
+            reader, writer = connections.pop()
+            if not writer.is_closing() and not reader.at_eof():
+                return reader, writer
+            writer.close()
+        return None
+
+    def _put_idle(self, endpoint: _Endpoint, connection):
+        connections = self._idle.setdefault(endpoint, [])
+        if len(connections) < self.max_idle_per_endpoint:
+            connections.append(connection)
+        else:
+            connection[1].close()
+
+    async def _connect(self, endpoint: _Endpoint):
+        scheme, host, port = endpoint
+        ssl_context = ssl.create_default_context() if scheme == "https" else None
+        return await asyncio.open_connection(host, port, ssl=ssl_context)
+
+    async def _request(self, endpoint: _Endpoint, connection, path: str,
+                       host_header: str) -> Tuple[int, Optional[str]]:
+        reader, writer = connection
+        reusable = False
+        try:
+            writer.write(
+                f"GET {path} HTTP/1.1\r\n"
+                f"Host: {host_header}\r\n"
+                "User-Agent: cloud-watchdog\r\n"
+                "Accept: */*\r\n"
+                "Connection: keep-alive\r\n\r\n".encode("latin-1")
+            )
+            await writer.drain()
+
+            status_line = await reader.readline()
+            if not status_line:
+                raise _StaleConnection()
+            version, status, _ = (status_line.decode("latin-1").rstrip("\r\n") + "  ").split(" ", 2)
+            status = int(status)
+
+            headers = {}
+            while True:
+                line = await reader.readline()
+                if line in (b"\r\n", b"\n", b""):
+                    break
+                name, _, value = line.decode("latin-1").partition(":")
+                headers[name.strip().lower()] = value.strip()
+
+            # 读完响应体，连接才能复用
+            if headers.get("transfer-encoding", "").lower() == "chunked":
+                while True:
+                    size = int((await reader.readline()).split(b";")[0].strip() or b"0", 16)
+                    await reader.readexactly(size + 2)
+                    if size == 0:
+                        break
+                reusable = True
+            elif "content-length" in headers:
+                await reader.readexactly(int(headers["content-length"]))
+                reusable = True
+            elif status in (204, 304) or 100 <= status < 200:
+                reusable = True
+            else:
+                await reader.read()
+
+            if headers.get("connection", "").lower() == "close" or version == "HTTP/1.0":
+                reusable = False
+            return status, headers.get("location")
+        finally:
+            if reusable:
+                self._put_idle(endpoint, connection)
+            else:
+                writer.close()
+
+
+_engine: Optional[AsyncHealthEngine] = None
+_engine_lock = Lock()
+
+
+def get_engine() -> AsyncHealthEngine:
+    """获取全局健康检查引擎（首次使用时启动事件循环线程）"""
+    global _engine
+    if _engine is None:
+        with _engine_lock:
+            if _engine is None:
+                _engine = AsyncHealthEngine()
+    _engine.start()
+    return _engine
+
+
+def stop_engine():
+    """停止事件循环线程并关闭空闲连接（监控停止时调用，之后 get_engine 会重新启动）"""
+    if _engine is not None:
+        _engine.stop()
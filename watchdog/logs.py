@@ -0,0 +1,585 @@
+"""
+容器日志增量读取模块
+每个容器维护一个日志游标，每轮只读取游标之后的新日志，扫描量与新增日志量成正比，每行日志只被检测一次
+- docker 后端：游标为最后一条日志的时间戳，通过 docker logs --since 拉取
+- file 后端：游标为 json-file 日志文件的字节偏移，直接 mmap 读取，无子进程
+启用常驻收集（LogCollector）时，每个容器的新日志持续写入内存环形缓冲，安全扫描和证据收集直接读缓冲
+"""
+import calendar
+import json
+import logging
+import mmap
+import os
+import time
+from collections import deque
+from itertools import chain, islice
+from threading import Event, Lock, Thread
+from typing import Callable, Dict, Iterable, List, Optional, Set, Tuple
+
+from .utils import run_command
+from .docker_api import get_client, try_api, API_UNAVAILABLE, StreamHandle
+
+logger = logging.getLogger(__name__)
+
+# 首次读取（没有游标）时取最近的行数
+INITIAL_TAIL = 100
+
+DOCKER_ROOT = "/var/lib/docker"
+
+# 单次从日志文件读取的上限，突发日志超出部分留到下一轮
+MAX_READ_BYTES = 8 * 1024 * 1024
+
+
+def parse_log_timestamp(value: str) -> Optional[Tuple[int, int]]:
+    """
+    解析 docker logs --timestamps 的 RFC3339Nano 时间戳
+    "2025-01-01T12:00:00.123456789Z" -> (1735732800, 123456789)；无法解析时返回 None
+    """
+    if len(value) < 20 or value[10] != "T" or not value.endswith("Z"):
+        return None
+    try:
+        seconds = calendar.timegm(time.strptime(value[:19], "%Y-%m-%dT%H:%M:%S"))
+    except ValueError:
+        return None
+    fraction = value[19:-1]
+    if not fraction:
+        return seconds, 0
+    if fraction[0] != "." or not fraction[1:].isdigit():
+        return None
+    return seconds, int(fraction[1:10].ljust(9, "0"))
+
+
+class LogCursor:
+    """
+    单个容器的日志游标
+    docker logs --since 包含等于游标时间戳的日志，因此同时记住该时间戳下已见过的行用于去重
+    """
+
+    __slots__ = ("last", "_seen")
+
+    def __init__(self):
+        self.last: Optional[Tuple[int, int]] = None
+        self._seen: Set[str] = set()
+
+    @property
+    def since(self) -> Optional[str]:
+        """docker logs --since 参数（带纳秒的 Unix 时间戳），没有游标时为 None"""
+        if self.last is None:
+            return None
+        return f"{self.last[0]}.{self.last[1]:09d}"
+
+    def advance(self, raw: str) -> List[str]:
+        """
+        消费一次带时间戳的日志输出，返回游标之后的新日志行（去掉时间戳前缀）
+        stdout/stderr 分别返回，时间上可能交错，因此按本次读取前的游标过滤
+        """
+        last, seen = self.last, self._seen
+        new_last, new_seen = last, set(seen)
+        lines = []
+        for line in raw.splitlines():
+            stamp, _, text = line.partition(" ")
+            key = parse_log_timestamp(stamp)
+            if key is None:
+                if line:
+                    lines.append(line)
+                continue
+            if last is not None and (key < last or (key == last and line in seen)):
+                continue
+            lines.append(text)
+            if new_last is None or key > new_last:
+                new_last, new_seen = key, {line}
+            elif key == new_last:
+                new_seen.add(line)
+        self.last, self._seen = new_last, new_seen
+        return lines
+
+
+def fetch_logs(container_name: str, since: str = None, tail: int = INITIAL_TAIL) -> Optional[str]:
+    """
+    获取带时间戳的容器日志（stdout/stderr 合并）
+    since 为 None 时取最近 tail 行，否则取 since 之后的全部日志；失败返回 None
+    """
+    logs = try_api(lambda client: client.container_logs(
+        container_name, tail="all" if since else tail, since=since, timestamps=True
+    ))
+    if logs is None:
+        return None
+    if logs is not API_UNAVAILABLE:
+        return logs
+
+    cmd = ['docker', 'logs', '--timestamps']
+    cmd += ['--since', since] if since else ['--tail', str(tail)]
+    code, stdout, stderr = run_command(cmd + [container_name])
+    if code != 0:
+        return None
+    return "\n".join(part for part in (stdout, stderr) if part)
+
+
+def _decode_json_lines(data: bytes) -> List[str]:
+    """解析 json-file 日志内容（每行一个 {"log": ..., "stream": ..., "time": ...}）"""
+    lines = []
+    for raw in data.split(b"\n"):
+        if not raw:
+            continue
+        try:
+            entry = json.loads(raw)
+        except ValueError:
+            continue
+        lines.append(str(entry.get("log", "")).rstrip("\n"))
+    return lines
+
+
+def _read_range(path: str, start: int, end: int) -> Tuple[List[str], int]:
+    """读取 [start, end) 内的完整行，返回 (日志行, 新偏移)；末尾未写完的行留到下次"""
+    end = min(end, start + MAX_READ_BYTES)
+    if end <= start:
+        return [], start
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = min(end, len(mm))
+        stop = mm.rfind(b"\n", start, end)
+        if stop < 0:
+            # 单行超过读取上限时跳过，避免游标停滞
+            return [], end if end - start >= MAX_READ_BYTES else start
+        return _decode_json_lines(mm[start:stop + 1]), stop + 1
+
+
+def _read_tail(path: str, size: int, lines: int) -> Tuple[List[str], int]:
+    """从文件末尾向前找最近 lines 行，返回 (日志行, 最后一个完整行之后的偏移)"""
+    if size <= 0:
+        return [], 0
+    with open(path, "rb") as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+        end = mm.rfind(b"\n")
+        if end < 0:
+            return [], 0
+        start = end
+        for _ in range(lines):
+            start = mm.rfind(b"\n", 0, start)
+            if start < 0:
+                break
+        return _decode_json_lines(mm[start + 1:end + 1]), end + 1
+
+
+def _inspect_log_path(container_name: str, docker_root: str) -> Optional[str]:
+    """json-file 驱动的日志文件路径，其他日志驱动返回 None"""
+    info = try_api(lambda client: client.inspect_container(container_name))
+    if info is API_UNAVAILABLE:
+        code, stdout, _ = run_command([
+            'docker', 'inspect', '--format', '{{json .}}', container_name
+        ])
+        if code != 0:
+            return None
+        try:
+            info = json.loads(stdout)
+        except json.JSONDecodeError:
+            return None
+    if not info:
+        return None
+    log_config = (info.get("HostConfig") or {}).get("LogConfig") or {}
+    if log_config.get("Type", "json-file") != "json-file":
+        return None
+    container_id = info.get("Id", "")
+    return info.get("LogPath") or os.path.join(docker_root, "containers", container_id, f"{container_id}-json.log")
+
+
+class _FileCursor:
+    __slots__ = ("path", "inode", "offset")
+
+    def __init__(self, path: str, inode: int, offset: int):
+        self.path = path
+        self.inode = inode
+        self.offset = offset
+
+
+class JsonFileTailer:
+    """
+    json-file 日志文件直接读取
+    每个容器记录 (文件路径, inode, 字节偏移)：inode 变化视为轮转，先读完 <path>.1 中剩余的部分再从新文件开头读；
+    文件变小视为被截断，从头读
+    """
+
+    def __init__(self, docker_root: str = DOCKER_ROOT, initial_tail: int = INITIAL_TAIL):
+        self.docker_root = docker_root
+        self.initial_tail = initial_tail
+        self._lock = Lock()
+        self._paths: Dict[str, str] = {}
+        self._cursors: Dict[str, _FileCursor] = {}
+
+    def resolve(self, container_name: str) -> Optional[str]:
+        """解析容器日志文件路径（文件消失后重新解析），不可读时返回 None"""
+        with self._lock:
+            path = self._paths.get(container_name)
+        if path and os.path.isfile(path):
+            return path
+
+        path = _inspect_log_path(container_name, self.docker_root)
+        if not path or not os.access(path, os.R_OK):
+            logger.debug(f"容器 {container_name} 的日志文件不可读，回退 docker logs")
+            return None
+        with self._lock:
+            self._paths[container_name] = path
+        return path
+
+    def read_new(self, container_name: str, initial_tail: int = None) -> Optional[List[str]]:
+        """
+        自上次读取以来的新日志行（首次为最近 initial_tail 行，默认取构造参数），
+        无法读取文件时返回 None
+        """
+        path = self.resolve(container_name)
+        if path is None:
+            return None
+        try:
+            st = os.stat(path)
+            with self._lock:
+                cursor = self._cursors.get(container_name)
+            if cursor is None:
+                tail = self.initial_tail if initial_tail is None else initial_tail
+                lines, offset = _read_tail(path, st.st_size, tail)
+                with self._lock:
+                    self._cursors[container_name] = _FileCursor(path, st.st_ino, offset)
+                return lines
+
+            lines = []
+            if cursor.inode != st.st_ino or cursor.path != path:
+                rotated = cursor.path + ".1"
+                try:
+                    rotated_st = os.stat(rotated)
+                    if rotated_st.st_ino == cursor.inode:
+                        lines, _ = _read_range(rotated, cursor.offset, rotated_st.st_size)
+                except OSError:
+                    pass
+                cursor.path, cursor.inode, cursor.offset = path, st.st_ino, 0
+            elif st.st_size < cursor.offset:
+                cursor.offset = 0
+
+            new_lines, cursor.offset = _read_range(path, cursor.offset, st.st_size)
+            return lines + new_lines
+        except (OSError, ValueError) as e:
+            logger.debug(f"读取容器日志文件失败: {container_name} - {e}")
+            return None
+
+    def tail(self, container_name: str, lines: int) -> Optional[List[str]]:
+        """最近 lines 行日志（不移动游标），无法读取文件时返回 None"""
+        path = self.resolve(container_name)
+        if path is None:
+            return None
+        try:
+            return _read_tail(path, os.path.getsize(path), lines)[0]
+        except (OSError, ValueError) as e:
+            logger.debug(f"读取容器日志文件失败: {container_name} - {e}")
+            return None
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._paths.pop(container_name, None)
+            self._cursors.pop(container_name, None)
+
+
+_tailer: Optional[JsonFileTailer] = None
+_tailer_lock = Lock()
+
+
+def get_tailer(docker_root: str = DOCKER_ROOT) -> JsonFileTailer:
+    """获取全局 json-file 日志读取器"""
+    global _tailer
+    if _tailer is None or _tailer.docker_root != docker_root:
+        with _tailer_lock:
+            if _tailer is None or _tailer.docker_root != docker_root:
+                _tailer = JsonFileTailer(docker_root)
+    return _tailer
+
+
+class LogFollower:
+    """
+    所有监控容器的增量日志读取
+    配置了 tailer 时优先直接读取日志文件，无法读取的容器回退 docker logs
+    """
+
+    def __init__(self, initial_tail: int = INITIAL_TAIL, tailer: JsonFileTailer = None):
+        self.initial_tail = initial_tail
+        self.tailer = tailer
+        self._cursors: Dict[str, LogCursor] = {}
+        self._lock = Lock()
+
+    def cursor(self, container_name: str) -> LogCursor:
+        with self._lock:
+            cursor = self._cursors.get(container_name)
+            if cursor is None:
+                cursor = self._cursors[container_name] = LogCursor()
+            return cursor
+
+    def read_new(self, container_name: str) -> List[str]:
+        """自上次读取以来的新日志行（首次为最近 initial_tail 行），读取失败时返回空列表"""
+        if self.tailer is not None:
+            lines = self.tailer.read_new(container_name)
+            if lines is not None:
+                return lines
+        cursor = self.cursor(container_name)
+        raw = fetch_logs(container_name, cursor.since, self.initial_tail)
+        if raw is None:
+            logger.debug(f"读取容器日志失败: {container_name}")
+            return []
+        return cursor.advance(raw)
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._cursors.pop(container_name, None)
+        if self.tailer is not None:
+            self.tailer.forget(container_name)
+
+
+class LogRing:
+    """
+    单个容器最近日志行的定长环形缓冲（seq 为累计写入行数，用于增量读取）
+    订阅时回填的历史日志之后记下 backfill_seq，增量读取从这里开始，重启后不会重新扫描旧日志
+    两次增量读取之间写入超过容量时，尚未读取就被覆盖的行在覆盖前交给 scan 扫描，
+    命中的特征和丢失行数由 take_overflow() 取走，每行仍只扫描一次
+    """
+
+    __slots__ = ("_lines", "seq", "backfill_seq", "_lock", "_scan", "_read_seq", "_dropped", "_dropped_hits")
+
+    def __init__(self, capacity: int, scan: Callable[[str], List[str]] = None):
+        self._lines = deque(maxlen=max(1, capacity))
+        self.seq = 0
+        self.backfill_seq: Optional[int] = None
+        self._lock = Lock()
+        self._scan = scan
+        self._read_seq: Optional[int] = None  # 增量读取已读到的位置
+        self._dropped = 0
+        self._dropped_hits: Dict[str, None] = {}
+
+    def __len__(self) -> int:
+        return len(self._lines)
+
+    def extend(self, lines: Iterable[str]):
+        lines = list(lines)
+        with self._lock:
+            self._scan_overflow(lines)
+            self._lines.extend(lines)
+            self.seq += len(lines)
+
+    def _scan_overflow(self, lines: List[str]):
+        """扫描本次写入将覆盖（或直接溢出）的未读行（调用方持有锁）"""
+        overflow = len(self._lines) + len(lines) - self._lines.maxlen
+        read_seq = self._read_seq if self._read_seq is not None else self.backfill_seq
+        if self._scan is None or overflow <= 0 or read_seq is None:
+            return
+        first = self.seq - len(self._lines)
+        start = max(0, read_seq - first)
+        if start >= overflow:
+            return
+        unread = list(islice(chain(self._lines, lines), start, overflow))
+        self._dropped += len(unread)
+        for pattern in self._scan("\n".join(unread)):
+            self._dropped_hits[pattern] = None
+
+    def take_overflow(self) -> Tuple[int, List[str]]:
+        """上次调用以来未读即被覆盖的行数及其中命中的特征（取走后清空）"""
+        with self._lock:
+            dropped, hits = self._dropped, list(self._dropped_hits)
+            self._dropped = 0
+            self._dropped_hits = {}
+            return dropped, hits
+
+    def mark_backfilled(self):
+        """回填的历史日志已写入，之后的行才是订阅后的新日志"""
+        with self._lock:
+            self.backfill_seq = self.seq
+
+    def recent(self, lines: int) -> List[str]:
+        with self._lock:
+            if lines <= 0:
+                return []
+            return list(islice(self._lines, max(0, len(self._lines) - lines), None))
+
+    def read_since(self, seq: Optional[int]) -> Tuple[List[str], Optional[int]]:
+        """
+        seq 之后写入的行（已被覆盖的部分丢失）及当前 seq
+        seq 为 None 时从回填结束处开始；尚未回填完成时返回 ([], None)
+        """
+        with self._lock:
+            if seq is None:
+                if self.backfill_seq is None:
+                    return [], None
+                seq = self.backfill_seq
+            count = min(max(0, self.seq - seq), len(self._lines))
+            self._read_seq = self.seq
+            return list(islice(self._lines, len(self._lines) - count, None)), self.seq
+
+
+class LogCollector:
+    """
+    常驻日志收集
+    每个监控容器一个后台线程，把新日志持续写入 LogRing：
+    - 配置了 tailer 且日志文件可读时，按 poll_interval 增量读取 json-file 日志文件
+    - 否则维持 docker logs --follow 长连接，断开（容器重启/daemon 重启）后按时间戳游标续读
+    容器崩溃或被删除后缓冲仍保留最后的日志，docker logs 已看不到的行也能用于取证
+    """
+
+    def __init__(self, capacity: int = 1000, tailer: JsonFileTailer = None,
+                 poll_interval: float = 1, retry_seconds: float = 5,
+                 scan: Callable[[str], List[str]] = None):
+        self.capacity = capacity
+        self.scan = scan  # 未读即被覆盖的日志行在覆盖前的扫描函数（见 LogRing）
+        self.tailer = tailer
+        self.poll_interval = poll_interval
+        self.retry_seconds = retry_seconds
+        self._stop_event = Event()
+        self._rings: Dict[str, LogRing] = {}
+        self._threads: Dict[str, Thread] = {}
+        self._stopped: Dict[str, Event] = {}
+        self._handles: Dict[str, StreamHandle] = {}  # 当前 follow 长连接，取消订阅时断开
+        self._lock = Lock()
+
+    def subscribe(self, container_name: str):
+        """开始收集容器日志（重复订阅忽略）"""
+        with self._lock:
+            if container_name in self._threads:
+                return
+            ring = self._rings.get(container_name)
+            if ring is None:
+                ring = self._rings[container_name] = LogRing(self.capacity, self.scan)
+            stopped = Event()
+            thread = Thread(target=self._run, args=(container_name, ring, stopped), daemon=True)
+            self._threads[container_name] = thread
+            self._stopped[container_name] = stopped
+            thread.start()
+
+    def unsubscribe(self, container_name: str):
+        """停止收集并断开 follow 长连接，已缓冲的日志保留"""
+        with self._lock:
+            stopped = self._stopped.pop(container_name, None)
+            self._threads.pop(container_name, None)
+            handle = self._handles.pop(container_name, None)
+            if stopped is not None:
+                stopped.set()
+        if handle is not None:
+            handle.close()
+
+    def subscriptions(self) -> List[str]:
+        with self._lock:
+            return list(self._threads)
+
+    def ring(self, container_name: str) -> Optional[LogRing]:
+        with self._lock:
+            return self._rings.get(container_name)
+
+    def recent(self, container_name: str, lines: int) -> Optional[List[str]]:
+        """最近 lines 行日志，未收集该容器时返回 None"""
+        ring = self.ring(container_name)
+        return ring.recent(lines) if ring is not None else None
+
+    def read_since(self, container_name: str, seq: Optional[int]) -> Tuple[List[str], Optional[int]]:
+        """seq 之后收集到的日志行及新的 seq（seq 为 None 时从订阅时的回填结束处开始）"""
+        ring = self.ring(container_name)
+        if ring is None:
+            return [], seq
+        return ring.read_since(seq)
+
+    def take_overflow(self, container_name: str) -> Tuple[int, List[str]]:
+        """未读即被覆盖的行数及其中命中的特征（见 LogRing.take_overflow）"""
+        ring = self.ring(container_name)
+        if ring is None:
+            return 0, []
+        return ring.take_overflow()
+
+    def stop(self, timeout: float = 5):
+        """停止所有收集线程并断开 follow 长连接（整体最多等待 timeout 秒）"""
+        self._stop_event.set()
+        with self._lock:
+            threads = list(self._threads.values())
+            for stopped in self._stopped.values():
+                stopped.set()
+            handles = list(self._handles.values())
+            self._threads.clear()
+            self._stopped.clear()
+            self._handles.clear()
+        for handle in handles:
+            handle.close()
+        deadline = time.monotonic() + timeout
+        for thread in threads:
+            thread.join(timeout=max(0.0, deadline - time.monotonic()))
+
+    def _run(self, container_name: str, ring: LogRing, stopped: Event):
+        cursor = LogCursor()
+        backfilled = False
+        while not stopped.is_set() and not self._stop_event.is_set():
+            if self.tailer is not None:
+                lines = self.tailer.read_new(container_name, initial_tail=self.capacity)
+                if lines is not None:
+                    if lines:
+                        ring.extend(lines)
+                    if not backfilled:
+                        ring.mark_backfilled()
+                        backfilled = True
+                    stopped.wait(self.poll_interval)
+                    continue
+
+            try:
+                if not backfilled:
+                    # 先回填最近 capacity 行历史（供取证），再从其时间戳之后 follow
+                    raw = fetch_logs(container_name, cursor.since, self.capacity)
+                    if raw is None:
+                        stopped.wait(self.retry_seconds)
+                        continue
+                    ring.extend(cursor.advance(raw))
+                    ring.mark_backfilled()
+                    backfilled = True
+
+                client = get_client()
+                if client is None:
+                    # 没有 Engine API 时按重连间隔用 docker logs --since 轮询
+                    raw = fetch_logs(container_name, cursor.since, self.capacity)
+                    if raw:
+                        ring.extend(cursor.advance(raw))
+                else:
+                    handle = self._register_handle(container_name, stopped)
+                    if handle is None:
+                        break
+                    try:
+                        for line in client.follow_container_logs(container_name, since=cursor.since,
+                                                                 tail="all", handle=handle):
+                            if stopped.is_set() or self._stop_event.is_set():
+                                break
+                            lines = cursor.advance(line)
+                            if lines:
+                                ring.extend(lines)
+                    finally:
+                        with self._lock:
+                            if self._handles.get(container_name) is handle:
+                                del self._handles[container_name]
+            except Exception as e:
+                logger.debug(f"容器 {container_name} 日志流中断: {e}")
+            stopped.wait(self.retry_seconds)
+
+    def _register_handle(self, container_name: str, stopped: Event) -> Optional[StreamHandle]:
+        """登记本次 follow 连接的关闭句柄；已取消订阅时返回 None"""
+        with self._lock:
+            if stopped.is_set() or self._stop_event.is_set():
+                return None
+            handle = self._handles[container_name] = StreamHandle()
+            return handle
+
+
+_collector: Optional[LogCollector] = None
+
+
+def start_log_collector(capacity: int, tailer: JsonFileTailer = None, poll_interval: float = 1,
+                        scan: Callable[[str], List[str]] = None) -> LogCollector:
+    """创建全局日志收集器（替换并停止已有的收集器）"""
+    global _collector
+    if _collector is not None:
+        _collector.stop()
+    _collector = LogCollector(capacity, tailer=tailer, poll_interval=poll_interval, scan=scan)
+    return _collector
+
+
+def get_log_collector() -> Optional[LogCollector]:
+    """全局日志收集器，未启用时为 None"""
+    return _collector
+
+
+def stop_log_collector():
+    global _collector
+    if _collector is not None:
+        _collector.stop()
+        _collector = None
@@ -0,0 +1,126 @@
+"""
+多模式匹配模块
+找出所有规则的所有出现位置（含重叠）。规则较少时逐条用 str 子串查找（C 实现，
+几十条规则时比纯 Python 自动机快一个数量级）；规则较多时编译为 Aho-Corasick 自动机，
+对文本单次扫描，耗时与规则数量无关，可支撑上千条特征
+"""
+from collections import deque
+from dataclasses import dataclass
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+# 去重后的特征串不超过该数量时使用子串查找，否则使用 Aho-Corasick 自动机
+# （tests/benchmark_matcher.py 实测两者在约 300 条特征处持平）
+SUBSTRING_SEARCH_MAX_PATTERNS = 256
+
+
+@dataclass(frozen=True)
+class PatternMatch:
+    """一次命中"""
+    offset: int  # 命中在文本中的起始位置
+    pattern: str
+    category: str
+
+
+class PatternMatcher:
+    """
+    编译后的多模式匹配器（大小写敏感的子串匹配）
+    patterns 为 {分类: [特征串, ...]}；同一特征串可属于多个分类
+    automaton 为 None 时按特征数量选择匹配方式，True / False 强制使用自动机 / 子串查找
+    """
+
+    def __init__(self, patterns: Dict[str, Iterable[str]], automaton: Optional[bool] = None):
+        self._goto: List[Dict[str, int]] = [{}]
+        self._fail: List[int] = [0]
+        self._out: List[Tuple[int, ...]] = [()]
+        self._entries: List[Tuple[str, str]] = []
+        # 特征串 -> 所属分类（按编译顺序）
+        self._categories: Dict[str, List[str]] = {}
+
+        for category, items in patterns.items():
+            for pattern in items or ():
+                if not pattern:
+                    continue
+                pattern, category = str(pattern), str(category)
+                self._entries.append((pattern, category))
+                self._categories.setdefault(pattern, []).append(category)
+
+        if automaton is None:
+            automaton = len(self._categories) > SUBSTRING_SEARCH_MAX_PATTERNS
+        self.automaton = automaton
+        if automaton:
+            for index, (pattern, _) in enumerate(self._entries):
+                self._insert(pattern, index)
+            self._build_failure_links()
+
+    def _insert(self, pattern: str, index: int):
+        state = 0
+        for ch in pattern:
+            nxt = self._goto[state].get(ch)
+            if nxt is None:
+                nxt = len(self._goto)
+                self._goto.append({})
+                self._fail.append(0)
+                self._out.append(())
+                self._goto[state][ch] = nxt
+            state = nxt
+        self._out[state] += (index,)
+
+    def _build_failure_links(self):
+        # 按深度广度优先，失败链接指向的状态总是更浅，其输出已合并完整
+        goto, fail, out = self._goto, self._fail, self._out
+        queue = deque(goto[0].values())
+        while queue:
+            state = queue.popleft()
+            for ch, nxt in goto[state].items():
+                queue.append(nxt)
+                f = fail[state]
+                while f and ch not in goto[f]:
+                    f = fail[f]
+                fail[nxt] = goto[f].get(ch, 0)
+                out[nxt] += out[fail[nxt]]
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @property
+    def patterns(self) -> List[str]:
+        """按编译顺序去重的特征串"""
+        return list(self._categories)
+
+    def finditer(self, text: str) -> Iterator[PatternMatch]:
+        """按命中结束位置顺序返回所有命中"""
+        if not self.automaton:
+            yield from self._search(text)
+            return
+        goto, fail, out, entries = self._goto, self._fail, self._out, self._entries
+        state = 0
+        for i, ch in enumerate(text):
+            while state and ch not in goto[state]:
+                state = fail[state]
+            state = goto[state].get(ch, 0)
+            if out[state]:
+                for index in out[state]:
+                    pattern, category = entries[index]
+                    yield PatternMatch(i - len(pattern) + 1, pattern, category)
+
+    def _search(self, text: str) -> List[PatternMatch]:
+        """逐条特征串查找所有出现位置（含重叠），按结束位置排序"""
+        hits = []
+        for pattern, categories in self._categories.items():
+            offset = text.find(pattern)
+            while offset >= 0:
+                hits.extend((offset + len(pattern), -len(pattern), offset, pattern, category)
+                            for category in categories)
+                offset = text.find(pattern, offset + 1)
+        hits.sort()
+        return [PatternMatch(offset, pattern, category) for _, _, offset, pattern, category in hits]
+
+    def findall(self, text: str) -> List[PatternMatch]:
+        return list(self.finditer(text))
+
+    def found(self, text: str) -> List[str]:
+        """文本中出现过的特征串（按编译顺序，每个只出现一次）"""
+        if not self.automaton:
+            return [pattern for pattern in self._categories if pattern in text]
+        hits = {match.pattern for match in self.finditer(text)}
+        return [pattern for pattern in self.patterns if pattern in hits]
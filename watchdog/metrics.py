@@ -0,0 +1,769 @@
+"""
+指标存储模块
+每个容器一个定长环形缓冲：时间戳为 int64 毫秒，每项指标一列 float32，全部预分配；
+窗口以 memoryview 切片返回，不复制数据；points() 复制后读取，顺序锁保证不返回读取期间被覆盖的样本。
+单个样本占 8 + 4×指标数 字节，缺失的指标记为 NaN
+
+指定目录时环形缓冲映射到磁盘文件（mmap），写入即落到页缓存，
+watchdog 重启后直接映射回来，无需解析即可恢复历史
+
+另外为每个指标增量维护 1 分钟 / 1 小时两级汇总（min/max/mean/p95，p95 用 P² 估计），
+长时间跨度的报表和趋势检查只读取几百个汇总点；指定目录时已封闭的汇总桶同样映射到磁盘文件，
+保留时长（1 天 / 30 天）不受重启影响
+"""
+import logging
+import math
+import mmap
+import os
+import time
+from array import array
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Iterator, List, Optional, Tuple
+
+from .baseline import P2Quantile
+
+logger = logging.getLogger(__name__)
+
+# 每个容器保留的样本数（1 秒采样约 68 分钟）
+DEFAULT_CAPACITY = 4096
+
+_NAN = float("nan")
+
+
+class MetricRing:
+    """
+    单个容器的定长环形缓冲（单写多读，无锁）
+    写者覆盖最旧的槽位时读者可能正在读取该槽位；写入前后各递增一次 seq（顺序锁，写入中为奇数），
+    points() 复制窗口后按复制期间的写入次数丢弃可能被覆盖的最旧样本
+    """
+
+    __slots__ = ("capacity", "times", "values", "head", "count", "seq")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        self.capacity = capacity
+        self.times = array("q", bytes(8 * capacity))
+        self.values: Dict[str, array] = {}
+        self.head = 0  # 下一个写入位置
+        self.count = 0
+        self.seq = 0
+
+    def __len__(self):
+        return self.count
+
+    def append(self, timestamp: float, metrics: Dict[str, float]):
+        """写入一个样本；新出现的指标分配一列（历史部分为 NaN）"""
+        index = self.head
+        for metric in metrics:
+            if metric not in self.values:
+                self._add_column(metric)
+        self.seq += 1
+        for metric, column in self.values.items():
+            value = metrics.get(metric)
+            column[index] = _NAN if value is None else value
+        self.times[index] = int(timestamp * 1000)
+        # 数据写完后再移动 head，读者不会看到未写完的新样本
+        self.head = (index + 1) % self.capacity
+        if self.count < self.capacity:
+            self.count += 1
+        self.seq += 1
+
+    def _add_column(self, metric: str):
+        self.values[metric] = array("f", [_NAN]) * self.capacity
+
+    def segments(self, last: int = None) -> List[Tuple[int, int]]:
+        """最近 last 个样本在数组中的 [start, end) 区间，按时间顺序，环绕时为两段"""
+        n = self.count if last is None else min(last, self.count)
+        if n <= 0:
+            return []
+        start = (self.head - n) % self.capacity
+        if start + n <= self.capacity:
+            return [(start, start + n)]
+        return [(start, self.capacity), (0, self.head)]
+
+    def window(self, metric: str, last: int = None) -> List[Tuple[memoryview, memoryview]]:
+        """
+        最近 last 个样本的 (时间戳毫秒, 值) memoryview 切片（不复制）
+        与写者并发时最旧的样本可能被覆盖，需要一致读取时使用 points()
+        """
+        column = self.values.get(metric)
+        if column is None:
+            return []
+        times = memoryview(self.times)
+        values = memoryview(column)
+        return [(times[start:end], values[start:end]) for start, end in self.segments(last)]
+
+    def points(self, metric: str, last: int = None) -> Iterator[Tuple[float, float]]:
+        """按时间顺序迭代 (时间戳秒, 值)，跳过 NaN；复制期间被写者覆盖的最旧样本丢弃"""
+        column = self.values.get(metric)
+        if column is None:
+            return iter(())
+        # 写入进行中（奇数）时，正在写的样本也计为一次写入
+        seq = self.seq & ~1
+        segments = self.segments(last)
+        times = array("q")
+        values = array("f")
+        for start, end in segments:
+            times.extend(self.times[start:end])
+            values.extend(column[start:end])
+        # 复制期间的第 k 次写入落在窗口起点之后第 k - (capacity - n) 个槽位
+        writes = (self.seq - seq + 1) // 2
+        torn = min(len(times), max(0, writes - (self.capacity - len(times))))
+        return (
+            (timestamp / 1000.0, value)
+            for timestamp, value in zip(times[torn:], values[torn:])
+            if not math.isnan(value)
+        )
+
+    def discard_before(self, cutoff: float) -> int:
+        """丢弃时间戳早于 cutoff（秒）的最旧样本，返回丢弃数量（只在没有写者时调用，如恢复历史时）"""
+        cutoff_ms = int(cutoff * 1000)
+        stale = 0
+        for start, end in self.segments():
+            for index in range(start, end):
+                if self.times[index] >= cutoff_ms:
+                    break
+                stale += 1
+            else:
+                continue
+            break
+        self.count -= stale
+        return stale
+
+    def latest(self, metric: str) -> Optional[Tuple[float, float]]:
+        column = self.values.get(metric)
+        if column is None or self.count == 0:
+            return None
+        index = (self.head - 1) % self.capacity
+        if math.isnan(column[index]):
+            return None
+        return self.times[index] / 1000.0, column[index]
+
+    def nbytes(self) -> int:
+        return self.times.itemsize * self.capacity + sum(
+            column.itemsize * self.capacity for column in self.values.values()
+        )
+
+
+# 环形缓冲文件布局：
+#   [0, 8)     魔数
+#   [8, 32)    capacity, head, count（int64）
+#   [64, 320)  列名，每列 32 字节（UTF-8，\0 填充）
+#   [320, ...) 时间戳列 int64 × capacity，随后 MAX_COLUMNS 个 float32 × capacity 列
+_RING_MAGIC = b"WDRING1\0"
+_HEADER_SIZE = 64
+_NAME_SIZE = 32
+MAX_COLUMNS = 8
+_DATA_OFFSET = _HEADER_SIZE + MAX_COLUMNS * _NAME_SIZE
+RING_SUFFIX = ".ring"
+
+
+class MappedMetricRing(MetricRing):
+    """
+    映射到磁盘文件的环形缓冲
+    单写者无锁追加：先写样本数据，再更新文件头中的 head/count，
+    崩溃重启后只会恢复完整写入的样本；与并发读者的覆盖冲突同 MetricRing（seq 只在内存中）
+    """
+
+    __slots__ = ("path", "_mmap", "_header")
+
+    def __init__(self, path: str, capacity: int = DEFAULT_CAPACITY):
+        self.path = path
+        self.values = {}
+        self.seq = 0
+        size = _DATA_OFFSET + capacity * (8 + 4 * MAX_COLUMNS)
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = os.fstat(fd).st_size != size
+            if fresh:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        view = memoryview(self._mmap)
+        self._header = view[8:32].cast("q")
+        if not fresh and (view[:8] != _RING_MAGIC or self._header[0] != capacity):
+            logger.warning(f"指标文件格式不匹配，重新初始化: {path}")
+            fresh = True
+
+        self.capacity = capacity
+        self.times = view[_DATA_OFFSET:_DATA_OFFSET + capacity * 8].cast("q")
+        if fresh:
+            view[:8] = _RING_MAGIC
+            self._header[0] = capacity
+            self._header[1] = self._header[2] = 0
+            view[_HEADER_SIZE:_DATA_OFFSET] = bytes(MAX_COLUMNS * _NAME_SIZE)
+            return
+
+        for slot in range(MAX_COLUMNS):
+            raw = bytes(view[_HEADER_SIZE + slot * _NAME_SIZE:_HEADER_SIZE + (slot + 1) * _NAME_SIZE])
+            name = raw.rstrip(b"\0").decode("utf-8", "replace")
+            if not name:
+                break
+            self.values[name] = self._column_view(slot)
+
+    # head/count 存放在文件头中
+    @property
+    def head(self) -> int:
+        return self._header[1]
+
+    @head.setter
+    def head(self, value: int):
+        self._header[1] = value
+
+    @property
+    def count(self) -> int:
+        return self._header[2]
+
+    @count.setter
+    def count(self, value: int):
+        self._header[2] = value
+
+    def _column_view(self, slot: int) -> memoryview:
+        start = _DATA_OFFSET + self.capacity * (8 + 4 * slot)
+        return memoryview(self._mmap)[start:start + self.capacity * 4].cast("f")
+
+    def _add_column(self, metric: str):
+        slot = len(self.values)
+        encoded = metric.encode("utf-8")
+        if slot >= MAX_COLUMNS or len(encoded) > _NAME_SIZE:
+            logger.debug(f"指标文件列已满或列名过长，忽略指标 {metric}: {self.path}")
+            # 占位列不落盘，只保证本次写入不报错
+            self.values[metric] = array("f", [_NAN]) * self.capacity
+            return
+        column = self._column_view(slot)
+        column[:] = array("f", [_NAN]) * self.capacity
+        offset = _HEADER_SIZE + slot * _NAME_SIZE
+        self._mmap[offset:offset + _NAME_SIZE] = encoded.ljust(_NAME_SIZE, b"\0")
+        self.values[metric] = column
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        self.flush()
+        try:
+            self.times.release()
+            self._header.release()
+            for column in self.values.values():
+                if isinstance(column, memoryview):
+                    column.release()
+            self._mmap.close()
+        except BufferError:
+            # 仍有读者持有窗口视图，留给进程退出时释放
+            pass
+
+
+# 降采样层级：(名称, 桶宽秒数, 保留桶数)
+ROLLUP_TIERS = (
+    ("1m", 60, 24 * 60),  # 1 天
+    ("1h", 3600, 24 * 30),  # 30 天
+)
+
+
+@dataclass
+class Rollup:
+    """一个汇总桶"""
+    start: int  # 桶起始时间（秒）
+    count: int
+    min: float
+    max: float
+    mean: float
+    p95: float
+
+
+class RollupRing:
+    """
+    单个指标一个层级的汇总环形缓冲
+    已封闭的桶存放在定长 array 中，当前桶增量累计 min/max/sum，p95 用 P² 估计（不保存样本）；
+    样本落入新桶时封闭当前桶；早于当前桶或最后一个已封闭桶的迟到样本丢弃
+    """
+
+    __slots__ = ("bucket_seconds", "capacity", "starts", "counts", "mins", "maxs", "means", "p95s",
+                 "head", "size", "_open_start", "_open_count", "_open_sum", "_open_min", "_open_max",
+                 "_open_p95")
+
+    def __init__(self, bucket_seconds: int, capacity: int):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self.starts = array("q", bytes(8 * capacity))
+        self.counts = array("i", bytes(4 * capacity))
+        self.mins = array("f", bytes(4 * capacity))
+        self.maxs = array("f", bytes(4 * capacity))
+        self.means = array("f", bytes(4 * capacity))
+        self.p95s = array("f", bytes(4 * capacity))
+        self.head = 0
+        self.size = 0
+        self._reset_open(None)
+
+    def _reset_open(self, start: Optional[int]):
+        self._open_start = start
+        self._open_count = 0
+        self._open_sum = 0.0
+        self._open_min = math.inf
+        self._open_max = -math.inf
+        self._open_p95 = P2Quantile(0.95)
+
+    def add(self, timestamp: float, value: float):
+        start = int(timestamp // self.bucket_seconds) * self.bucket_seconds
+        if self._open_start is None:
+            # 从文件恢复的汇总：已封闭的桶不再接收样本
+            if self.size and start <= self.starts[(self.head - 1) % self.capacity]:
+                return
+            self._open_start = start
+        elif start > self._open_start:
+            self._close()
+            self._reset_open(start)
+        elif start < self._open_start:
+            return
+
+        self._open_count += 1
+        self._open_sum += value
+        if value < self._open_min:
+            self._open_min = value
+        if value > self._open_max:
+            self._open_max = value
+        self._open_p95.add(value)
+
+    def _open_rollup(self) -> Optional[Rollup]:
+        if not self._open_count:
+            return None
+        return Rollup(
+            start=self._open_start,
+            count=self._open_count,
+            min=self._open_min,
+            max=self._open_max,
+            mean=self._open_sum / self._open_count,
+            p95=self._open_p95.value(),
+        )
+
+    def _close(self):
+        rollup = self._open_rollup()
+        if rollup is None:
+            return
+        index = self.head
+        self.starts[index] = rollup.start
+        self.counts[index] = rollup.count
+        self.mins[index] = rollup.min
+        self.maxs[index] = rollup.max
+        self.means[index] = rollup.mean
+        self.p95s[index] = rollup.p95
+        # 桶数据写完后再移动 head/size（文件映射时崩溃重启只会恢复完整的桶）
+        self.head = (index + 1) % self.capacity
+        if self.size < self.capacity:
+            self.size += 1
+
+    def rows(self, since: float = None, include_open: bool = True) -> List[Rollup]:
+        """按时间顺序返回起始时间不早于 since 的汇总桶（默认包含未封闭的当前桶）"""
+        rows = []
+        for offset in range(self.size):
+            index = (self.head - self.size + offset) % self.capacity
+            if since is not None and self.starts[index] < since:
+                continue
+            rows.append(Rollup(self.starts[index], self.counts[index], self.mins[index],
+                               self.maxs[index], self.means[index], self.p95s[index]))
+        if include_open:
+            current = self._open_rollup()
+            if current is not None and (since is None or current.start >= since):
+                rows.append(current)
+        return rows
+
+    def latest_start(self) -> Optional[int]:
+        if self._open_count:
+            return self._open_start
+        if self.size:
+            return self.starts[(self.head - 1) % self.capacity]
+        return None
+
+    @staticmethod
+    def block_size(capacity: int) -> int:
+        """文件中一个层级占用的字节数：head/size + starts(int64) + counts(int32) + 4 列 float32"""
+        return 16 + capacity * (8 + 4 * 5)
+
+
+class MappedRollupRing(RollupRing):
+    """
+    已封闭的桶映射到汇总文件中的一段（布局见 block_size），head/size 存放在该段开头；
+    未封闭的当前桶只在内存中，重启后由恢复的原始样本重放补齐
+    """
+
+    __slots__ = ("_header",)
+
+    def __init__(self, bucket_seconds: int, capacity: int, view: memoryview, fresh: bool):
+        self.bucket_seconds = bucket_seconds
+        self.capacity = capacity
+        self._header = view[:16].cast("q")
+        offset = 16
+        self.starts = view[offset:offset + 8 * capacity].cast("q")
+        offset += 8 * capacity
+        self.counts = view[offset:offset + 4 * capacity].cast("i")
+        offset += 4 * capacity
+        columns = []
+        for _ in range(4):
+            columns.append(view[offset:offset + 4 * capacity].cast("f"))
+            offset += 4 * capacity
+        self.mins, self.maxs, self.means, self.p95s = columns
+        if fresh:
+            self._header[0] = self._header[1] = 0
+        self._reset_open(None)
+
+    @property
+    def head(self) -> int:
+        return self._header[0]
+
+    @head.setter
+    def head(self, value: int):
+        self._header[0] = value
+
+    @property
+    def size(self) -> int:
+        return self._header[1]
+
+    @size.setter
+    def size(self, value: int):
+        self._header[1] = value
+
+    def release(self):
+        for view in (self._header, self.starts, self.counts, self.mins, self.maxs, self.means, self.p95s):
+            view.release()
+
+
+# 汇总文件布局：
+#   [0, 8)        魔数
+#   [8, H)        每个层级的 (桶宽秒数, 保留桶数)（int64），H = 8 + 16 × 层级数
+#   [H, H+256)    列名，每列 32 字节（同环形缓冲文件）
+#   [H+256, ...)  MAX_COLUMNS 个指标段，每段依次为各层级的 RollupRing.block_size 字节
+_ROLLUP_MAGIC = b"WDROLL1\0"
+ROLLUP_SUFFIX = ".rollup"
+
+
+class MappedRollupFile:
+    """单个容器所有指标、所有层级的汇总文件（mmap），已封闭的桶写入即落到页缓存"""
+
+    __slots__ = ("path", "tiers", "series", "_mmap", "_names_offset", "_block_size")
+
+    def __init__(self, path: str, tiers: Dict[str, Tuple[int, int]]):
+        self.path = path
+        self.tiers = tiers
+        self.series: Dict[str, Dict[str, RollupRing]] = {}
+        signature = array("q", [n for bucket_seconds, capacity in tiers.values() for n in (bucket_seconds, capacity)])
+        self._names_offset = 8 + len(signature) * 8
+        self._block_size = sum(RollupRing.block_size(capacity) for _, capacity in tiers.values())
+        size = self._names_offset + MAX_COLUMNS * _NAME_SIZE + MAX_COLUMNS * self._block_size
+
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fresh = os.fstat(fd).st_size != size
+            if fresh:
+                os.ftruncate(fd, 0)
+                os.ftruncate(fd, size)
+            self._mmap = mmap.mmap(fd, size)
+        finally:
+            os.close(fd)
+
+        view = memoryview(self._mmap)
+        if not fresh and (view[:8] != _ROLLUP_MAGIC
+                          or view[8:self._names_offset] != signature.tobytes()):
+            logger.warning(f"汇总文件格式不匹配，重新初始化: {path}")
+            fresh = True
+        if fresh:
+            view[:8] = _ROLLUP_MAGIC
+            view[8:self._names_offset] = signature.tobytes()
+            view[self._names_offset:self._names_offset + MAX_COLUMNS * _NAME_SIZE] = bytes(MAX_COLUMNS * _NAME_SIZE)
+            return
+
+        for slot in range(MAX_COLUMNS):
+            offset = self._names_offset + slot * _NAME_SIZE
+            name = bytes(view[offset:offset + _NAME_SIZE]).rstrip(b"\0").decode("utf-8", "replace")
+            if not name:
+                break
+            self.series[name] = self._rings(slot, fresh=False)
+
+    def _rings(self, slot: int, fresh: bool) -> Dict[str, RollupRing]:
+        offset = self._names_offset + MAX_COLUMNS * _NAME_SIZE + slot * self._block_size
+        rings = {}
+        for name, (bucket_seconds, capacity) in self.tiers.items():
+            size = RollupRing.block_size(capacity)
+            view = memoryview(self._mmap)[offset:offset + size]
+            rings[name] = MappedRollupRing(bucket_seconds, capacity, view, fresh)
+            offset += size
+        return rings
+
+    def add_metric(self, metric: str) -> Optional[Dict[str, RollupRing]]:
+        """为新指标分配一个文件段；列已满或列名过长时返回 None（由调用方改用内存汇总）"""
+        slot = len(self.series)
+        encoded = metric.encode("utf-8")
+        if slot >= MAX_COLUMNS or len(encoded) > _NAME_SIZE:
+            logger.debug(f"汇总文件列已满或列名过长，指标 {metric} 的汇总仅保存在内存中: {self.path}")
+            return None
+        rings = self._rings(slot, fresh=True)
+        offset = self._names_offset + slot * _NAME_SIZE
+        self._mmap[offset:offset + _NAME_SIZE] = encoded.ljust(_NAME_SIZE, b"\0")
+        self.series[metric] = rings
+        return rings
+
+    def flush(self):
+        self._mmap.flush()
+
+    def close(self):
+        self.flush()
+        try:
+            for rings in self.series.values():
+                for ring in rings.values():
+                    if isinstance(ring, MappedRollupRing):
+                        ring.release()
+            self._mmap.close()
+        except BufferError:
+            # 仍有读者持有视图，留给进程退出时释放
+            pass
+
+
+class RollupStore:
+    """
+    所有容器、所有指标的多级汇总
+    directory 不为空时每个容器的已封闭桶映射到一个汇总文件，创建时映射回目录中已有的汇总，
+    长时间跨度的报表不受原始环形缓冲容量限制，重启后仍可用
+    """
+
+    __slots__ = ("tiers", "directory", "_series", "_files", "_lock")
+
+    def __init__(self, tiers=ROLLUP_TIERS, directory: str = None):
+        self.tiers = {name: (bucket_seconds, capacity) for name, bucket_seconds, capacity in tiers}
+        self.directory = directory
+        self._series: Dict[str, Dict[str, Dict[str, RollupRing]]] = {}
+        self._files: Dict[str, MappedRollupFile] = {}
+        self._lock = Lock()
+        if directory and os.path.isdir(directory):
+            for filename in os.listdir(directory):
+                if filename.endswith(ROLLUP_SUFFIX):
+                    name = filename[:-len(ROLLUP_SUFFIX)]
+                    try:
+                        rollup_file = MappedRollupFile(os.path.join(directory, filename), self.tiers)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"映射汇总文件失败 {filename}: {e}")
+                        continue
+                    self._files[name] = rollup_file
+                    self._series[name] = rollup_file.series
+
+    def _new_series(self, container_name: str) -> Dict[str, Dict[str, RollupRing]]:
+        if not self.directory:
+            return {}
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, container_name.replace(os.sep, "_") + ROLLUP_SUFFIX)
+            rollup_file = MappedRollupFile(path, self.tiers)
+        except (OSError, ValueError) as e:
+            logger.warning(f"创建汇总文件失败，{container_name} 的汇总仅保存在内存中: {e}")
+            return {}
+        self._files[container_name] = rollup_file
+        return rollup_file.series
+
+    def observe(self, container_name: str, metrics: Dict[str, float], timestamp: float):
+        series = self._series.get(container_name)
+        if series is None:
+            with self._lock:
+                series = self._series.get(container_name)
+                if series is None:
+                    series = self._series[container_name] = self._new_series(container_name)
+        for metric, value in metrics.items():
+            if value is None or math.isnan(value):
+                continue
+            tiers = series.get(metric)
+            if tiers is None:
+                rollup_file = self._files.get(container_name)
+                tiers = rollup_file.add_metric(metric) if rollup_file is not None else None
+                if tiers is None:
+                    tiers = series[metric] = {
+                        name: RollupRing(bucket_seconds, capacity)
+                        for name, (bucket_seconds, capacity) in self.tiers.items()
+                    }
+            for ring in tiers.values():
+                ring.add(timestamp, value)
+
+    def ring(self, container_name: str, metric: str, tier: str) -> Optional[RollupRing]:
+        return self._series.get(container_name, {}).get(metric, {}).get(tier)
+
+    def rows(self, container_name: str, metric: str, tier: str, since: float = None) -> List[Rollup]:
+        ring = self.ring(container_name, metric, tier)
+        return ring.rows(since) if ring is not None else []
+
+    def recent(self, container_name: str, metric: str, tier: str, window_seconds: float) -> List[Rollup]:
+        """最近 window_seconds 内的汇总桶（以该指标最新的桶为终点）"""
+        ring = self.ring(container_name, metric, tier)
+        if ring is None:
+            return []
+        latest = ring.latest_start()
+        if latest is None:
+            return []
+        return ring.rows(since=latest - window_seconds)
+
+    def summary(self, container_name: str, metric: str, tier: str = "1h",
+                since: float = None) -> Optional[Dict[str, float]]:
+        """
+        合并一段时间的汇总桶
+        p95 取各桶 p95 的最大值（保守估计）
+        """
+        rows = self.rows(container_name, metric, tier, since)
+        if not rows:
+            return None
+        count = sum(row.count for row in rows)
+        return {
+            "samples": count,
+            "min": min(row.min for row in rows),
+            "max": max(row.max for row in rows),
+            "mean": sum(row.mean * row.count for row in rows) / count,
+            "p95": max(row.p95 for row in rows),
+        }
+
+    def metrics(self, container_name: str) -> List[str]:
+        return list(self._series.get(container_name, {}))
+
+    def names(self) -> List[str]:
+        return list(self._series)
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._series.pop(container_name, None)
+            rollup_file = self._files.pop(container_name, None)
+        if rollup_file is not None:
+            rollup_file.close()
+            try:
+                os.remove(rollup_file.path)
+            except OSError:
+                pass
+
+    def flush(self):
+        for rollup_file in list(self._files.values()):
+            rollup_file.flush()
+
+    def close(self):
+        with self._lock:
+            files, self._files = list(self._files.values()), {}
+            self._series = {}
+        for rollup_file in files:
+            rollup_file.close()
+
+
+class MetricStore:
+    """
+    所有容器的指标环形缓冲
+    directory 不为空时使用文件映射环形缓冲，并在创建时映射回目录中已有的历史；
+    每个样本同时写入多级汇总（rollups，同一目录下的汇总文件），
+    恢复的历史重放到汇总中补齐重启前未封闭的桶（已封闭的桶从汇总文件恢复，不会重复计入）。
+    max_age 不为空时恢复的历史中早于 max_age 秒前的样本直接丢弃，不与新样本混在一起参与回归
+    """
+
+    __slots__ = ("capacity", "directory", "rollups", "_rings", "_lock")
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY, directory: str = None, max_age: float = None):
+        self.capacity = capacity
+        self.directory = directory
+        self.rollups = RollupStore(directory=directory)
+        self._rings: Dict[str, MetricRing] = {}
+        self._lock = Lock()
+        if directory and os.path.isdir(directory):
+            cutoff = time.time() - max_age if max_age else None
+            for filename in os.listdir(directory):
+                if filename.endswith(RING_SUFFIX):
+                    name = filename[:-len(RING_SUFFIX)]
+                    try:
+                        ring = MappedMetricRing(os.path.join(directory, filename), capacity)
+                    except (OSError, ValueError) as e:
+                        logger.warning(f"映射指标文件失败 {filename}: {e}")
+                        continue
+                    if cutoff is not None:
+                        stale = ring.discard_before(cutoff)
+                        if stale:
+                            logger.debug(f"丢弃 {name} 的 {stale} 个过期历史样本")
+                    self._rings[name] = ring
+                    for metric in list(ring.values):
+                        for timestamp, value in ring.points(metric):
+                            self.rollups.observe(name, {metric: value}, timestamp)
+
+    def _new_ring(self, container_name: str) -> MetricRing:
+        if not self.directory:
+            return MetricRing(self.capacity)
+        try:
+            os.makedirs(self.directory, exist_ok=True)
+            path = os.path.join(self.directory, container_name.replace(os.sep, "_") + RING_SUFFIX)
+            return MappedMetricRing(path, self.capacity)
+        except (OSError, ValueError) as e:
+            logger.warning(f"创建指标文件失败，{container_name} 的历史仅保存在内存中: {e}")
+            return MetricRing(self.capacity)
+
+    def ring(self, container_name: str) -> Optional[MetricRing]:
+        return self._rings.get(container_name)
+
+    def append(self, container_name: str, metrics: Dict[str, float], timestamp: float = None):
+        if timestamp is None:
+            timestamp = time.time()
+        ring = self._rings.get(container_name)
+        if ring is None:
+            with self._lock:
+                ring = self._rings.get(container_name)
+                if ring is None:
+                    ring = self._rings[container_name] = self._new_ring(container_name)
+        ring.append(timestamp, metrics)
+        self.rollups.observe(container_name, metrics, timestamp)
+
+    def points(self, container_name: str, metric: str, last: int = None) -> Iterator[Tuple[float, float]]:
+        ring = self._rings.get(container_name)
+        if ring is None:
+            return iter(())
+        return ring.points(metric, last)
+
+    def metrics(self, container_name: str) -> List[str]:
+        ring = self._rings.get(container_name)
+        return list(ring.values) if ring is not None else []
+
+    def names(self) -> List[str]:
+        return list(self._rings)
+
+    def forget(self, container_name: str):
+        with self._lock:
+            ring = self._rings.pop(container_name, None)
+        self.rollups.forget(container_name)
+        if isinstance(ring, MappedMetricRing):
+            ring.close()
+            try:
+                os.remove(ring.path)
+            except OSError:
+                pass
+
+    def flush(self):
+        for ring in list(self._rings.values()):
+            if isinstance(ring, MappedMetricRing):
+                ring.flush()
+        self.rollups.flush()
+
+    def close(self):
+        with self._lock:
+            rings, self._rings = list(self._rings.values()), {}
+        for ring in rings:
+            if isinstance(ring, MappedMetricRing):
+                ring.close()
+        self.rollups.close()
+
+    def nbytes(self) -> int:
+        return sum(ring.nbytes() for ring in list(self._rings.values()))
+
+
+_store: Optional[MetricStore] = None
+
+
+def open_metric_store(capacity: int = DEFAULT_CAPACITY, directory: str = None,
+                      max_age: float = None) -> MetricStore:
+    """创建全局指标存储（监控启动时调用，报表等模块通过 get_metric_store 读取）"""
+    global _store
+    if _store is not None:
+        _store.close()
+    _store = MetricStore(capacity, directory, max_age)
+    return _store
+
+
+def get_metric_store() -> Optional[MetricStore]:
+    """获取全局指标存储，监控未启动时返回 None"""
+    return _store
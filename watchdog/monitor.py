@@ -8,24 +8,60 @@ import requests
 import logging
 import select
 from datetime import datetime, timedelta
-from typing import Dict, Any, List
-from threading import Thread, Event
-from collections import deque
+from typing import Dict, Any, List, Optional
+from threading import Thread, Event, Lock
+from concurrent.futures import ThreadPoolExecutor, Future, FIRST_COMPLETED, wait as wait_futures
 
 from .config import get_config
 from .evidence import (
     collect_evidence, 
     get_container_info, 
-    get_container_stats,
+    INSPECT_FAILED,
     check_container_health,
     parse_percent,
     parse_memory_mb,
-    get_container_logs
+    parse_io_mb
 )
+from .stats import collect_all_stats, forget_container, get_stats_table, StatsStreamer
+from .state import ContainerStateTable, EventCursor
+from .health import get_engine as get_health_engine, stop_engine as stop_health_engine
+from .scheduler import HealthScheduler
+from .trend import TrendEngine, seconds_until
+from .metrics import open_metric_store
+from .baseline import BaselineTracker
+from .alarm import AlarmRule, AlarmTable
+from .procfs import ProcessTracker
+from .logs import LogCollector, LogFollower, get_tailer, start_log_collector, stop_log_collector
 from . import security
 
 logger = logging.getLogger(__name__)
 
+# 探测超过 deadline 仍未返回时的结果占位
+PROBE_TIMEOUT = object()
+
+# 健康检查 deadline 在 timeout_seconds 之外的宽限时间
+HEALTH_PROBE_GRACE_SECONDS = 2
+
+
+class _Probe:
+    """
+    线程池中的一次探测
+    deadline 从探测实际开始执行时起算，在线程池队列中等待的时间不计入
+    """
+    
+    def __init__(self, func, deadline: float, started_at: float = None):
+        self.func = func
+        self.deadline = deadline
+        self.started_at = started_at
+    
+    def __call__(self):
+        self.started_at = time.monotonic()
+        return self.func()
+    
+    def expired(self, now: float) -> bool:
+        started_at = self.started_at
+        return started_at is not None and now >= started_at + self.deadline
+
 
 class ContainerMonitor:
     """
@@ -33,14 +69,40 @@ class ContainerMonitor:
     Handles event listening (Docker Events API) and resource polling.
     """
     
+    # Docker events that drive the container state table
+    SUBSCRIBED_EVENTS = ("start", "stop", "die", "oom", "kill", "restart", "health_status", "destroy")
+    
     def __init__(self):
         self.config = get_config()
         self.stop_event = Event()
         self.threads: List[Thread] = []
         
-        # Resource usage history for trend analysis
-        # Structure: {container_name: deque([(time, mem_mb), ...])}
-        self.stats_history: Dict[str, deque] = {}
+        # Rolling least-squares trends per container (memory, CPU, restarts, network counters);
+        # in-memory until start() maps the on-disk history
+        self.trend = TrendEngine()
+        
+        # Learned per-container CPU/memory quantiles for thresholds.mode == "baseline"
+        self.baselines = BaselineTracker()
+        
+        # Sustained-breach / hysteresis state for CPU_HIGH and MEMORY_HIGH
+        self.alarms = AlarmTable()
+        
+        # Per-container log cursors so security scans only see new log lines
+        self.log_follower = LogFollower(
+            tailer=get_tailer(self.config.logs.docker_root) if self.config.logs.backend == "file" else None
+        )
+        
+        # Per-container process snapshots; security scans only see newly spawned processes
+        self.process_tracker = ProcessTracker()
+        
+        # Always-on log rings (created in start()); security scans then read ring sequence numbers
+        self.log_collector: LogCollector = None
+        self._log_seq: Dict[str, Optional[int]] = {}
+        
+        # Adaptive sampling: per-container interval, next due time (monotonic) and last load ratio
+        self._sample_interval: Dict[str, float] = {}
+        self._next_sample: Dict[str, float] = {}
+        self._last_load: Dict[str, float] = {}
         
         # Circuit breaker and deduplication state
         self.report_history: Dict[str, List[datetime]] = {}
@@ -49,11 +111,55 @@ class ContainerMonitor:
         
         # Cache monitored container names for O(1) lookup
         self._monitored_names: set = {c.name for c in self.config.containers}
+        
+        # Streaming stats subscriptions (only in stats.mode == "stream")
+        self.stats_streamer: StatsStreamer = None
+        
+        # Event-sourced container state; full inspect only on reconciliation
+        self.state_table = ContainerStateTable()
+        self._last_reconcile: float = 0.0
+        
+        # Last processed Docker event, persisted so the stream can resume with --since
+        self.event_cursor = EventCursor(self.config.events.cursor_file)
+        
+        # Bounded worker pool for per-container probes (created lazily)
+        self._probe_pool: ThreadPoolExecutor = None
+        self._inflight_probes: Dict[tuple, Future] = {}
+        
+        # Per-container health check scheduling (timer wheel, created in start())
+        self.health_scheduler: HealthScheduler = None
+        # 调度器发起的、尚未返回的健康探测（用于判断超时是否从开始执行时起算）
+        self._health_probes: Dict[str, _Probe] = {}
+        
+        # Health results now arrive from worker threads; serialize report decisions
+        self._report_lock = Lock()
     
     def start(self):
         """Initialize and start monitoring threads."""
         logger.info("启动容器监控...")
         
+        if self.config.stats.history_dir:
+            store = open_metric_store(
+                self.config.stats.history_capacity,
+                directory=self.config.stats.history_dir,
+                max_age=self._history_max_age(),
+            )
+            self.trend = TrendEngine(store)
+            if store.names():
+                logger.info(f"已恢复 {len(store.names())} 个容器的指标历史")
+        
+        logs_cfg = self.config.logs
+        if logs_cfg.ring_lines > 0:
+            self.log_collector = start_log_collector(
+                logs_cfg.ring_lines,
+                tailer=self.log_follower.tailer,
+                poll_interval=logs_cfg.follow_interval_seconds,
+                scan=security.check_logs_for_injection
+            )
+            for container_config in self.config.containers:
+                self.log_collector.subscribe(container_config.name)
+            logger.info(f"已开始收集 {len(self.config.containers)} 个容器的日志（每个容器保留 {logs_cfg.ring_lines} 行）")
+        
         polling_thread = Thread(target=self._polling_loop, daemon=True)
         polling_thread.start()
         self.threads.append(polling_thread)
@@ -62,6 +168,27 @@ class ContainerMonitor:
         events_thread.start()
         self.threads.append(events_thread)
         
+        if self.config.stats.mode == "stream":
+            self.stats_streamer = StatsStreamer(get_stats_table())
+            for container_config in self.config.containers:
+                self.stats_streamer.subscribe(container_config.name)
+            
+            stream_thread = Thread(target=self._stream_check_loop, daemon=True)
+            stream_thread.start()
+            self.threads.append(stream_thread)
+            logger.info(f"已订阅 {len(self.config.containers)} 个容器的 stats 流")
+        
+        health_configs = {c.name: c.health_check for c in self.config.containers if c.health_check}
+        if health_configs and self.config.system.health_scheduler:
+            self.health_scheduler = HealthScheduler(
+                self._dispatch_health_check,
+                default_interval=self.config.system.check_interval_seconds,
+                on_overrun=self._on_health_overrun
+            )
+            self.health_scheduler.add_all(health_configs)
+            self.health_scheduler.start()
+            logger.info(f"已调度 {len(health_configs)} 个容器的健康检查")
+        
         logger.info("监控已启动")
     
     def stop(self):
@@ -70,8 +197,21 @@ class ContainerMonitor:
         # event.set + thread.join = 优雅退出 让线程有充分时间善后
         # stop_event.set() -> 通知线程退出 -> join() 等待线程结束
         self.stop_event.set()
+        if self.stats_streamer is not None:
+            self.stats_streamer.stop()
+        if self.health_scheduler is not None:
+            self.health_scheduler.stop()
+        if self.log_collector is not None:
+            stop_log_collector()
+            self.log_collector = None
         for thread in self.threads:
             thread.join(timeout=5)
+        if self._probe_pool is not None:
+            # 卡住的探测线程不等待，由各自的命令超时兜底
+            self._probe_pool.shutdown(wait=False)
+            self._probe_pool = None
+        stop_health_engine()
+        self.trend.store.flush()
         logger.info("监控已停止")
     
     def _polling_loop(self):
@@ -81,26 +221,86 @@ class ContainerMonitor:
         while not self.stop_event.is_set():
             try:
                 check_count += 1
+                
+                if time.monotonic() - self._last_reconcile >= self.config.system.reconcile_interval_seconds:
+                    self._reconcile_states()
+                
                 self._check_all_containers_alive()
                 
                 resource_interval = self.config.system.resource_check_interval_seconds // self.config.system.check_interval_seconds
-                if check_count % max(1, resource_interval) == 0:
+                full_pass = check_count % max(1, resource_interval) == 0
+                if full_pass:
                     self._check_all_containers_resources()
+                elif self._adaptive_sampling():
+                    # 两次完整资源检查之间只采样到期的容器（接近阈值的容器），不做安全检查
+                    self._check_all_containers_resources(security_pass=False)
                 
             except Exception as e:
                 logger.error(f"轮询检查异常: {e}")
             
             self.stop_event.wait(self.config.system.check_interval_seconds)
     
+    def _stream_check_loop(self):
+        """流式采样模式下的高频阈值检查（只读采样表，无 I/O）"""
+        while not self.stop_event.is_set():
+            try:
+                table = get_stats_table()
+                max_age = self.config.stats.stream_stale_seconds
+                for container_config in self.config.containers:
+                    entry = table.entry(container_config.name, max_age)
+                    if entry is None:
+                        continue
+                    sampled_at, stats = entry
+                    cpu_percent = parse_percent(stats.get("cpu_percent") or "0%")
+                    memory_percent = parse_percent(stats.get("memory_percent") or "0%")
+                    self._check_thresholds(container_config, cpu_percent, memory_percent, sampled_at)
+            except Exception as e:
+                logger.error(f"流式阈值检查异常: {e}")
+            
+            self.stop_event.wait(self.config.stats.stream_check_interval_seconds)
+    
+    def _current_stats(self, names: List[str] = None) -> Dict[str, Dict[str, Any]]:
+        """
+        获取监控容器的最新资源采样（默认全部）
+        stream 模式直接读采样表（过期采样剔除），poll 模式批量采样一次
+        """
+        if names is None:
+            names = [c.name for c in self.config.containers]
+        if self.stats_streamer is not None:
+            table = get_stats_table()
+            max_age = self.config.stats.stream_stale_seconds
+            samples = {}
+            for name in names:
+                stats = table.get(name, max_age)
+                if stats is not None:
+                    samples[name] = stats
+            return samples
+        
+        # 一次批量采样全部容器，结果同时写入共享采样表供 collect_evidence 复用
+        return collect_all_stats(names)
+    
     def _events_loop(self):
-        """Docker 事件监听"""
+        """
+        Docker 事件监听
+        断线后按指数退避重连，并用持久化游标 --since 回放断线期间的事件；
+        断线过久则放弃回放，改为对监控容器做一次对账
+        """
+        events_cfg = self.config.events
+        backoff = events_cfg.backoff_initial_seconds
+        
         while not self.stop_event.is_set():
+            cmd = ['docker', 'events', '--format', '{{json .}}',
+                   '--filter', 'type=container']
+            cmd += [arg for event in self.SUBSCRIBED_EVENTS for arg in ('--filter', f'event={event}')]
+            since = self._resume_since()
+            if since is not None:
+                cmd += ['--since', since]
+            
+            connected_at = time.monotonic()
+            received = 0
             try:
                 process = subprocess.Popen(
-                    ['docker', 'events', '--format', '{{json .}}',
-                     '--filter', 'type=container',
-                     '--filter', 'event=die',
-                     '--filter', 'event=oom'],
+                    cmd,
                     stdout=subprocess.PIPE,
                     stderr=subprocess.DEVNULL,
                     text=True
@@ -113,22 +313,58 @@ class ContainerMonitor:
                         line = process.stdout.readline()
                         if not line:
                             break
+                        self.event_cursor.mark_alive()
                         
                         try:
                             event = json.loads(line.strip())
-                            self._handle_docker_event(event)
                         except json.JSONDecodeError:
                             continue
+                        
+                        if not self.event_cursor.accept(event):
+                            continue
+                        received += 1
+                        self._handle_docker_event(event)
                     elif process.poll() is not None:
                         # 进程已退出
                         break
+                    else:
+                        # 连接仍在（只是没有事件），断线时长从最后一次确认连通起算
+                        self.event_cursor.mark_alive()
                 
                 process.terminate()
                 process.wait()
                 
             except Exception as e:
                 logger.error(f"Docker 事件监听异常: {e}")
-                time.sleep(5)
+            
+            self.event_cursor.flush()
+            if self.stop_event.is_set():
+                break
+            
+            # 连接稳定运行过（收到事件或存活超过退避上限）则重置退避
+            if received or time.monotonic() - connected_at >= events_cfg.backoff_max_seconds:
+                backoff = events_cfg.backoff_initial_seconds
+            logger.warning(f"Docker 事件流断开，{backoff:.0f} 秒后重连")
+            self.stop_event.wait(backoff)
+            backoff = min(backoff * 2, events_cfg.backoff_max_seconds)
+    
+    def _resume_since(self):
+        """
+        计算重连时的 --since 参数
+        无游标（首次启动）时从当前时刻建立游标，本次连接不回放（由首次对账建立状态）；
+        断线超过 max_replay_seconds 时对监控容器对账，游标移到对账时刻
+        """
+        gap = self.event_cursor.gap_seconds()
+        if gap is None:
+            self.event_cursor.reset()
+            return None
+        
+        if gap > self.config.events.max_replay_seconds:
+            logger.warning(f"事件流中断 {gap:.0f} 秒，超过回放上限，改为对账")
+            self.event_cursor.reset()
+            self._reconcile_states()
+        
+        return self.event_cursor.since_arg()
     
     def _handle_docker_event(self, event: Dict[str, Any]):
         """处理 Docker 事件"""
@@ -140,51 +376,277 @@ class ContainerMonitor:
         if not self._is_monitored(container_name):
             return
         
-        logger.warning(f"检测到容器事件: {container_name} - {action}")
+        # 所有订阅事件都用于维护状态表，只有故障事件触发诊断
+        self.state_table.apply_event(event)
+        
+        if action == "destroy":
+            logger.warning(f"容器已被删除: {container_name}")
+            self._forget_container(container_name)
+            return
         
         if action == "oom":
             fault_type = "OOM_KILLED"
         elif action == "die":
             exit_code = attributes.get("exitCode", "0")
             fault_type = "OOM_KILLED" if exit_code == "137" else "PROCESS_CRASH"
+        elif action == "health_status: unhealthy":
+            fault_type = "HEALTH_FAIL"
         else:
-            fault_type = "UNKNOWN"
+            logger.debug(f"容器状态变更: {container_name} - {action}")
+            return
         
+        logger.warning(f"检测到容器事件: {container_name} - {action}")
         self._report_issue(container_name, fault_type)
     
+    def _reconcile_states(self):
+        """全量 inspect 对账，校正事件流可能遗漏的状态变化"""
+        self._last_reconcile = time.monotonic()
+        for container_config in self.config.containers:
+            try:
+                started_at = time.time()
+                info = get_container_info(container_config.name, failed=INSPECT_FAILED)
+                if info is INSPECT_FAILED:
+                    # 超时或 daemon 出错不代表容器不存在，保留现有状态等下次对账
+                    logger.warning(f"对账容器 {container_config.name} 时 inspect 失败，保留现有状态")
+                    continue
+                state = self.state_table.apply_inspect(container_config.name, info, started_at)
+                if not state.exists:
+                    self._forget_container(container_config.name)
+            except Exception as e:
+                logger.error(f"对账容器 {container_config.name} 失败: {e}")
+    
+    def _forget_container(self, container_name: str):
+        """容器已被删除：清理按容器缓存的采样、趋势、基线、报警和日志游标，重新创建后从头开始"""
+        forget_container(container_name)
+        self.process_tracker.forget(container_name)
+        self.trend.forget(container_name)
+        self.baselines.forget(container_name)
+        self.alarms.forget(container_name)
+        self.log_follower.forget(container_name)
+        self._log_seq.pop(container_name, None)
+        ring = self.log_collector.ring(container_name) if self.log_collector is not None else None
+        if ring is not None:
+            # 环形缓冲保留旧实例的日志供取证，扫描从当前位置继续，不重新扫描
+            _, self._log_seq[container_name] = ring.read_since(ring.seq)
+            ring.take_overflow()
+    
+    def _run_probes(self, kind: str, probes: Dict[str, tuple]) -> Dict[str, Any]:
+        """
+        在有界线程池中并发执行探测，周期结束时统一收集结果
+        
+        probes: {container_name: (func, deadline_seconds)}
+        返回 {container_name: result}；开始执行后超过 deadline 未完成的结果为 PROBE_TIMEOUT，
+        上一轮同类探测仍未结束的容器本轮跳过（不出现在结果中），避免卡住的探测堆积
+        """
+        return self._gather_probes(kind, self._submit_probes(kind, probes))
+    
+    def _submit_probes(self, kind: str, probes: Dict[str, tuple]) -> Dict[str, tuple]:
+        """提交探测到线程池，返回 {container_name: (future, _Probe)}"""
+        pool = self._get_probe_pool()
+        pending = {}
+        for container_name, (func, deadline) in probes.items():
+            key = (kind, container_name)
+            previous = self._inflight_probes.get(key)
+            if previous is not None and not previous.done():
+                logger.warning(f"容器 {container_name} 上一轮{kind}探测仍未结束，本轮跳过")
+                continue
+            probe = _Probe(func, deadline)
+            future = pool.submit(probe)
+            self._inflight_probes[key] = future
+            pending[container_name] = (future, probe)
+        return pending
+    
+    def _get_probe_pool(self) -> ThreadPoolExecutor:
+        if self._probe_pool is None:
+            self._probe_pool = ThreadPoolExecutor(
+                max_workers=max(1, self.config.system.probe_workers),
+                thread_name_prefix="probe"
+            )
+        return self._probe_pool
+    
+    def _gather_probes(self, kind: str, pending: Dict[str, tuple]) -> Dict[str, Any]:
+        """
+        按各自 deadline 收集探测结果（deadline 从探测开始执行时起算）
+        线程池被卡住的探测占满、排队的探测在最长 deadline 内都无法开始时停止等待，
+        这些容器本轮不出现在结果中（不按超时判定），探测完成前下一轮跳过
+        """
+        results = {}
+        remaining = dict(pending)
+        stall_limit = max((probe.deadline for _, probe in remaining.values()), default=0.0)
+        last_progress = time.monotonic()
+        while remaining:
+            now = time.monotonic()
+            for container_name, (future, probe) in list(remaining.items()):
+                if future.done():
+                    del remaining[container_name]
+                    last_progress = now
+                    try:
+                        results[container_name] = future.result()
+                    except Exception as e:
+                        logger.error(f"{kind}探测容器 {container_name} 失败: {e}")
+                elif probe.expired(now):
+                    del remaining[container_name]
+                    last_progress = now
+                    results[container_name] = PROBE_TIMEOUT
+            if not remaining:
+                break
+            
+            deadlines = [probe.started_at + probe.deadline
+                         for _, probe in remaining.values() if probe.started_at is not None]
+            if not deadlines and now - last_progress >= stall_limit:
+                logger.warning(f"{len(remaining)} 个容器的{kind}探测仍在排队（探测线程被占满），本轮不判定: "
+                               f"{', '.join(remaining)}")
+                break
+            timeout = min(deadlines) - now if deadlines else last_progress + stall_limit - now
+            wait_futures([future for future, _ in remaining.values()],
+                         timeout=max(0.0, timeout), return_when=FIRST_COMPLETED)
+        return results
+    
     def _check_all_containers_alive(self):
-        """检查所有监控容器的存活状态"""
+        """
+        检查所有监控容器的存活状态
+        存活查状态表（不调用 docker inspect）；
+        未启用健康检查调度器（system.health_scheduler=false）时在此统一执行健康检查：
+        http/tcp 交给异步引擎在单线程内并发执行，command 检查在线程池中并发执行；
+        调度器运行时健康检查由调度器按各自间隔执行，此处只查存活
+        """
+        health_probes = {}
+        async_checks = {}
         for container_config in self.config.containers:
             container_name = container_config.name
             
             try:
-                info = get_container_info(container_name)
+                state = self.state_table.get(container_name)
+                if state is None:
+                    # 尚未对账过的容器（如运行中新增）补一次 inspect
+                    started_at = time.time()
+                    info = get_container_info(container_name, failed=INSPECT_FAILED)
+                    if info is INSPECT_FAILED:
+                        logger.warning(f"inspect 容器 {container_name} 失败，本轮跳过")
+                        continue
+                    state = self.state_table.apply_inspect(container_name, info, started_at)
                 
-                if info is None:
+                if not state.exists:
                     logger.warning(f"容器不存在: {container_name}")
                     continue
                 
-                if not info.get("running", False):
+                if not state.running:
                     logger.warning(f"容器未运行: {container_name}")
                     self._report_issue(container_name, "PROCESS_CRASH")
                     continue
                 
-                if container_config.health_check:
-                    health = check_container_health(container_name, container_config.health_check)
-                    if not health.get("healthy", True):
-                        logger.warning(f"容器健康检查失败: {container_name}")
-                        self._report_issue(container_name, "HEALTH_FAIL")
+                if container_config.health_check and self.health_scheduler is None:
+                    health_config = container_config.health_check
+                    deadline = health_config.get("timeout_seconds", 5) + HEALTH_PROBE_GRACE_SECONDS
+                    if health_config.get("type") in ("http", "tcp"):
+                        async_checks[container_name] = (health_config, deadline)
+                    else:
+                        health_probes[container_name] = (
+                            lambda name=container_name, cfg=health_config: check_container_health(name, cfg),
+                            deadline
+                        )
                 
             except Exception as e:
                 logger.error(f"检查容器 {container_name} 失败: {e}")
+        
+        pending = self._submit_probes("健康", health_probes)
+        if async_checks:
+            engine = get_health_engine()
+            for container_name, (health_config, deadline) in async_checks.items():
+                # 异步引擎不排队，提交即开始
+                pending[container_name] = (engine.submit(health_config), _Probe(None, deadline, time.monotonic()))
+        
+        for container_name, health in self._gather_probes("健康", pending).items():
+            if health is PROBE_TIMEOUT:
+                logger.warning(f"容器健康检查超时: {container_name}")
+                self._report_issue(container_name, "HEALTH_FAIL")
+            elif not health.get("healthy", True):
+                logger.warning(f"容器健康检查失败: {container_name}")
+                self._report_issue(container_name, "HEALTH_FAIL")
     
-    def _check_all_containers_resources(self):
-        """检查所有监控容器的资源使用"""
+    def _dispatch_health_check(self, container_name: str, health_config: Dict[str, Any]):
+        """
+        由健康检查调度器调用：异步发起一次探测，结果在回调中处理
+        未运行的容器不探测（由存活检查上报 PROCESS_CRASH）
+        """
+        state = self.state_table.get(container_name)
+        if state is not None and not state.running:
+            return None
+        
+        deadline = health_config.get("timeout_seconds", 5) + HEALTH_PROBE_GRACE_SECONDS
+        if health_config.get("type") in ("http", "tcp"):
+            # 异步引擎不排队，提交即开始
+            self._health_probes[container_name] = _Probe(None, deadline, time.monotonic())
+            future = get_health_engine().submit(health_config)
+        else:
+            probe = _Probe(lambda: check_container_health(container_name, health_config), deadline)
+            self._health_probes[container_name] = probe
+            future = self._get_probe_pool().submit(probe)
+        future.add_done_callback(lambda f: self._on_health_result(container_name, f))
+        return future
+    
+    def _on_health_result(self, container_name: str, future: Future):
+        """调度器发起的健康检查完成回调"""
+        self._health_probes.pop(container_name, None)
+        if future.cancelled():
+            return
+        try:
+            health = future.result()
+        except Exception as e:
+            logger.error(f"健康探测容器 {container_name} 失败: {e}")
+            return
+        if not health.get("healthy", True):
+            logger.warning(f"容器健康检查失败: {container_name} - {health.get('message', '')}")
+            self._report_async(container_name, "HEALTH_FAIL")
+    
+    def _on_health_overrun(self, container_name: str):
+        """
+        上一次健康检查到下一个周期仍未返回
+        只有探测开始执行后超过 deadline 才按超时处理，在线程池中排队的时间不计入
+        """
+        probe = self._health_probes.get(container_name)
+        if probe is not None and not probe.expired(time.monotonic()):
+            logger.debug(f"容器 {container_name} 的健康检查仍在排队或执行中，暂不判定超时")
+            return
+        logger.warning(f"容器健康检查超时: {container_name}")
+        self._report_async(container_name, "HEALTH_FAIL")
+    
+    def _report_async(self, container_name: str, fault_type: str):
+        """在线程池中上报（回调可能运行在事件循环或调度线程上，不能被证据收集阻塞）"""
+        try:
+            self._get_probe_pool().submit(self._report_issue, container_name, fault_type)
+        except RuntimeError:
+            # 线程池已关闭（监控停止中）
+            pass
+    
+    def _check_all_containers_resources(self, security_pass: bool = True):
+        """
+        检查监控容器的资源使用（安全检查在线程池中并发执行）
+        自适应采样时只采样到期的容器，未到期容器本轮只做安全检查
+        """
+        due = self._due_for_sampling()
+        all_stats = self._current_stats(due)
+        if self._adaptive_sampling():
+            # 采样失败的容器按常规间隔重试，成功的由 _schedule_next_sample 重新安排
+            retry_at = time.monotonic() + self.config.system.resource_check_interval_seconds
+            for name in due:
+                self._next_sample[name] = retry_at
+        security_probes = {}
+        
         for container_config in self.config.containers:
             container_name = container_config.name
             
             try:
-                stats = get_container_stats(container_name)
+                if container_name not in due:
+                    state = self.state_table.get(container_name)
+                    if security_pass and state is not None and state.running:
+                        security_probes[container_name] = (
+                            lambda name=container_name: self._probe_security(name),
+                            self.config.system.probe_timeout_seconds
+                        )
+                    continue
+                
+                stats = all_stats.get(container_name)
                 if stats is None:
                     logger.warning(f"无法获取容器 {container_name} 的资源状态，跳过本次检查")
                     continue
@@ -201,79 +663,325 @@ class ContainerMonitor:
                 memory_mb = parse_memory_mb(stats.get("memory_usage", "0MB"))
                 
                 # 趋势分析
-                self._check_trend(container_name, memory_mb, memory_percent)
-                
-                # 安全检查
-                self._check_security(container_name)
-                
-                thresholds = container_config.thresholds or {}
-                cpu_critical = thresholds.get("cpu_percent_critical", self.config.thresholds.cpu_critical)
-                memory_critical = thresholds.get("memory_percent_critical", self.config.thresholds.memory_critical)
+                state = self.state_table.get(container_name)
+                net_io = parse_io_mb(stats.get("net_io") or "")
+                self._check_trend(container_name, memory_mb, memory_percent, {
+                    "cpu_percent": cpu_percent,
+                    "restart_count": state.restart_count if state is not None else None,
+                    "net_rx_mb": net_io[0] if net_io else None,
+                    "net_tx_mb": net_io[1] if net_io else None,
+                }, memory_limit_mb=self._memory_limit_mb(state))
                 
-                if cpu_percent >= cpu_critical:
-                    logger.warning(f"容器 CPU 严重超标: {container_name} - {cpu_percent}%")
-                    self._report_issue(container_name, "CPU_HIGH")
+                # 安全检查（并发）
+                if security_pass:
+                    security_probes[container_name] = (
+                        lambda name=container_name: self._probe_security(name),
+                        self.config.system.probe_timeout_seconds
+                    )
                 
-                if memory_percent >= memory_critical:
-                    logger.warning(f"容器内存严重超标: {container_name} - {memory_percent}%")
-                    self._report_issue(container_name, "MEMORY_HIGH")
+                # stream 模式下阈值由 _stream_check_loop 高频检查
+                if self.stats_streamer is None:
+                    self._check_thresholds(container_config, cpu_percent, memory_percent)
+                    self._schedule_next_sample(container_config, cpu_percent, memory_percent)
                 
             except Exception as e:
                 logger.error(f"检查容器资源 {container_name} 失败: {e}")
+        
+        for container_name, findings in self._run_probes("安全", security_probes).items():
+            if findings is PROBE_TIMEOUT:
+                logger.warning(f"容器安全检查超时: {container_name}")
+                continue
+            self._report_security(container_name, findings)
+    
+    def _adaptive_sampling(self) -> bool:
+        """自适应采样只用于 poll 模式（stream 模式采样本身没有额外开销）"""
+        return self.config.stats.adaptive and self.stats_streamer is None
+    
+    def _due_for_sampling(self) -> List[str]:
+        """本轮需要采样的容器（未启用自适应采样时为全部）"""
+        names = [c.name for c in self.config.containers]
+        if not self._adaptive_sampling():
+            return names
+        # 轮询按 check_interval_seconds 唤醒，容忍半个周期的误差
+        horizon = time.monotonic() + self.config.system.check_interval_seconds / 2
+        return [name for name in names if self._next_sample.get(name, 0.0) <= horizon]
+    
+    def _schedule_next_sample(self, container_config, cpu_percent: float, memory_percent: float):
+        """
+        根据本次采样安排下次采样时间
+        负载 = max(CPU/CPU临界阈值, 内存/内存临界阈值)：
+        接近临界或较上次明显上升 -> check_interval_seconds；
+        远低于临界 -> 在 resource_check_interval_seconds 基础上逐次翻倍，
+                     不超过 check_interval_seconds 的 adaptive_max_multiple 倍
+                     （CPU 使用率是两次采样间的平均值，间隔过长会掩盖尖峰）；
+        其余 -> resource_check_interval_seconds
+        """
+        if not self._adaptive_sampling():
+            return
+        
+        stats_cfg = self.config.stats
+        base = self.config.system.resource_check_interval_seconds
+        fast = min(base, self.config.system.check_interval_seconds)
+        ceiling = max(base, self.config.system.check_interval_seconds * stats_cfg.adaptive_max_multiple)
+        container_name = container_config.name
+        cpu_critical, memory_critical = self._critical_thresholds(container_config)
+        load = max(cpu_percent / cpu_critical if cpu_critical else 0.0,
+                   memory_percent / memory_critical if memory_critical else 0.0)
+        previous = self._last_load.get(container_name)
+        self._last_load[container_name] = load
+        rising = previous is not None and load - previous >= 0.1
+        
+        interval = self._sample_interval.get(container_name, base)
+        if load >= stats_cfg.adaptive_near_ratio or rising:
+            interval = fast
+        elif load < stats_cfg.adaptive_stable_ratio:
+            interval = base if interval < base else min(interval * 2, ceiling)
+        else:
+            interval = base
+        
+        if interval != self._sample_interval.get(container_name, base):
+            logger.debug(f"容器 {container_name} 采样间隔调整为 {interval} 秒（负载 {load:.0%}）")
+        self._sample_interval[container_name] = interval
+        self._next_sample[container_name] = time.monotonic() + interval
+    
+    def _critical_thresholds(self, container_config) -> tuple:
+        """返回容器的 (CPU 临界阈值, 内存临界阈值)，容器配置覆盖全局配置"""
+        thresholds = container_config.thresholds or {}
+        return (
+            thresholds.get("cpu_percent_critical", self.config.thresholds.cpu_critical),
+            thresholds.get("memory_percent_critical", self.config.thresholds.memory_critical)
+        )
+    
+    def _check_thresholds(self, container_config, cpu_percent: float, memory_percent: float,
+                          sampled_at: float = None):
+        """
+        CPU/内存阈值检查（static 模式用固定阈值，baseline 模式用学习到的基线）
+        超标需满足持续时间和 M/K 采样确认才上报；上报后回落到恢复阈值以下前不再重复上报
+        sampled_at 为采样时间戳（stream 模式重复检查同一采样时，基线和 M/K 窗口只计入一次，
+        持续时间按采样时间计算，采样流停滞时不会累积）
+        """
+        container_name = container_config.name
+        cpu_critical, memory_critical = self._critical_thresholds(container_config)
+        
+        thresholds = container_config.thresholds or {}
+        if thresholds.get("threshold_mode", self.config.thresholds.mode) == "baseline":
+            cpu_critical = self._baseline_threshold(container_config, "cpu_percent", cpu_percent,
+                                                    cpu_critical, sampled_at)
+            memory_critical = self._baseline_threshold(container_config, "memory_percent", memory_percent,
+                                                       memory_critical, sampled_at)
+        
+        now = time.monotonic()
+        for metric, value, critical, fault_type, message in (
+            ("cpu_percent", cpu_percent, cpu_critical, "CPU_HIGH", "容器 CPU 严重超标"),
+            ("memory_percent", memory_percent, memory_critical, "MEMORY_HIGH", "容器内存严重超标"),
+        ):
+            rule = self._alarm_rule(container_config, metric, critical)
+            if self.alarms.update(container_name, metric, value, rule, now, sampled_at):
+                logger.warning(f"{message}: {container_name} - {value}%")
+                if self._report_issue(container_name, fault_type):
+                    self.alarms.latch(container_name, metric)
+    
+    def _alarm_rule(self, container_config, metric: str, critical: float) -> AlarmRule:
+        """报警判定参数（容器 thresholds 覆盖全局 thresholds；未配置恢复阈值时等于临界阈值）"""
+        defaults = self.config.thresholds
+        thresholds = container_config.thresholds or {}
+        clear = thresholds.get(f"{metric}_clear",
+                               defaults.cpu_clear if metric == "cpu_percent" else defaults.memory_clear)
+        return AlarmRule(
+            critical=critical,
+            clear=critical if clear is None else min(clear, critical),
+            sustain_seconds=thresholds.get("sustain_seconds", defaults.sustain_seconds),
+            min_samples=thresholds.get("sustain_samples", defaults.sustain_samples),
+            window=thresholds.get("sustain_window", defaults.sustain_window),
+        )
 
-    def _check_trend(self, container_name: str, memory_mb: float, memory_percent: float):
+    def _baseline_threshold(self, container_config, metric: str, value: float, static_critical: float,
+                            sampled_at: float = None) -> float:
+        """
+        计算动态阈值 min(max(p99 × baseline_factor, baseline_floor_percent), 100)
+        学习期内返回固定阈值；超过动态阈值的样本按阈值计入基线：
+        短暂异常对 p99 的影响有限，负载持续抬升到新水平时基线逐步跟上，不会一直报警
+        """
+        defaults = self.config.thresholds
+        thresholds = container_config.thresholds or {}
+        baseline = self.baselines.baseline(container_config.name, metric)
+        
+        if baseline is None or baseline["samples"] < defaults.baseline_min_samples:
+            self.baselines.observe(container_config.name, metric, value, sampled_at)
+            return static_critical
+        
+        factor = thresholds.get("baseline_factor", defaults.baseline_factor)
+        floor = thresholds.get("baseline_floor_percent", defaults.baseline_floor_percent)
+        threshold = min(max(baseline["p99"] * factor, floor), 100.0)
+        if value >= threshold:
+            logger.info(f"容器 {container_config.name} {metric}={value:.1f} 超过动态阈值 {threshold:.1f} "
+                        f"(p50={baseline['p50']:.1f}, p99={baseline['p99']:.1f})")
+        self.baselines.observe(container_config.name, metric, min(value, threshold), sampled_at)
+        return threshold
+    
+    @staticmethod
+    def _memory_limit_mb(state) -> Optional[float]:
+        """
+        容器配置的内存限制（MB），来自对账时 inspect 的 HostConfig.Memory；
+        未限制（0）时返回 None，不做 OOM 预测（docker stats 此时显示的是宿主机内存）
+        """
+        if state is None or not state.memory_limit:
+            return None
+        return state.memory_limit / (1024 * 1024)
+    
+    def _check_trend(self, container_name: str, memory_mb: float, memory_percent: float,
+                     metrics: Dict[str, float] = None, memory_limit_mb: float = None):
         """
         分析内存增长趋势 (Trend Analysis)
-        如果发现内存持续快速增长，且占用率较高，则报警
+        对最近 leak_window_minutes 内每分钟的内存均值（1 分钟汇总）做最小二乘回归：
+        斜率、拟合优度、置信下界、时间跨度和当前占用同时达标才报警，
+        单次 GC 停顿或尖峰不会触发 MEMORY_LEAK_SUSPECTED
+        容器配置了内存限制时先做 OOM 预测，预测命中后不再重复判定泄漏
         """
-        if container_name not in self.stats_history:
-            self.stats_history[container_name] = deque(maxlen=10)  # 保留最近10次记录
+        sample = dict(metrics or {})
+        sample["memory_mb"] = memory_mb
+        sample["memory_percent"] = memory_percent
+        self.trend.observe(container_name, sample, timestamp=datetime.now().timestamp())
         
-        history = self.stats_history[container_name]
-        now = datetime.now()
-        history.append((now, memory_mb))
+        rule = self._leak_rule(container_name)
+        if memory_limit_mb and self._check_oom_forecast(container_name, memory_mb, memory_limit_mb, rule):
+            return
         
-        # 至少需要3个点，且跨度超过1分钟才开始分析
-        if len(history) < 3:
+        fit = self.trend.fit_rollup(container_name, "memory_mb", "1m", rule["leak_window_minutes"] * 60)
+        if fit is None:
             return
-            
-        first_time, first_mem = history[0]
-        last_time, last_mem = history[-1]
         
-        time_diff_minutes = (last_time - first_time).total_seconds() / 60.0
-        if time_diff_minutes < 1.0:
+        if fit.span_seconds < rule["leak_min_span_seconds"]:
             return
-            
-        # 计算斜率 (MB/min)
-        slope = (last_mem - first_mem) / time_diff_minutes
         
-        # 阈值：增长速度 > 10MB/min 且 内存占用 > 50%
-        # 注意：这里应该从配置读取，暂时硬编码作为演示
-        if slope > 10.0 and memory_percent > 50.0:
-            logger.warning(f"检测到内存泄漏趋势: {container_name} 增长速率 {slope:.2f} MB/min, 当前占用 {memory_percent}%")
+        if (fit.slope >= rule["leak_slope_mb_per_min"]
+                and fit.slope_low > 0
+                and fit.r2 >= rule["leak_min_r2"]
+                and memory_percent > rule["leak_memory_percent"]):
+            logger.warning(
+                f"检测到内存泄漏趋势: {container_name} 增长速率 {fit.slope:.2f} MB/min "
+                f"(95% 下界 {fit.slope_low:.2f}, R²={fit.r2:.2f}, {fit.samples} 个样本), 当前占用 {memory_percent}%"
+            )
             # 使用特殊的故障类型，触发 Agent 的分析逻辑
             self._report_issue(container_name, "MEMORY_LEAK_SUSPECTED")
+    
+    def _check_oom_forecast(self, container_name: str, memory_mb: float, memory_limit_mb: float,
+                            rule: Dict[str, float]) -> bool:
+        """
+        OOM 预测：对最近 oom_forecast_window_minutes 内每分钟的内存均值回归，
+        按斜率估算到达内存限制的时间，低于 oom_forecast_horizon_seconds 时上报 PREDICTED_OOM
+        返回是否已上报
+        """
+        horizon = rule["oom_forecast_horizon_seconds"]
+        if not horizon or horizon <= 0:
+            return False
+        
+        fit = self.trend.fit_rollup(container_name, "memory_mb", "1m", rule["oom_forecast_window_minutes"] * 60)
+        if fit is None or fit.span_seconds < rule["leak_min_span_seconds"] or fit.r2 < rule["oom_forecast_min_r2"]:
+            return False
+        
+        seconds = seconds_until(fit, memory_mb, memory_limit_mb)
+        if seconds is None or seconds >= horizon:
+            return False
+        
+        logger.warning(
+            f"预测容器即将 OOM: {container_name} 预计 {seconds:.0f} 秒后到达内存限制 "
+            f"({memory_mb:.1f}/{memory_limit_mb:.1f} MB, 增长速率 {fit.slope:.2f} MB/min, R²={fit.r2:.2f})"
+        )
+        self._report_issue(container_name, "PREDICTED_OOM", {
+            "oom_forecast": {
+                "seconds_to_oom": round(seconds),
+                "memory_mb": round(memory_mb, 1),
+                "memory_limit_mb": round(memory_limit_mb, 1),
+                "slope_mb_per_min": round(fit.slope, 2),
+                "slope_low_mb_per_min": round(fit.slope_low, 2),
+                "r2": round(fit.r2, 3),
+                "window_seconds": round(fit.span_seconds),
+            }
+        })
+        return True
+    
+    def _history_max_age(self) -> float:
+        """恢复历史的最大保留秒数：所有容器中最长的泄漏 / OOM 回归窗口"""
+        names = [None] + [container.name for container in self.config.containers]
+        return max(
+            max(rule["leak_window_minutes"], rule["oom_forecast_window_minutes"]) * 60
+            for rule in (self._leak_rule(name) for name in names)
+        )
+
+    def _leak_rule(self, container_name: str) -> Dict[str, float]:
+        """内存泄漏 / OOM 预测判定参数（容器 thresholds 覆盖全局 thresholds）"""
+        defaults = self.config.thresholds
+        rule = {
+            "leak_slope_mb_per_min": defaults.leak_slope_mb_per_min,
+            "leak_min_r2": defaults.leak_min_r2,
+            "leak_min_span_seconds": defaults.leak_min_span_seconds,
+            "leak_memory_percent": defaults.leak_memory_percent,
+            "leak_window_minutes": defaults.leak_window_minutes,
+            "oom_forecast_horizon_seconds": defaults.oom_forecast_horizon_seconds,
+            "oom_forecast_window_minutes": defaults.oom_forecast_window_minutes,
+            "oom_forecast_min_r2": defaults.oom_forecast_min_r2,
+        }
+        container_config = self.config.get_container(container_name)
+        if container_config is not None:
+            thresholds = container_config.thresholds or {}
+            rule.update({key: thresholds[key] for key in rule if key in thresholds})
+        return rule
 
-    def _check_security(self, container_name: str):
+    def _probe_security(self, container_name: str) -> Dict[str, List[str]]:
         """
-        执行安全检查 (Security Forensics)
-        1. 检查日志中的攻击特征 (SQL注入, XSS等)
-        2. 检查异常进程 (挖矿, 反弹shell等)
+        安全探测（可在工作线程中执行，不触发上报）
+        日志只扫描上次探测之后的新增部分，进程只检查上次探测之后新启动的，
+        同一行攻击日志、同一个恶意进程不会重复上报
         """
-        # 1. 日志检查
-        logs = get_container_logs(container_name, 100)
+        logs = "\n".join(self._read_new_logs(container_name))
         injection_patterns = security.check_logs_for_injection(logs)
+        for pattern in self._take_overflow_hits(container_name):
+            if pattern not in injection_patterns:
+                injection_patterns.append(pattern)
+        return {
+            "injection_patterns": injection_patterns,
+            "malicious_procs": security.check_new_processes(container_name, self.process_tracker)
+        }
+    
+    def _read_new_logs(self, container_name: str) -> List[str]:
+        """上次安全探测之后的新日志行（常驻收集时读环形缓冲，否则按游标拉取）"""
+        if self.log_collector is not None:
+            # 首次读取从订阅时的回填结束处开始，重启后不会重新扫描回填的旧日志
+            lines, self._log_seq[container_name] = self.log_collector.read_since(
+                container_name, self._log_seq.get(container_name)
+            )
+            return lines
+        return self.log_follower.read_new(container_name)
+    
+    def _take_overflow_hits(self, container_name: str) -> List[str]:
+        """两次安全探测之间写入超过环形缓冲容量、未读即被覆盖的日志行中命中的特征"""
+        if self.log_collector is None:
+            return []
+        dropped, hits = self.log_collector.take_overflow(container_name)
+        if dropped:
+            logger.warning(
+                f"容器 {container_name} 有 {dropped} 行日志在安全探测前被环形缓冲覆盖（已在覆盖前扫描），"
+                f"可调大 logs.ring_lines"
+            )
+        return hits
+    
+    def _report_security(self, container_name: str, findings: Dict[str, List[str]]):
+        """根据安全探测结果上报"""
+        # 1. 日志检查
+        injection_patterns = findings.get("injection_patterns")
         if injection_patterns:
             logger.warning(f"检测到攻击日志: {container_name} - {injection_patterns}")
             # 触发 Agent 分析，故障类型为 SECURITY_LOG_ALERT
             self._report_issue(container_name, "SECURITY_LOG_ALERT")
             
         # 2. 进程检查
-        malicious_procs = security.check_processes(container_name)
+        malicious_procs = findings.get("malicious_procs")
         if malicious_procs:
             logger.critical(f"检测到恶意进程: {container_name} - {malicious_procs}")
-            # 触发 Agent 分析，故障类型为 MALICIOUS_PROCESS
-            self._report_issue(container_name, "MALICIOUS_PROCESS")
+            # 触发 Agent 分析，故障类型为 MALICIOUS_PROCESS；被熔断/去重跳过时下一轮继续上报
+            if self._report_issue(container_name, "MALICIOUS_PROCESS"):
+                self.process_tracker.acknowledge(container_name)
 
     def _is_monitored(self, container_name: str) -> bool:
         """检查容器是否在监控列表中（O(1) 查询）"""
@@ -327,23 +1035,45 @@ class ContainerMonitor:
         
         return True
     
-    def _record_report(self, container_name: str):
-        """记录上报"""
+    def _record_report(self, container_name: str) -> datetime:
+        """记录上报，返回记录时间"""
         now = datetime.now()
         self.last_report_time[container_name] = now
         if container_name not in self.report_history:
             self.report_history[container_name] = []
         self.report_history[container_name].append(now)
+        return now
     
-    def _report_issue(self, container_name: str, fault_type: str):
-        """触发诊断和处理流程（使用 LangGraph Agent）"""
-        # 熔断 + 去重检查
-        if not self._should_report(container_name, fault_type):
-            return
+    def _release_report(self, container_name: str, reserved_at: datetime, previous: datetime = None):
+        """撤销 _record_report 预留的上报记录（提交诊断失败时调用）"""
+        history = self.report_history.get(container_name)
+        if history and reserved_at in history:
+            history.remove(reserved_at)
+        if self.last_report_time.get(container_name) == reserved_at:
+            if previous is None:
+                del self.last_report_time[container_name]
+            else:
+                self.last_report_time[container_name] = previous
+    
+    def _report_issue(self, container_name: str, fault_type: str, details: Dict[str, Any] = None) -> bool:
+        """
+        触发诊断和处理流程（使用 LangGraph Agent），details 附加到证据中
+        返回是否已提交诊断（被熔断/去重跳过或提交失败时为 False）
+        """
+        # 熔断 + 去重检查与记录在同一把锁内完成（预留上报名额），
+        # 证据收集期间其他线程（调度回调、流式检查、事件线程）对同一容器的上报会被去重
+        with self._report_lock:
+            if not self._should_report(container_name, fault_type):
+                return False
+            previous = self.last_report_time.get(container_name)
+            reserved_at = self._record_report(container_name)
         
         try:
-            # 收集证据
-            evidence = collect_evidence(container_name, fault_type)
+            # 收集证据（附带各指标的趋势回归，样本不足时省略）
+            trends = self.trend.summary(container_name)
+            if trends:
+                details = {"trends": trends, **(details or {})}
+            evidence = collect_evidence(container_name, fault_type, details)
             
             logger.info(f"触发诊断: {container_name} - {fault_type}")
             
@@ -351,12 +1081,15 @@ class ContainerMonitor:
             from .agent import run_diagnosis
             run_diagnosis(evidence, async_mode=True)
             
-            # 记录上报时间（用于熔断和去重）
-            self._record_report(container_name)
             logger.info(f"诊断任务已提交: {container_name}")
+            return True
                 
         except Exception as e:
             logger.error(f"触发诊断异常: {e}")
+            # 提交失败：释放预留的名额，允许后续重新上报
+            with self._report_lock:
+                self._release_report(container_name, reserved_at, previous)
+            return False
 
 
 _monitor_instance = None
@@ -0,0 +1,310 @@
+"""
+宿主机 /proc 取证模块
+通过容器 cgroup 的 cgroup.procs 列出容器进程，直接读取 /proc/<pid>/cmdline，不 fork 任何进程；
+进程以 (pid, 启动时间) 标识，每个进程的命令行只读取、匹配一次，之后的扫描只检查新出现的进程；
+网络连接读取容器内进程的 /proc/<pid>/net/{tcp,udp}{,6}，不依赖容器内的 netstat
+需要 watchdog 与宿主机共享 PID 命名空间（cgroup v2）
+"""
+import os
+import socket
+import logging
+import ipaddress
+from dataclasses import dataclass, field
+from threading import Lock
+from typing import Any, Dict, List, Optional, Tuple
+
+from .cgroup import CgroupSampler
+from .matcher import PatternMatcher
+
+logger = logging.getLogger(__name__)
+
+PROC_ROOT = "/proc"
+
+
+def read_cgroup_pids(path: str) -> List[int]:
+    """读取 cgroup 及其子 cgroup 中的全部 PID"""
+    pids = []
+    for directory, subdirs, files in os.walk(path):
+        if "cgroup.procs" not in files:
+            continue
+        try:
+            with open(os.path.join(directory, "cgroup.procs")) as f:
+                pids.extend(int(line) for line in f.read().split())
+        except (OSError, ValueError):
+            continue
+    return pids
+
+
+# /proc/net 中的套接字状态，01 = ESTABLISHED（UDP 为已 connect 的套接字，与 netstat 一致）
+SOCKET_ESTABLISHED = "01"
+NET_TABLES = ("tcp", "tcp6", "udp", "udp6")
+
+
+def decode_net_address(hex_addr: str) -> str:
+    """
+    解码 /proc/net/tcp 中的地址（不含端口）
+    IPv4 为 8 位十六进制（主机字节序，小端）；IPv6 为 4 个小端 32 位字，IPv4 映射地址转为 IPv4
+    """
+    raw = bytes.fromhex(hex_addr)
+    if len(raw) == 4:
+        return socket.inet_ntop(socket.AF_INET, raw[::-1])
+    raw = b"".join(raw[i:i + 4][::-1] for i in range(0, 16, 4))
+    address = ipaddress.IPv6Address(raw)
+    return str(address.ipv4_mapped or address)
+
+
+def parse_net_connections(content: str, counts: Optional[Dict[str, int]] = None) -> Dict[str, int]:
+    """
+    统计 /proc/net/{tcp,udp}{,6} 内容中 ESTABLISHED 连接的对端 IP 及连接数（忽略回环地址）
+    同一对端地址只解码一次
+    """
+    counts = {} if counts is None else counts
+    remotes: Dict[str, int] = {}
+    # 表头: sl local_address rem_address st ...
+    for line in content.splitlines()[1:]:
+        fields = line.split(None, 4)
+        if len(fields) < 4 or fields[3] != SOCKET_ESTABLISHED:
+            continue
+        hex_addr = fields[2].partition(":")[0]
+        remotes[hex_addr] = remotes.get(hex_addr, 0) + 1
+
+    for hex_addr, count in remotes.items():
+        try:
+            ip = decode_net_address(hex_addr)
+        except ValueError:
+            continue
+        if ipaddress.ip_address(ip).is_loopback:
+            continue
+        counts[ip] = counts.get(ip, 0) + count
+    return counts
+
+
+# 进程标识：proc 后端为 (pid, 启动时间)，PID 被复用时启动时间不同；docker top 后端为 (pid, 命令行)
+ProcessKey = Tuple[int, str]
+
+
+class ProcessInspector:
+    """
+    容器进程检查
+    按容器缓存 {(pid, 启动时间): (可执行文件, 命令行)} 及命中的规则，进程退出后从缓存中移除；
+    每次检查仍读取可执行文件（readlink，开销远小于读命令行），execve 换成其他程序时
+    (pid, 启动时间) 不变，据此重新读取命令行并重新匹配；规则热加载（匹配器变化）后命中结果失效
+    """
+
+    def __init__(self, sampler: CgroupSampler, proc_root: str = PROC_ROOT):
+        self.sampler = sampler
+        self.proc_root = proc_root
+        self._lock = Lock()
+        self._cache: Dict[str, Dict[ProcessKey, Tuple[str, str]]] = {}
+        self._hits: Dict[str, Dict[ProcessKey, Tuple[str, List[str]]]] = {}
+        self._matchers: Dict[str, PatternMatcher] = {}
+
+    def pids(self, container_name: str) -> Optional[List[int]]:
+        """容器内全部 PID，解析不到 cgroup 时返回 None"""
+        path = self.sampler.resolve(container_name)
+        if path is None:
+            return None
+        return read_cgroup_pids(path)
+
+    def cmdline(self, pid: int) -> Optional[str]:
+        """进程命令行（参数以空格拼接，内核线程/僵尸进程取 comm），进程已退出时返回 None"""
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            with open(os.path.join(base, "cmdline"), "rb") as f:
+                raw = f.read()
+            if not raw:
+                with open(os.path.join(base, "comm"), "rb") as f:
+                    raw = f.read()
+        except OSError:
+            return None
+        return raw.replace(b"\0", b" ").decode("utf-8", errors="replace").strip()
+
+    def executable(self, pid: int) -> Optional[str]:
+        """进程可执行文件（/proc/<pid>/exe 链接目标，内核线程或无权限时取 comm），进程已退出时返回 None"""
+        base = os.path.join(self.proc_root, str(pid))
+        try:
+            return os.readlink(os.path.join(base, "exe"))
+        except OSError:
+            pass
+        try:
+            with open(os.path.join(base, "comm"), "rb") as f:
+                return f.read().decode("utf-8", errors="replace").strip()
+        except OSError:
+            return None
+
+    def start_time(self, pid: int) -> Optional[str]:
+        """进程启动时间（/proc/<pid>/stat 第 22 项，开机后的时钟滴答数），进程已退出时返回 None"""
+        try:
+            with open(os.path.join(self.proc_root, str(pid), "stat"), "rb") as f:
+                raw = f.read()
+            # comm 可能包含空格和括号，从最后一个 ')' 之后按空格切分（第 3 项起）
+            return raw.rsplit(b")", 1)[1].split()[19].decode()
+        except (OSError, IndexError):
+            return None
+
+    def processes(self, container_name: str) -> Optional[Dict[ProcessKey, str]]:
+        """
+        容器内全部进程 {(pid, 启动时间): 命令行}，解析不到 cgroup 时返回 None
+        只为新出现或可执行文件变化（execve）的进程读取命令行
+        """
+        pids = self.pids(container_name)
+        if pids is None:
+            return None
+
+        with self._lock:
+            cache = self._cache.get(container_name, {})
+
+        current: Dict[ProcessKey, Tuple[str, str]] = {}
+        for pid in pids:
+            start = self.start_time(pid)
+            exe = self.executable(pid)
+            if start is None or exe is None:
+                continue
+            key = (pid, start)
+            cached = cache.get(key)
+            if cached is not None and cached[0] == exe:
+                current[key] = cached
+                continue
+            cmdline = self.cmdline(pid)
+            if cmdline is None:
+                continue
+            current[key] = (exe, cmdline)
+
+        with self._lock:
+            self._cache[container_name] = current
+        return {key: cmdline for key, (_, cmdline) in current.items()}
+
+    def scan(self, container_name: str, matcher: PatternMatcher) -> Optional[List[str]]:
+        """
+        返回容器内命中黑名单的规则（每个进程命中的每条规则一项，与 docker top 逐行匹配一致），
+        解析不到 cgroup 时返回 None
+        """
+        processes = self.processes(container_name)
+        if processes is None:
+            return None
+
+        with self._lock:
+            cache = self._hits.get(container_name, {})
+            if self._matchers.get(container_name) is not matcher:
+                cache = {}
+
+        current: Dict[ProcessKey, Tuple[str, List[str]]] = {}
+        for key, cmdline in processes.items():
+            cached = cache.get(key)
+            if cached is not None and cached[0] == cmdline:
+                current[key] = cached
+            else:
+                current[key] = (cmdline, matcher.found(cmdline))
+
+        with self._lock:
+            self._hits[container_name] = current
+            self._matchers[container_name] = matcher
+        return [pattern for _, hits in current.values() for pattern in hits]
+
+    def connections(self, container_name: str) -> Optional[Dict[str, int]]:
+        """
+        容器活跃网络连接 {对端 IP: 连接数}，格式同 evidence.get_network_connections
+        容器内进程共享网络命名空间，读取任一存活进程的 /proc/<pid>/net/*；
+        解析不到 cgroup 或进程均已退出时返回 None
+        """
+        pids = self.pids(container_name)
+        if pids is None:
+            return None
+
+        for pid in sorted(pids):
+            base = os.path.join(self.proc_root, str(pid), "net")
+            counts: Dict[str, int] = {}
+            try:
+                for table in NET_TABLES:
+                    path = os.path.join(base, table)
+                    # 内核未启用 IPv6 时没有 tcp6/udp6
+                    if table.endswith("6") and not os.path.exists(path):
+                        continue
+                    with open(path) as f:
+                        parse_net_connections(f.read(), counts)
+            except OSError:
+                continue
+            return counts
+        return None
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._cache.pop(container_name, None)
+            self._hits.pop(container_name, None)
+            self._matchers.pop(container_name, None)
+
+
+@dataclass
+class ProcessDelta:
+    """相邻两次进程快照的差异"""
+    spawned: Dict[ProcessKey, str] = field(default_factory=dict)
+    exited: Dict[ProcessKey, str] = field(default_factory=dict)
+
+
+class ProcessTracker:
+    """
+    每个容器的进程快照 {(pid, 启动时间): 命令行}
+    diff 返回与上一次快照相比新启动和已退出的进程；首次快照中的进程全部视为新启动，
+    同一 (pid, 启动时间) 的命令行变化（execve）也视为新启动
+    token（如当前规则匹配器）变化时全部进程视为新启动，使新规则能覆盖已在运行的进程
+
+    命中黑名单的进程由调用方 hold 为待确认，上报成功后 acknowledge；
+    上报被熔断/去重跳过时，仍在运行的待确认进程由 pending 返回，下一轮继续上报
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._snapshots: Dict[str, Dict[ProcessKey, str]] = {}
+        self._tokens: Dict[str, Any] = {}
+        self._pending: Dict[str, Dict[ProcessKey, str]] = {}
+
+    def diff(self, container_name: str, processes: Dict[ProcessKey, str], token: Any = None) -> ProcessDelta:
+        with self._lock:
+            previous = self._snapshots.get(container_name, {})
+            if self._tokens.get(container_name) is not token:
+                spawned = dict(processes)
+            else:
+                spawned = {key: cmdline for key, cmdline in processes.items() if previous.get(key) != cmdline}
+            exited = {key: cmdline for key, cmdline in previous.items() if key not in processes}
+            self._snapshots[container_name] = dict(processes)
+            self._tokens[container_name] = token
+        return ProcessDelta(spawned=spawned, exited=exited)
+
+    def pending(self, container_name: str, processes: Dict[ProcessKey, str]) -> Dict[ProcessKey, str]:
+        """尚未成功上报、且仍以同一命令行运行的黑名单进程"""
+        with self._lock:
+            pending = self._pending.get(container_name, {})
+            return {key: cmdline for key, cmdline in pending.items() if processes.get(key) == cmdline}
+
+    def hold(self, container_name: str, processes: Dict[ProcessKey, str]):
+        """记录本轮命中黑名单的进程（替换上一轮的待确认集合）"""
+        with self._lock:
+            if processes:
+                self._pending[container_name] = dict(processes)
+            else:
+                self._pending.pop(container_name, None)
+
+    def acknowledge(self, container_name: str):
+        """待确认的进程已上报"""
+        with self._lock:
+            self._pending.pop(container_name, None)
+
+    def forget(self, container_name: str):
+        with self._lock:
+            self._snapshots.pop(container_name, None)
+            self._tokens.pop(container_name, None)
+            self._pending.pop(container_name, None)
+
+
+_inspector: Optional[ProcessInspector] = None
+_inspector_lock = Lock()
+
+
+def get_inspector(sampler: CgroupSampler, proc_root: str = PROC_ROOT) -> ProcessInspector:
+    """获取全局进程检查器"""
+    global _inspector
+    if _inspector is None or _inspector.sampler is not sampler or _inspector.proc_root != proc_root:
+        with _inspector_lock:
+            if _inspector is None or _inspector.sampler is not sampler or _inspector.proc_root != proc_root:
+                _inspector = ProcessInspector(sampler, proc_root)
+    return _inspector
@@ -3,14 +3,43 @@
 """
 import os
 import json
+import time
 import logging
 from datetime import datetime
+from typing import Dict
 from langchain_openai import ChatOpenAI
 from langchain_core.messages import HumanMessage
 from .config import get_config
+from .metrics import get_metric_store
 
 logger = logging.getLogger(__name__)
 
+# 日报中汇总的资源指标
+REPORT_METRICS = ("cpu_percent", "memory_percent", "memory_mb")
+
+
+def resource_summary(hours: int = 24) -> Dict[str, Dict[str, Dict[str, float]]]:
+    """
+    最近 hours 小时各容器的资源使用汇总（min/max/mean/p95）
+    读取 1 小时汇总层级，每个指标至多 hours 个点
+    """
+    store = get_metric_store()
+    if store is None:
+        return {}
+    
+    since = time.time() - hours * 3600
+    summary = {}
+    for container_name in store.rollups.names():
+        metrics = {}
+        for metric in REPORT_METRICS:
+            result = store.rollups.summary(container_name, metric, "1h", since)
+            if result is not None:
+                metrics[metric] = {key: round(value, 2) for key, value in result.items()}
+        if metrics:
+            summary[container_name] = metrics
+    return summary
+
+
 def generate_daily_summary():
     """
     生成每日总结报告 (归档)
@@ -38,6 +67,9 @@ def generate_daily_summary():
         for r in records:
             ft = r.get("fault_type", "UNKNOWN")
             fault_counts[ft] = fault_counts.get(ft, 0) + 1
+        
+        # 资源使用（1 小时汇总）
+        resources = resource_summary(24)
             
         # 3. 调用 LLM 生成总结 (直接 Invoke，不走 Agent 流程)
         config = get_config()
@@ -54,14 +86,18 @@ def generate_daily_summary():
         总事件数: {total_events}
         故障分布: {fault_counts}
         
+        【资源使用 (最近 24 小时，按小时汇总；p95 为各小时 p95 的最大值)】
+        {json.dumps(resources, ensure_ascii=False) if resources else "无资源采样数据"}
+        
         【详细记录 (最近 20 条)】
         {json.dumps(records[-20:], ensure_ascii=False, indent=2)}
         
         【要求】
         1. 总结今日系统的整体健康状况。
         2. 指出最频繁出现的故障类型和容器。
-        3. 给出针对性的优化建议。
-        4. 使用 Markdown 格式。
+        3. 结合资源使用指出负载偏高或持续增长的容器。
+        4. 给出针对性的优化建议。
+        5. 使用 Markdown 格式。
         """
         
         response = llm.invoke([HumanMessage(content=prompt)])
@@ -0,0 +1,183 @@
+"""
+健康检查调度模块
+基于哈希时间轮为每个容器独立调度健康检查：各自的间隔、超时和抖动，
+首轮探测在间隔内均匀错开，避免所有探测同时打到 Docker daemon 和应用
+"""
+import time
+import random
+import logging
+from concurrent.futures import Future
+from threading import Thread, Event, Lock
+from typing import Dict, Any, List, Tuple, Callable, Optional, Hashable
+
+logger = logging.getLogger(__name__)
+
+# health_check 未配置 timeout_seconds 时探测使用的超时（与 health / evidence 模块一致）
+DEFAULT_TIMEOUT_SECONDS = 5
+
+
+class TimerWheel:
+    """
+    哈希时间轮
+    wheel_size 个槽位，每次 advance() 推进一格（tick_seconds）；
+    超过一圈的任务在槽位中记录剩余圈数，调度/取消/到期均为 O(1)
+    """
+
+    def __init__(self, tick_seconds: float = 0.5, wheel_size: int = 512):
+        self.tick_seconds = tick_seconds
+        self.wheel_size = wheel_size
+        self._slots: List[Dict[Hashable, List[Any]]] = [dict() for _ in range(wheel_size)]
+        self._where: Dict[Hashable, int] = {}
+        self._cursor = 0
+
+    def __len__(self):
+        return len(self._where)
+
+    def schedule(self, key: Hashable, delay_seconds: float, payload: Any = None):
+        """delay_seconds 后触发 key（已存在则重新调度）"""
+        self.cancel(key)
+        ticks = max(1, int(round(delay_seconds / self.tick_seconds)))
+        rounds, offset = divmod(ticks - 1, self.wheel_size)
+        slot = (self._cursor + 1 + offset) % self.wheel_size
+        self._slots[slot][key] = [rounds, payload]
+        self._where[key] = slot
+
+    def cancel(self, key: Hashable):
+        slot = self._where.pop(key, None)
+        if slot is not None:
+            self._slots[slot].pop(key, None)
+
+    def advance(self) -> List[Tuple[Hashable, Any]]:
+        """推进一格，返回本格到期的 (key, payload)"""
+        self._cursor = (self._cursor + 1) % self.wheel_size
+        bucket = self._slots[self._cursor]
+        due = []
+        for key, entry in list(bucket.items()):
+            if entry[0] > 0:
+                entry[0] -= 1
+                continue
+            del bucket[key]
+            del self._where[key]
+            due.append((key, entry[1]))
+        return due
+
+
+class HealthScheduler:
+    """
+    每容器独立间隔的健康检查调度器（自带调度线程）
+
+    health_check 配置项：
+      interval_seconds: 探测间隔（默认 default_interval，不小于 timeout_seconds）
+      timeout_seconds:  单次探测超时（由探测本身执行，默认 5 秒）
+      jitter_seconds:   每次间隔的随机抖动范围 ±jitter（默认 0）
+
+    dispatch(container_name, health_config) 负责异步发起探测并返回 Future（或 None），
+    调度线程本身不等待探测结果；同一容器上一次探测到下次到期仍未结束时跳过本次，
+    并调用 on_overrun(container_name)
+    """
+
+    def __init__(self, dispatch: Callable[[str, Dict[str, Any]], Optional[Future]],
+                 default_interval: float = 30, tick_seconds: float = 0.5, wheel_size: int = 512,
+                 on_overrun: Callable[[str], None] = None):
+        self.dispatch = dispatch
+        self.on_overrun = on_overrun
+        self.default_interval = default_interval
+        self.wheel = TimerWheel(tick_seconds, wheel_size)
+        self._configs: Dict[str, Dict[str, Any]] = {}
+        self._inflight: Dict[str, Future] = {}
+        self._lock = Lock()
+        self._stop_event = Event()
+        self._thread: Optional[Thread] = None
+
+    def min_interval(self, health_config: Dict[str, Any]) -> float:
+        """
+        间隔下限：不小于单次探测超时，否则正常超时的探测也会在下次到期时被当作未结束
+        """
+        timeout = float(health_config.get("timeout_seconds", DEFAULT_TIMEOUT_SECONDS))
+        return max(self.wheel.tick_seconds, timeout)
+
+    def interval_of(self, health_config: Dict[str, Any]) -> float:
+        return max(self.min_interval(health_config),
+                   float(health_config.get("interval_seconds", self.default_interval)))
+
+    def add_all(self, health_configs: Dict[str, Dict[str, Any]]):
+        """批量注册，首轮探测按各自间隔均匀错开"""
+        total = len(health_configs)
+        for index, (container_name, health_config) in enumerate(health_configs.items()):
+            offset = self.interval_of(health_config) * (index + 1) / total
+            self.add(container_name, health_config, offset)
+
+    def add(self, container_name: str, health_config: Dict[str, Any], initial_delay: float = None):
+        with self._lock:
+            self._configs[container_name] = health_config
+            if initial_delay is None:
+                initial_delay = self._next_delay(health_config)
+            self.wheel.schedule(container_name, initial_delay)
+
+    def remove(self, container_name: str):
+        with self._lock:
+            self._configs.pop(container_name, None)
+            self.wheel.cancel(container_name)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        self._stop_event.clear()
+        self._thread = Thread(target=self._run, name="health-scheduler", daemon=True)
+        self._thread.start()
+
+    def stop(self, timeout: float = 5):
+        self._stop_event.set()
+        if self._thread is not None:
+            self._thread.join(timeout=timeout)
+            self._thread = None
+
+    def tick(self):
+        """推进一格并发起到期探测（调度线程每 tick_seconds 调用一次）"""
+        with self._lock:
+            due = self.wheel.advance()
+            for container_name, _ in due:
+                health_config = self._configs.get(container_name)
+                if health_config is not None:
+                    self.wheel.schedule(container_name, self._next_delay(health_config))
+
+        for container_name, _ in due:
+            health_config = self._configs.get(container_name)
+            if health_config is None:
+                continue
+            previous = self._inflight.get(container_name)
+            if previous is not None and not previous.done():
+                logger.debug(f"容器 {container_name} 上一次健康检查仍未结束，跳过")
+                if self.on_overrun is not None:
+                    self.on_overrun(container_name)
+                continue
+            try:
+                future = self.dispatch(container_name, health_config)
+            except Exception as e:
+                logger.error(f"发起健康检查失败 {container_name}: {e}")
+                continue
+            if future is not None:
+                self._inflight[container_name] = future
+
+    def _next_delay(self, health_config: Dict[str, Any]) -> float:
+        interval = self.interval_of(health_config)
+        jitter = float(health_config.get("jitter_seconds", 0))
+        if jitter > 0:
+            interval += random.uniform(-jitter, jitter)
+        return max(self.min_interval(health_config), interval)
+
+    def _run(self):
+        tick = self.wheel.tick_seconds
+        next_tick = time.monotonic() + tick
+        while not self._stop_event.is_set():
+            delay = next_tick - time.monotonic()
+            if delay > 0 and self._stop_event.wait(delay):
+                break
+            try:
+                self.tick()
+            except Exception as e:
+                logger.error(f"健康检查调度异常: {e}")
+            next_tick += tick
+            # 线程被长时间阻塞后不补跑错过的 tick
+            if next_tick < time.monotonic() - tick:
+                next_tick = time.monotonic() + tick
@@ -1,74 +1,211 @@
 """
 安全检查模块
 """
-from typing import Dict, Any, List
+from typing import Dict, Any, List, Optional, Tuple
+from threading import Lock
+import logging
 import os
 import yaml
 from .utils import run_command
+from .docker_api import try_api, API_UNAVAILABLE
+from .config import get_config
+from .cgroup import get_sampler
+from .matcher import PatternMatch, PatternMatcher
+from .procfs import ProcessInspector, ProcessKey, ProcessTracker, get_inspector
+
+logger = logging.getLogger(__name__)
+
+# 使用相对于模块的路径
+RULES_FILE = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "config", "security_rules.yml")
+
+# 默认兜底规则（规则文件缺失或缺少对应配置时使用）
+DEFAULT_LOG_PATTERNS = {
+    "sql_injection": ["UNION SELECT", "syntax error", "ORA-", "MySQL Error"],
+    "command_injection": ["/etc/passwd", "cat /flag", "whoami"],
+    "xss_attack": ["<script>", "alert(1)"],
+}
+DEFAULT_PROCESS_BLACKLIST = ["xmrig", "minerd", "nmap", "sqlmap", "hydra", "nc -e", "bash -i"]
+
+class SecurityRules:
+    """编译后的安全规则（只读，热加载时整体替换）"""
+
+    def __init__(self, raw: Dict[str, Any]):
+        self.raw = raw
+        self.log_matcher = PatternMatcher(raw.get("log_patterns") or DEFAULT_LOG_PATTERNS)
+        self.process_matcher = PatternMatcher({
+            "process_blacklist": raw.get("process_blacklist") or DEFAULT_PROCESS_BLACKLIST
+        })
+
+class RulesCache:
+    """
+    安全规则缓存
+    每次读取只 stat 规则文件，(mtime, inode, size) 变化时才重新解析、编译并整体替换；
+    新文件解析失败时继续使用旧规则，直到文件再次变化
+    """
+
+    def __init__(self, path: str = RULES_FILE):
+        self.path = path
+        self._lock = Lock()
+        # (文件签名, 编译后的规则)，整体赋值替换，读取方无需加锁
+        self._current: Tuple[Any, SecurityRules] = (None, None)
+
+    def _signature(self):
+        try:
+            st = os.stat(self.path)
+        except OSError:
+            return "missing"
+        return (st.st_mtime_ns, st.st_ino, st.st_size)
+
+    def get(self) -> SecurityRules:
+        signature = self._signature()
+        current_signature, rules = self._current
+        if rules is not None and signature == current_signature:
+            return rules
+
+        with self._lock:
+            current_signature, rules = self._current
+            if rules is not None and signature == current_signature:
+                return rules
+            try:
+                raw = {}
+                if signature != "missing":
+                    with open(self.path, 'r', encoding='utf-8') as f:
+                        raw = yaml.safe_load(f) or {}
+                new_rules = SecurityRules(raw)
+                if rules is not None:
+                    logger.info(f"安全规则已重新加载: {self.path}")
+                rules = new_rules
+            except Exception as e:
+                logger.warning(f"安全规则加载失败，继续使用原规则: {e}")
+                if rules is None:
+                    rules = SecurityRules({})
+            self._current = (signature, rules)
+            return rules
+
+_rules_cache = RulesCache()
+
+def get_security_rules() -> SecurityRules:
+    """当前生效的安全规则"""
+    return _rules_cache.get()
 
 def _load_security_rules() -> Dict[str, Any]:
     """加载安全规则配置"""
-    # 使用相对于模块的路径
-    base_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-    rule_file = os.path.join(base_dir, "config", "security_rules.yml")
-    if not os.path.exists(rule_file):
-        return {}
-        
-    try:
-        with open(rule_file, 'r', encoding='utf-8') as f:
-            return yaml.safe_load(f) or {}
-    except Exception:
-        return {}
+    return get_security_rules().raw
+
+def scan_logs(logs: str) -> List[PatternMatch]:
+    """
+    单次扫描日志，返回所有命中的特征（起始位置、特征串、分类）
+    """
+    return get_security_rules().log_matcher.findall(logs)
 
 def check_logs_for_injection(logs: str) -> List[str]:
     """
     检查日志中是否存在注入攻击特征 (基于知识库)
+    返回命中的特征串（按规则顺序，每个只出现一次）
     """
-    rules = _load_security_rules()
-    
-    suspicious_patterns = []
-    
-    # 从配置加载模式，如果失败则使用默认值
-    log_patterns = rules.get("log_patterns", {})
-    if not log_patterns:
-        # 默认兜底规则
-        suspicious_patterns = [
-            "UNION SELECT", "syntax error", "ORA-", "MySQL Error",
-            "/etc/passwd", "cat /flag", "whoami",
-            "<script>", "alert(1)"
-        ]
-    else:
-        # 展平所有分类的模式
-        for category, patterns in log_patterns.items():
-            suspicious_patterns.extend(patterns)
-    
-    found_patterns = []
-    for pattern in suspicious_patterns:
-        if pattern in logs:
-            found_patterns.append(pattern)
-            
-    return found_patterns
+    return get_security_rules().log_matcher.found(logs)
+
+def get_process_inspector() -> Optional[ProcessInspector]:
+    """security.backend 为 proc 且主机支持 cgroup v2 时返回进程检查器，否则 None"""
+    config = get_config()
+    if config.security.backend != "proc":
+        return None
+    sampler = get_sampler(config.stats.cgroup_root)
+    if sampler is None:
+        return None
+    return get_inspector(sampler, config.security.proc_root)
+
+def _docker_top(container_name: str) -> Optional[Tuple[List[str], List[List[str]]]]:
+    """docker top 结果 (列名, 进程行)，失败时返回 None"""
+    top = try_api(lambda client: client.container_top(container_name))
+    if top is None:
+        return None
+    if top is not API_UNAVAILABLE:
+        return top.get("Titles") or [], top.get("Processes") or []
+
+    code, stdout, stderr = run_command([
+        'docker', 'top', container_name
+    ])
+    if code != 0:
+        return None
+    lines = [line for line in stdout.split('\n') if line.strip()]
+    if not lines:
+        return [], []
+    # 最后一列 CMD 可能包含空格
+    titles = lines[0].split()
+    return titles, [line.split(None, len(titles) - 1) for line in lines[1:]]
 
 def check_processes(container_name: str) -> List[str]:
     """
     检查容器内是否存在恶意进程 (基于知识库)
+    security.backend=proc 时直接读取 /proc，解析不到容器 cgroup 时回退 docker top
     """
-    code, stdout, stderr = run_command([
-        'docker', 'top', container_name
-    ])
-    
+    matcher = get_security_rules().process_matcher
+    inspector = get_process_inspector()
+    if inspector is not None:
+        procs = inspector.scan(container_name, matcher)
+        if procs is not None:
+            return procs
+
+    top = _docker_top(container_name)
     malicious_processes = []
-    if code == 0:
-        rules = _load_security_rules()
-        blacklist = rules.get("process_blacklist", [])
-        
-        # 默认兜底
-        if not blacklist:
-            blacklist = ["xmrig", "minerd", "nmap", "sqlmap", "hydra", "nc -e", "bash -i"]
-        
-        for line in stdout.split('\n'):
-            for bad_proc in blacklist:
-                if bad_proc in line:
-                    malicious_processes.append(bad_proc)
-                    
+    if top is not None:
+        # 与 docker top 输出对齐：每个进程一行，字段以空格拼接
+        for proc in top[1]:
+            malicious_processes.extend(matcher.found(" ".join(proc)))
+
     return malicious_processes
+
+def list_processes(container_name: str) -> Optional[Dict[ProcessKey, str]]:
+    """
+    容器进程 {进程标识: 命令行}，失败时返回 None
+    proc 后端的标识为 (pid, /proc/<pid>/stat 的 starttime)；
+    docker top 后端为 (pid, 命令行)：STIME 列跨天后从 HH:MM 变为日期，不能作为稳定的启动时间
+    """
+    inspector = get_process_inspector()
+    if inspector is not None:
+        processes = inspector.processes(container_name)
+        if processes is not None:
+            return processes
+
+    top = _docker_top(container_name)
+    if top is None:
+        return None
+    titles, rows = top
+    try:
+        pid_col, cmd_col = titles.index("PID"), titles.index("CMD")
+    except ValueError:
+        logger.debug(f"docker top 输出缺少 PID/CMD 列: {titles}")
+        return None
+    processes = {}
+    for row in rows:
+        try:
+            cmdline = " ".join(row[cmd_col:])
+            processes[(int(row[pid_col]), cmdline)] = cmdline
+        except (IndexError, ValueError):
+            continue
+    return processes
+
+def check_new_processes(container_name: str, tracker: ProcessTracker) -> List[str]:
+    """
+    只检查自上次快照以来新启动的进程（边沿触发：长期运行的恶意进程只上报一次）
+    规则热加载后对全部进程重新检查一次；
+    命中的进程在调用方 tracker.acknowledge 之前保持待确认，上报被跳过时下一轮仍会返回
+    """
+    processes = list_processes(container_name)
+    if processes is None:
+        return []
+    matcher = get_security_rules().process_matcher
+    candidates = tracker.pending(container_name, processes)
+    delta = tracker.diff(container_name, processes, token=matcher)
+    if delta.spawned or delta.exited:
+        logger.debug(f"容器 {container_name} 进程变化: 新启动 {len(delta.spawned)} 个，退出 {len(delta.exited)} 个")
+    candidates.update(delta.spawned)
+
+    hits = {}
+    for key, cmdline in candidates.items():
+        found = matcher.found(cmdline)
+        if found:
+            hits[key] = found
+    tracker.hold(container_name, {key: candidates[key] for key in hits})
+    return [pattern for found in hits.values() for pattern in found]
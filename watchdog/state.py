@@ -0,0 +1,254 @@
+"""
+容器状态表模块
+由 Docker 事件流增量维护每个容器的运行状态，存活检查直接查表；
+完整 inspect 只在低频对账（reconcile）时执行
+"""
+import os
+import json
+import time
+import logging
+from dataclasses import dataclass
+from threading import Lock
+from typing import Dict, Any, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class ContainerState:
+    name: str
+    exists: bool = True
+    running: bool = False
+    status: str = "unknown"
+    health: str = ""  # healthy / unhealthy / starting，无 HEALTHCHECK 时为空
+    exit_code: int = 0
+    oom_killed: bool = False
+    restart_count: int = 0
+    memory_limit: int = 0  # HostConfig.Memory（字节），0 表示未限制；只由 inspect 更新
+    updated_at: float = 0.0
+    source: str = ""  # event / inspect
+
+
+class ContainerStateTable:
+    """线程安全的容器状态表"""
+
+    def __init__(self):
+        self._lock = Lock()
+        self._states: Dict[str, ContainerState] = {}
+
+    def get(self, container_name: str) -> Optional[ContainerState]:
+        """返回状态副本（表内对象只在持锁时修改）"""
+        with self._lock:
+            state = self._states.get(container_name)
+            return ContainerState(**vars(state)) if state is not None else None
+
+    def snapshot(self) -> Dict[str, ContainerState]:
+        with self._lock:
+            return {name: ContainerState(**vars(state)) for name, state in self._states.items()}
+
+    def _entry(self, container_name: str) -> ContainerState:
+        state = self._states.get(container_name)
+        if state is None:
+            state = ContainerState(name=container_name)
+            self._states[container_name] = state
+        return state
+
+    def apply_event(self, event: Dict[str, Any]) -> Optional[ContainerState]:
+        """根据 Docker 事件更新状态，返回更新后的状态（无关事件返回 None）"""
+        action = event.get("Action", "") or event.get("status", "")
+        attributes = (event.get("Actor") or {}).get("Attributes") or {}
+        container_name = attributes.get("name", "")
+        if not container_name:
+            return None
+
+        with self._lock:
+            state = self._entry(container_name)
+            if action == "start":
+                state.exists = True
+                state.running = True
+                state.status = "running"
+                state.exit_code = 0
+                state.oom_killed = False
+            elif action == "restart":
+                state.running = True
+                state.status = "running"
+                state.restart_count += 1
+            elif action == "die":
+                state.running = False
+                state.status = "exited"
+                try:
+                    state.exit_code = int(attributes.get("exitCode", "0"))
+                except ValueError:
+                    state.exit_code = -1
+            elif action == "stop":
+                state.running = False
+                state.status = "exited"
+            elif action == "destroy":
+                state.exists = False
+                state.running = False
+                state.status = "missing"
+            elif action == "oom":
+                state.oom_killed = True
+            elif action.startswith("health_status"):
+                state.health = action.split(":", 1)[-1].strip()
+            elif action == "kill":
+                # kill 只代表发送了信号，是否退出以随后的 die 事件为准
+                pass
+            else:
+                return None
+            state.updated_at = time.time()
+            state.source = "event"
+            return ContainerState(**vars(state))
+
+    def apply_inspect(self, container_name: str, info: Optional[Dict[str, Any]],
+                      started_at: float = None) -> ContainerState:
+        """
+        用 get_container_info 的结果覆盖状态（对账），info 为 None 表示容器不存在
+        started_at 为发起 inspect 的时间：之后已有事件更新过状态时 inspect 结果已过期，不覆盖
+        """
+        with self._lock:
+            state = self._entry(container_name)
+            if started_at is not None and state.source == "event" and state.updated_at >= started_at:
+                return ContainerState(**vars(state))
+            if info is None:
+                state.exists = False
+                state.running = False
+                state.status = "missing"
+            else:
+                state.exists = True
+                state.running = info.get("running", False)
+                state.status = info.get("status", "")
+                state.health = info.get("health", "")
+                state.exit_code = info.get("exit_code", 0)
+                state.oom_killed = info.get("oom_killed", False)
+                state.restart_count = info.get("restart_count", 0)
+                state.memory_limit = info.get("memory_limit", 0) or 0
+            state.updated_at = time.time()
+            state.source = "inspect"
+            return ContainerState(**vars(state))
+
+    def remove(self, container_name: str):
+        with self._lock:
+            self._states.pop(container_name, None)
+
+
+class EventCursor:
+    """
+    Docker 事件流游标
+    记录最后处理的事件时间（timeNano）并持久化，事件流重连或 watchdog 重启后用 --since 回放；
+    同时记录事件流最后一次确认连通的时间，断线时长从该时刻起算（安静的主机上可能很久没有事件）
+    """
+
+    # 连通时间的持久化粒度（秒），避免事件流空闲时频繁写文件
+    ALIVE_FLUSH_SECONDS = 30
+
+    def __init__(self, path: str, flush_interval: float = 1.0):
+        self.path = path
+        self.flush_interval = flush_interval
+        self.last_time_nano: Optional[int] = None
+        # 事件流最后一次确认连通的时间（unix 秒）
+        self.alive_at: Optional[float] = None
+        # 与 last_time_nano 同一时刻已处理的事件，回放时避免重复处理
+        self._keys_at_last: Set[Tuple[str, str]] = set()
+        self._dirty = False
+        self._last_flush = 0.0
+        self._flushed_alive_at: Optional[float] = None
+        self._load()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            self.last_time_nano = int(data.get("time_nano"))
+            if data.get("alive_at") is not None:
+                self.alive_at = self._flushed_alive_at = float(data["alive_at"])
+        except FileNotFoundError:
+            pass
+        except (OSError, ValueError, TypeError, AttributeError) as e:
+            logger.warning(f"事件游标文件损坏，忽略: {self.path} ({e})")
+
+    def mark_alive(self, now: float = None):
+        """记录事件流当前连通（连接保持期间周期调用）"""
+        self.alive_at = time.time() if now is None else now
+        if self._flushed_alive_at is None or self.alive_at - self._flushed_alive_at >= self.ALIVE_FLUSH_SECONDS:
+            self._dirty = True
+        if self._dirty and time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+
+    def gap_seconds(self) -> Optional[float]:
+        """事件流断开至今的时长（取最后处理事件与最后确认连通中较晚者），无游标时返回 None"""
+        if self.last_time_nano is None:
+            return None
+        last = self.last_time_nano / 1e9
+        if self.alive_at is not None:
+            last = max(last, self.alive_at)
+        return time.time() - last
+
+    def since_arg(self) -> Optional[str]:
+        """docker events --since 参数（unix 时间戳，纳秒精度）"""
+        if self.last_time_nano is None:
+            return None
+        seconds, nanos = divmod(self.last_time_nano, 1_000_000_000)
+        return f"{seconds}.{nanos:09d}"
+
+    def accept(self, event: Dict[str, Any]) -> bool:
+        """
+        判断事件是否需要处理并推进游标
+        早于游标或已在游标时刻处理过的事件（--since 回放的重叠部分）返回 False
+        """
+        time_nano = event.get("timeNano")
+        if time_nano is None:
+            time_nano = int(event.get("time", 0)) * 1_000_000_000
+        time_nano = int(time_nano)
+        key = (event.get("id", "") or (event.get("Actor") or {}).get("ID", ""),
+               event.get("Action", "") or event.get("status", ""))
+
+        if self.last_time_nano is not None:
+            if time_nano < self.last_time_nano:
+                return False
+            if time_nano == self.last_time_nano:
+                if key in self._keys_at_last:
+                    return False
+                self._keys_at_last.add(key)
+                return True
+
+        self.last_time_nano = time_nano
+        self._keys_at_last = {key}
+        self._dirty = True
+        if time.monotonic() - self._last_flush >= self.flush_interval:
+            self.flush()
+        return True
+
+    def reset(self, now: float = None):
+        """
+        从指定时刻（默认当前）重新开始：首次启动或断线过久改为对账后调用，
+        之后的重连从该时刻回放
+        """
+        now = time.time() if now is None else now
+        self.last_time_nano = int(now * 1_000_000_000)
+        self.alive_at = now
+        self._keys_at_last = set()
+        self._dirty = True
+        self.flush()
+
+    def flush(self):
+        """原子写入游标文件"""
+        if not self._dirty:
+            return
+        self._last_flush = time.monotonic()
+        try:
+            directory = os.path.dirname(self.path)
+            if directory:
+                os.makedirs(directory, exist_ok=True)
+            if self.last_time_nano is None:
+                if os.path.exists(self.path):
+                    os.remove(self.path)
+            else:
+                tmp_path = self.path + ".tmp"
+                with open(tmp_path, 'w', encoding='utf-8') as f:
+                    json.dump({"time_nano": self.last_time_nano, "alive_at": self.alive_at}, f)
+                os.replace(tmp_path, self.path)
+            self._flushed_alive_at = self.alive_at
+            self._dirty = False
+        except OSError as e:
+            logger.warning(f"写入事件游标失败: {e}")
@@ -0,0 +1,299 @@
+"""
+资源采样模块
+一次调用批量采集所有监控容器的资源使用，结果写入共享的最新采样表（容器名 -> stats）
+"""
+import json
+import time
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock, Thread, Event
+from typing import Dict, Any, List, Optional, Tuple
+
+from .config import get_config
+from .utils import run_command
+from .docker_api import get_client, try_api, format_stats, API_UNAVAILABLE
+from .cgroup import get_sampler
+
+logger = logging.getLogger(__name__)
+
+
+class StatsTable:
+    """
+    最新资源采样表（线程安全）
+    结构: {container_name: (采样时间戳, stats)}，stats 格式同 get_container_stats
+    """
+
+    def __init__(self):
+        self._lock = Lock()
+        self._samples: Dict[str, Tuple[float, Dict[str, Any]]] = {}
+
+    def update(self, container_name: str, stats: Dict[str, Any], timestamp: float = None):
+        with self._lock:
+            self._samples[container_name] = (timestamp or time.time(), stats)
+
+    def update_many(self, samples: Dict[str, Dict[str, Any]]):
+        now = time.time()
+        with self._lock:
+            for name, stats in samples.items():
+                self._samples[name] = (now, stats)
+
+    def get(self, container_name: str, max_age: float = None) -> Optional[Dict[str, Any]]:
+        """读取最新采样；超过 max_age 秒视为过期返回 None"""
+        entry = self.entry(container_name, max_age)
+        return entry[1] if entry is not None else None
+
+    def entry(self, container_name: str, max_age: float = None) -> Optional[Tuple[float, Dict[str, Any]]]:
+        """读取最新采样及其时间戳 (timestamp, stats)；超过 max_age 秒视为过期返回 None"""
+        with self._lock:
+            entry = self._samples.get(container_name)
+        if entry is None:
+            return None
+        if max_age is not None and time.time() - entry[0] > max_age:
+            return None
+        return entry
+
+    def snapshot(self) -> Dict[str, Dict[str, Any]]:
+        with self._lock:
+            return {name: stats for name, (_, stats) in self._samples.items()}
+
+    def remove(self, container_name: str):
+        with self._lock:
+            self._samples.pop(container_name, None)
+
+
+class StatsStreamer:
+    """
+    流式资源订阅
+    每个容器维持一条 Engine API stats 长连接（daemon 约每秒推送一次），持续写入采样表；
+    连接断开（容器重启/daemon 重启）后按 retry_seconds 自动重连
+    """
+
+    def __init__(self, table: StatsTable, retry_seconds: float = 5):
+        self.table = table
+        self.retry_seconds = retry_seconds
+        self._stop_event = Event()
+        self._threads: Dict[str, Thread] = {}
+        self._stopped: Dict[str, Event] = {}
+        self._lock = Lock()
+
+    def subscribe(self, container_name: str):
+        """开始订阅容器的 stats 流（重复订阅忽略）"""
+        with self._lock:
+            if container_name in self._threads:
+                return
+            stopped = Event()
+            thread = Thread(target=self._run, args=(container_name, stopped), daemon=True)
+            self._threads[container_name] = thread
+            self._stopped[container_name] = stopped
+            thread.start()
+
+    def unsubscribe(self, container_name: str):
+        with self._lock:
+            stopped = self._stopped.pop(container_name, None)
+            self._threads.pop(container_name, None)
+        if stopped is not None:
+            stopped.set()
+
+    def subscriptions(self) -> List[str]:
+        with self._lock:
+            return list(self._threads)
+
+    def stop(self, timeout: float = 5):
+        """停止所有订阅"""
+        self._stop_event.set()
+        with self._lock:
+            threads = list(self._threads.values())
+            for stopped in self._stopped.values():
+                stopped.set()
+            self._threads.clear()
+            self._stopped.clear()
+        for thread in threads:
+            thread.join(timeout=timeout)
+
+    def _run(self, container_name: str, stopped: Event):
+        while not stopped.is_set() and not self._stop_event.is_set():
+            client = get_client()
+            if client is None:
+                logger.warning(f"Docker API 不可用，无法订阅 {container_name} 的 stats 流")
+                stopped.wait(self.retry_seconds)
+                continue
+            try:
+                for raw in client.stream_container_stats(container_name):
+                    if stopped.is_set() or self._stop_event.is_set():
+                        break
+                    self.table.update(container_name, format_stats(raw))
+            except Exception as e:
+                logger.debug(f"容器 {container_name} stats 流中断: {e}")
+            stopped.wait(self.retry_seconds)
+
+
+_stats_table = StatsTable()
+
+# 上一次采样的 cpu_stats，用于 one-shot 采样时计算 CPU 差值
+_last_cpu_stats: Dict[str, Dict[str, Any]] = {}
+_last_cpu_lock = Lock()
+
+
+def get_stats_table() -> StatsTable:
+    """获取全局最新采样表"""
+    return _stats_table
+
+
+def forget_container(container_name: str):
+    """容器被删除（或改名）后清理其采样表、CPU 差值基准和 cgroup 路径缓存"""
+    _stats_table.remove(container_name)
+    with _last_cpu_lock:
+        _last_cpu_stats.pop(container_name, None)
+    sampler = _cgroup_sampler()
+    if sampler is not None:
+        sampler.forget(container_name)
+
+
+def _cgroup_sampler():
+    """stats.backend 为 cgroup 且主机支持 cgroup v2 时返回采样器，否则 None"""
+    stats_cfg = get_config().stats
+    if stats_cfg.backend != "cgroup":
+        return None
+    return get_sampler(stats_cfg.cgroup_root)
+
+
+def sample_container(container_name: str) -> Optional[Dict[str, Any]]:
+    """
+    采样单个容器
+    backend=cgroup 时直接读 cgroup 文件，解析不到 cgroup 时回退 docker；
+    docker 后端优先 Engine API，失败回退 docker stats CLI
+    """
+    sampler = _cgroup_sampler()
+    if sampler is not None:
+        stats = sampler.sample(container_name)
+        if stats is not None:
+            return stats
+
+    stats = _sample_api(container_name)
+    if stats is not API_UNAVAILABLE:
+        return stats
+
+    code, stdout, stderr = run_command([
+        'docker', 'stats', '--no-stream',
+        '--format', '{{json .}}',
+        container_name
+    ])
+
+    if code != 0:
+        return None
+
+    try:
+        return _parse_cli_stats(json.loads(stdout))
+    except json.JSONDecodeError:
+        return None
+
+
+def collect_all_stats(container_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    """
+    一次性采集所有容器的资源使用，返回 {容器名: stats} 并写入最新采样表
+    - cgroup: 直接读取 cgroup v2 统计文件（stats.backend=cgroup）
+    - API: 并发 one-shot 采样，CPU 差值基于上一轮采样计算，无需等待 daemon 双采样
+    - CLI: 单次 docker stats --no-stream 覆盖全部容器
+    采样失败的容器不出现在结果中
+    """
+    if not container_names:
+        return {}
+
+    results: Dict[str, Dict[str, Any]] = {}
+    pending = list(container_names)
+
+    sampler = _cgroup_sampler()
+    if sampler is not None:
+        results.update(sampler.sample_many(pending))
+        pending = [name for name in pending if name not in results]
+
+    if pending:
+        api_results, fallback = _collect_api(pending)
+        results.update(api_results)
+        if fallback:
+            results.update(_collect_cli(fallback))
+
+    _stats_table.update_many(results)
+    return results
+
+
+def get_stats(container_name: str, max_age: float = None) -> Optional[Dict[str, Any]]:
+    """
+    优先从最新采样表读取；不存在或超过 max_age 秒时现场采样并回写
+    """
+    stats = _stats_table.get(container_name, max_age)
+    if stats is not None:
+        return stats
+
+    stats = sample_container(container_name)
+    if stats is not None:
+        _stats_table.update(container_name, stats)
+    return stats
+
+
+def _sample_api(container_name: str) -> Any:
+    """API 采样：有上一轮 cpu_stats 时使用 one-shot，否则让 daemon 做双采样"""
+    with _last_cpu_lock:
+        previous = _last_cpu_stats.get(container_name)
+
+    raw = try_api(lambda client: client.container_stats(container_name, one_shot=previous is not None))
+    if raw is API_UNAVAILABLE or raw is None:
+        return raw
+
+    precpu = raw.get("precpu_stats") or {}
+    if previous is not None and not precpu.get("system_cpu_usage"):
+        raw["precpu_stats"] = previous
+    with _last_cpu_lock:
+        _last_cpu_stats[container_name] = raw.get("cpu_stats") or {}
+    return format_stats(raw)
+
+
+def _collect_api(container_names: List[str]) -> Tuple[Dict[str, Dict[str, Any]], List[str]]:
+    """返回 (采样结果, 需要回退 CLI 的容器名)"""
+    results: Dict[str, Dict[str, Any]] = {}
+    fallback: List[str] = []
+    workers = max(1, min(len(container_names), get_config().docker.pool_size))
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        samples = list(pool.map(_sample_api, container_names))
+
+    for name, stats in zip(container_names, samples):
+        if stats is API_UNAVAILABLE:
+            fallback.append(name)
+        elif stats is not None:
+            results[name] = stats
+    return results, fallback
+
+
+def _collect_cli(container_names: List[str]) -> Dict[str, Dict[str, Any]]:
+    # 部分容器不存在时 docker stats 返回非 0，但仍会输出其余容器，逐行解析即可
+    code, stdout, stderr = run_command(
+        ['docker', 'stats', '--no-stream', '--format', '{{json .}}'] + list(container_names),
+        timeout=30
+    )
+    if code != 0:
+        logger.debug(f"批量 docker stats 部分失败: {stderr}")
+
+    wanted = set(container_names)
+    results: Dict[str, Dict[str, Any]] = {}
+    for line in stdout.split('\n'):
+        line = line.strip()
+        if not line:
+            continue
+        try:
+            raw = json.loads(line)
+        except json.JSONDecodeError:
+            continue
+        name = raw.get("Name", "")
+        if name in wanted:
+            results[name] = _parse_cli_stats(raw)
+    return results
+
+
+def _parse_cli_stats(stats: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "cpu_percent": stats.get("CPUPerc", "0%"),
+        "memory_usage": stats.get("MemUsage", ""),
+        "memory_percent": stats.get("MemPerc", "0%"),
+        "net_io": stats.get("NetIO", ""),
+        "block_io": stats.get("BlockIO", "")
+    }
@@ -0,0 +1,157 @@
+"""
+趋势分析模块
+对每个容器的多项指标（内存、CPU、重启次数、网络累计流量）做滑动窗口最小二乘回归，
+给出斜率、R² 和斜率的 95% 置信区间；用于替代首尾两点斜率，
+单次 GC 停顿或尖峰不会再被误判为内存泄漏
+"""
+import math
+from dataclasses import dataclass
+from typing import Dict, Iterable, Optional, Sequence, Tuple
+
+from .metrics import MetricStore
+
+# 回归使用的最近样本数
+TREND_WINDOW = 30
+
+# t 分布 97.5% 分位数（自由度 1~30），用于斜率 95% 置信区间；更大自由度取 1.96
+_T_975 = (
+    12.706, 4.303, 3.182, 2.776, 2.571, 2.447, 2.365, 2.306, 2.262, 2.228,
+    2.201, 2.179, 2.160, 2.145, 2.131, 2.120, 2.110, 2.101, 2.093, 2.086,
+    2.080, 2.074, 2.069, 2.064, 2.060, 2.056, 2.052, 2.048, 2.045, 2.042,
+)
+
+
+@dataclass
+class TrendFit:
+    """一次回归结果（斜率单位：每分钟变化量）"""
+    slope: float
+    intercept: float  # 窗口第一个样本时刻的拟合值
+    r2: float
+    slope_low: float
+    slope_high: float
+    span_seconds: float
+    samples: int
+
+
+def fit_points(points: Iterable[Tuple[float, float]]) -> Optional[TrendFit]:
+    """
+    最小二乘直线拟合（可直接消费环形缓冲的 memoryview 窗口）
+    points 为按时间顺序的 (秒级时间戳, 值)；少于 3 个样本或时间跨度为 0 时返回 None
+    """
+    xs = []
+    ys = []
+    t0 = y0 = last_t = 0.0
+    for t, y in points:
+        if not xs:
+            t0, y0 = t, y
+        # 以首个样本为原点，并用 math.fsum 精确求和，减小累加时的抵消误差
+        xs.append((t - t0) / 60.0)
+        ys.append(y - y0)
+        last_t = t
+    n = len(xs)
+    if n < 3:
+        return None
+
+    sx = math.fsum(xs)
+    sy = math.fsum(ys)
+    sxx = math.fsum(x * x for x in xs)
+    sxy = math.fsum(x * y for x, y in zip(xs, ys))
+    syy = math.fsum(y * y for y in ys)
+
+    sxx -= sx * sx / n
+    sxy -= sx * sy / n
+    syy -= sy * sy / n
+    if sxx <= 0:
+        return None
+
+    slope = sxy / sxx
+    intercept = y0 + (sy - slope * sx) / n
+    sse = max(0.0, syy - slope * sxy)
+    r2 = 1.0 - sse / syy if syy > 0 else 1.0
+
+    df = n - 2
+    se = math.sqrt(sse / df / sxx)
+    t = _T_975[df - 1] if df <= len(_T_975) else 1.96
+    return TrendFit(
+        slope=slope,
+        intercept=intercept,
+        r2=r2,
+        slope_low=slope - t * se,
+        slope_high=slope + t * se,
+        span_seconds=last_t - t0,
+        samples=n,
+    )
+
+
+def fit_line(times: Sequence[float], values: Sequence[float]) -> Optional[TrendFit]:
+    """对 (秒级时间戳序列, 值序列) 做最小二乘直线拟合"""
+    if len(times) != len(values):
+        return None
+    return fit_points(zip(times, values))
+
+
+def seconds_until(fit: TrendFit, current: float, limit: float) -> Optional[float]:
+    """
+    按回归斜率估算从 current 增长到 limit 所需秒数
+    斜率 95% 置信下界不大于 0（不能确定在增长）时返回 None；已达到 limit 时返回 0
+    """
+    if fit is None or fit.slope_low <= 0 or limit <= 0:
+        return None
+    if current >= limit:
+        return 0.0
+    return (limit - current) / fit.slope * 60.0
+
+
+class TrendEngine:
+    """
+    多指标趋势引擎
+    样本写入 MetricStore 的环形缓冲，回归只读取每个指标最近 window 个样本
+    """
+
+    def __init__(self, store: MetricStore = None, window: int = TREND_WINDOW):
+        self.store = store if store is not None else MetricStore()
+        self.window = window
+
+    def observe(self, container_name: str, metrics: Dict[str, float], timestamp: float = None):
+        """记录一次采样；metrics 中缺失或为 None 的指标记为 NaN"""
+        self.store.append(container_name, metrics, timestamp)
+
+    def fit(self, container_name: str, metric: str) -> Optional[TrendFit]:
+        return fit_points(self.store.points(container_name, metric, self.window))
+
+    def fit_rollup(self, container_name: str, metric: str, tier: str, window_seconds: float) -> Optional[TrendFit]:
+        """
+        对最近 window_seconds 内的汇总桶均值做回归
+        （1m 层级一小时约 60 个点，1h 层级一周约 168 个点）
+        """
+        rows = self.store.rollups.recent(container_name, metric, tier, window_seconds)
+        return fit_points((row.start, row.mean) for row in rows)
+
+    def fits(self, container_name: str) -> Dict[str, TrendFit]:
+        """容器所有指标的回归结果（样本不足的指标不包含在内）"""
+        results = {}
+        for metric in self.store.metrics(container_name):
+            result = self.fit(container_name, metric)
+            if result is not None:
+                results[metric] = result
+        return results
+
+    def summary(self, container_name: str) -> Dict[str, Dict[str, float]]:
+        """
+        各指标最近窗口的回归摘要（附加到证据中，供诊断判断 CPU、重启、网络流量的变化趋势）
+        斜率单位：每分钟变化量
+        """
+        return {
+            metric: {
+                "slope_per_min": round(result.slope, 3),
+                "slope_low_per_min": round(result.slope_low, 3),
+                "slope_high_per_min": round(result.slope_high, 3),
+                "r2": round(result.r2, 3),
+                "samples": result.samples,
+                "window_seconds": round(result.span_seconds),
+            }
+            for metric, result in self.fits(container_name).items()
+        }
+
+    def forget(self, container_name: str):
+        self.store.forget(container_name)